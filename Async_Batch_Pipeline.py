@@ -0,0 +1,181 @@
+"""
+异步批处理前端 - Async Batch Pipeline
+功能：用 asyncio 让目录扫描、文件读取和解析相互重叠
+- 目录扫描（os.scandir）和文件读取都在后台线程中进行，不阻塞事件循环
+- 多个产品同时预读，预读完成的产品放入有界队列；解析跟不上时读取自动暂停（背压）
+- 解析任务提交到批处理共享的进程池，提取结果交给批量聚合（超出阈值时写出产品文件）也在后台线程中完成
+- 超出内存预算时暂停预读和提交解析，直到内存回落或没有解析任务在运行
+- 命中提取缓存的页面不提交解析，新解析的结果在后台线程中写入缓存
+- 开启性能分析时解析任务同样由 ProductScheduler.parse_call 包装，按产品记录阶段耗时和调用栈采样
+"""
+
+import os
+import asyncio
+
+from Memory_Monitor import format_mb
+from Extraction_Cache import MISS
+from Product_Scheduler import ProductScheduler
+
+DEFAULT_PREFETCH_PRODUCTS = 4
+
+
+class AsyncBatchPipeline:
+    """产品级流水线：扫描 → 预读 → 解析 → 写入"""
+
+    def __init__(self, processor, prefetch_products=DEFAULT_PREFETCH_PRODUCTS):
+        self.processor = processor
+        # 同时预读的产品数，也是已读完等待解析的产品队列长度
+        self.prefetch_products = max(1, prefetch_products)
+        # 只用于拆分解析任务和汇总结果
+        self.scheduler = ProductScheduler(read_workers=processor.read_workers, minimizer=processor.minimizer,
+                                          cache=processor.cache, profiler=processor.profiler)
+        self.successful_products = []
+        self.total = 0
+        self.read_semaphore = None
+        self.memory = processor.memory
+        # 已提交但尚未完成的解析任务数
+        self.parses_in_flight = 0
+
+    def run(self):
+        """运行流水线，返回成功处理的产品列表；没有可处理的文件夹时返回 None"""
+        return asyncio.run(self._run())
+
+    async def _run(self):
+        folders = await asyncio.to_thread(self.processor.find_product_folders)
+        if not folders:
+            return None
+
+        self.total = len(folders)
+        # 所有产品共享的文件读取并发上限
+        self.read_semaphore = asyncio.Semaphore(max(1, self.processor.read_workers))
+
+        folder_queue = asyncio.Queue()
+        for index, folder_path in enumerate(folders, 1):
+            folder_queue.put_nowait((index, folder_path))
+        product_queue = asyncio.Queue(maxsize=self.prefetch_products)
+
+        try:
+            worker_pool = self.processor.get_worker_pool()
+            parser_count = self.processor.workers or os.cpu_count() or 1
+        except Exception as e:
+            print(f"⚠️ 无法创建进程池，改为在线程中解析: {e}")
+            worker_pool = None
+            parser_count = 1
+
+        readers = [asyncio.create_task(self._reader(folder_queue, product_queue))
+                   for _ in range(self.prefetch_products)]
+        parsers = [asyncio.create_task(self._parser(product_queue, worker_pool))
+                   for _ in range(parser_count)]
+
+        await asyncio.gather(*readers)
+        for _ in parsers:
+            await product_queue.put(None)
+        await asyncio.gather(*parsers)
+
+        return self.successful_products
+
+    async def _wait_for_headroom(self):
+        """超出内存预算时等待，直到内存回落或没有解析任务在运行"""
+        if not self.memory.over_budget():
+            return
+        self.memory.note_throttled()
+        while self.parses_in_flight and self.memory.over_budget():
+            await asyncio.sleep(self.memory.sample_interval)
+
+    async def _parse(self, loop, worker_pool, job, html_content):
+        """提交一个解析任务并等待结果"""
+        self.parses_in_flight += 1
+        try:
+            function, arguments = self.scheduler.parse_call(job, html_content)
+            return await loop.run_in_executor(worker_pool, function, *arguments)
+        finally:
+            self.parses_in_flight -= 1
+
+    async def _read(self, job):
+        """在后台线程中读取文件，受全局读取并发限制"""
+        async with self.read_semaphore:
+            return await asyncio.to_thread(self.scheduler.read_job, job)
+
+    async def _reader(self, folder_queue, product_queue):
+        """扫描并预读产品文件夹，读完后放入产品队列（队列满时等待）"""
+        while True:
+            try:
+                index, folder_path = folder_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            folder_name = os.path.basename(folder_path)
+            try:
+                if await asyncio.to_thread(self.processor.is_product_complete, folder_path):
+                    self.successful_products.append(folder_name)
+                    print(f"⏭️ [{index}/{self.total}] 已在上次运行中完成，跳过: {folder_name}")
+                    continue
+                await self._wait_for_headroom()
+                self.memory.begin_product(folder_name)
+                html_files = await asyncio.to_thread(self.processor.analyze_folder_files, folder_path)
+                if not html_files:
+                    print(f"⚠️ 文件夹中没有HTML文件: {folder_name}")
+                    self.memory.end_product(folder_name)
+                    continue
+                jobs = self.scheduler.build_jobs(html_files)
+                contents = await asyncio.gather(*(self._read(job) for job in jobs), return_exceptions=True)
+            except Exception as e:
+                print(f"❌ 读取产品文件夹 '{folder_name}' 时出错: {e}")
+                self.memory.end_product(folder_name)
+                continue
+
+            await product_queue.put((index, folder_path, jobs, contents))
+
+    async def _parser(self, product_queue, worker_pool):
+        """从产品队列取出已预读的产品，提交解析并写入产品文件"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await product_queue.get()
+            if item is None:
+                return
+
+            index, folder_path, jobs, contents = item
+            folder_name = os.path.basename(folder_path)
+            print(f"\n🚀 [{index}/{self.total}] 解析产品: {folder_name}")
+
+            futures = []
+            for job_index, job in enumerate(jobs):
+                read_result = contents[job_index]
+                # 原始内容交给解析任务后不再保留
+                contents[job_index] = None
+                if isinstance(read_result, BaseException):
+                    print(f"❌ 读取文件时出错 {os.path.basename(job[2])}: {read_result}")
+                    continue
+                if read_result.cached is not MISS:
+                    print(f"♻️ 使用缓存的提取结果: {os.path.basename(job[2])}")
+                    futures.append((job, read_result, None))
+                    continue
+                await self._wait_for_headroom()
+                future = asyncio.ensure_future(self._parse(loop, worker_pool, job, read_result.html_content))
+                futures.append((job, read_result._replace(html_content=None), future))
+                del read_result
+            del contents, item
+
+            results = {}
+            for job, read_result, future in futures:
+                if future is None:
+                    self.scheduler.merge_result(results, job, read_result.cached)
+                    continue
+                try:
+                    job_data = self.scheduler.parse_outcome(job, await future, folder_name)
+                except Exception as e:
+                    print(f"❌ 解析文件时出错 {os.path.basename(job[2])}: {e}")
+                    continue
+                await asyncio.to_thread(self.scheduler.store_result, read_result, job_data)
+                self.scheduler.merge_result(results, job, job_data)
+
+            try:
+                if await asyncio.to_thread(self.processor.finish_extracted_product, folder_path, results):
+                    self.successful_products.append(folder_name)
+                    print(f"✅ 产品 '{folder_name}' 处理成功")
+                else:
+                    print(f"❌ 产品 '{folder_name}' 处理失败")
+            except Exception as e:
+                print(f"❌ 处理产品文件夹 '{folder_name}' 时出错: {e}")
+            finally:
+                print(f"📈 {folder_name} 处理期间峰值内存: {format_mb(self.memory.end_product(folder_name))}")
@@ -0,0 +1,231 @@
+"""
+备份管理器 - Backup Manager
+功能：为数据清理类工具提供廉价的写时备份
+- 直接复制原始字节（优先硬链接/reflink），不做反序列化和重新格式化
+- 按内容哈希去重，相同内容只保存一份
+- 只在修改真正提交前备份，没有改动的文件不产生备份
+- 按保留策略清理旧的备份代
+
+目录结构：
+backups/
+├── objects/<sha256>              文件内容（去重存储）
+└── generations/<代ID>.json       每次运行的清单：原文件路径 → 内容哈希
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import threading
+import argparse
+from datetime import datetime
+
+from Safe_File_Writer import atomic_write_json
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_KEEP_GENERATIONS = 10
+
+# Linux 下的 FICLONE ioctl，用于在 btrfs/xfs 等文件系统上创建 reflink
+FICLONE = 0x40049409
+
+
+def file_sha256(file_path):
+    """计算文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _try_reflink(src, dst):
+    """尝试创建 reflink，不支持时返回 False"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except (ImportError, OSError):
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+class BackupManager:
+    """内容寻址的备份存储，一次运行对应一个备份代"""
+
+    def __init__(self, backup_root, keep_generations=DEFAULT_KEEP_GENERATIONS):
+        self.backup_root = backup_root
+        self.objects_dir = os.path.join(backup_root, "objects")
+        self.generations_dir = os.path.join(backup_root, "generations")
+        self.keep_generations = keep_generations
+        self.generation_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        self.entries = {}
+
+    def backup_file(self, file_path, link=False):
+        """
+        在修改提交前备份文件的原始字节
+        link: 调用方保证通过原子替换（新 inode）写回时才能使用硬链接
+        返回内容哈希，失败时抛出异常
+        """
+        abs_path = os.path.abspath(file_path)
+        if abs_path in self.entries:
+            return self.entries[abs_path]
+
+        digest = self.store_object(abs_path, link)
+        self.record(abs_path, digest)
+        return digest
+
+    def store_object(self, file_path, link=False):
+        """
+        把文件内容存入对象库并返回内容哈希，不修改清单
+        可以在多个工作进程中并发调用，由主进程随后调用 record() 记录到清单
+        """
+        digest = file_sha256(file_path)
+        object_path = os.path.join(self.objects_dir, digest)
+
+        if not os.path.exists(object_path):
+            os.makedirs(self.objects_dir, exist_ok=True)
+            # 临时文件名区分进程和线程，并发写入相同内容时互不干扰
+            temp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            stored = False
+            if link:
+                try:
+                    os.link(file_path, temp_path)
+                    stored = True
+                except OSError:
+                    stored = False
+            if not stored:
+                stored = _try_reflink(file_path, temp_path)
+            if not stored:
+                shutil.copyfile(file_path, temp_path)
+            os.replace(temp_path, object_path)
+
+        return digest
+
+    def record(self, file_path, digest):
+        """把已存储的对象记录到当前备份代清单"""
+        self.entries[os.path.abspath(file_path)] = digest
+        self._write_manifest()
+
+    def _write_manifest(self):
+        """写入当前备份代的清单"""
+        manifest = {
+            "generation": self.generation_id,
+            "created_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "files": self.entries
+        }
+        atomic_write_json(os.path.join(self.generations_dir, f"{self.generation_id}.json"), manifest)
+
+    def list_generations(self):
+        """按时间顺序列出所有备份代清单"""
+        if not os.path.isdir(self.generations_dir):
+            return []
+        manifests = []
+        for name in sorted(os.listdir(self.generations_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.generations_dir, name), 'r', encoding='utf-8') as f:
+                    manifests.append(json.load(f))
+            except Exception as e:
+                print(f"⚠️ 跳过无法读取的备份清单 {name}: {e}")
+        return manifests
+
+    def restore(self, generation_id, file_path=None):
+        """从指定备份代恢复文件，file_path 为空时恢复该代的全部文件"""
+        manifest_path = os.path.join(self.generations_dir, f"{generation_id}.json")
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        restored = []
+        for original_path, digest in manifest["files"].items():
+            if file_path and os.path.abspath(file_path) != original_path:
+                continue
+            object_path = os.path.join(self.objects_dir, digest)
+            temp_path = f"{original_path}.restore.tmp"
+            shutil.copyfile(object_path, temp_path)
+            os.replace(temp_path, original_path)
+            restored.append(original_path)
+        return restored
+
+    def prune(self):
+        """
+        保留策略：每个文件保留最近 keep_generations 个备份版本
+        不再包含任何保留条目的备份代被删除，未被引用的对象随之回收
+        """
+        manifests = self.list_generations()
+        kept_per_file = {}
+        removed_generations = 0
+
+        # 从新到旧遍历，统计每个文件已保留的版本数
+        for manifest in reversed(manifests):
+            kept_files = {}
+            for original_path, digest in manifest["files"].items():
+                count = kept_per_file.get(original_path, 0)
+                if count < self.keep_generations:
+                    kept_files[original_path] = digest
+                    kept_per_file[original_path] = count + 1
+
+            manifest_path = os.path.join(self.generations_dir, f"{manifest['generation']}.json")
+            if not kept_files:
+                os.remove(manifest_path)
+                removed_generations += 1
+            elif len(kept_files) != len(manifest["files"]):
+                manifest["files"] = kept_files
+                atomic_write_json(manifest_path, manifest)
+
+        # 回收未被引用的对象
+        referenced = set()
+        for manifest in self.list_generations():
+            referenced.update(manifest["files"].values())
+
+        removed_objects = 0
+        if os.path.isdir(self.objects_dir):
+            for name in os.listdir(self.objects_dir):
+                if name not in referenced:
+                    os.remove(os.path.join(self.objects_dir, name))
+                    removed_objects += 1
+
+        if removed_generations or removed_objects:
+            print(f"🧹 备份清理: 删除 {removed_generations} 个备份代, {removed_objects} 个对象")
+        return removed_generations, removed_objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description="备份管理器 - 查看、恢复和清理备份")
+    parser.add_argument('backup_root', help="备份根目录 (例如 result\\backups)")
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP_GENERATIONS, help="每个文件保留的备份版本数")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="列出备份代")
+    restore_parser = subparsers.add_parser('restore', help="恢复备份")
+    restore_parser.add_argument('generation', help="备份代ID")
+    restore_parser.add_argument('--file', help="只恢复指定文件")
+    subparsers.add_parser('prune', help="按保留策略清理")
+    args = parser.parse_args()
+
+    manager = BackupManager(args.backup_root, args.keep)
+
+    if args.command == 'list':
+        generations = manager.list_generations()
+        if not generations:
+            print("⚠️ 没有备份")
+        for manifest in generations:
+            print(f"📦 {manifest['generation']}  ({manifest['created_time']})  {len(manifest['files'])} 个文件")
+            for original_path in manifest['files']:
+                print(f"    📄 {original_path}")
+    elif args.command == 'restore':
+        restored = manager.restore(args.generation, args.file)
+        for path in restored:
+            print(f"✅ 已恢复: {path}")
+        if not restored:
+            print("⚠️ 没有恢复任何文件")
+    elif args.command == 'prune':
+        manager.prune()
+
+
+if __name__ == "__main__":
+    main()
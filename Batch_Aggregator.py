@@ -0,0 +1,304 @@
+"""
+批量产品聚合 - Batch Aggregator
+功能：替代逐个产品生成产品文件、再由分离器重新读取所有产品文件的流程
+- 提取完成的产品先保留在内存中；同一产品的多个文件夹（例如分别导出的平台或数据源）在这里合并为一个产品
+- 内存中的产品数超过阈值时先写出产品文件并释放内存（溢出到磁盘），合并文件写出时再从磁盘读取这些产品
+- 检查点：每加入 checkpoint_every 个产品（或距上次超过 CHECKPOINT_INTERVAL_SECONDS 秒）就写出内存中有变化的产品文件并记录检查点，
+  产品仍留在内存中；中断时最多重做最近几个产品，结束时没有再变化的产品文件不会重复写出
+- 批处理结束时写出剩余的产品文件，同时把内存中的产品交给分离器和内存映射数据集，
+  完整/不完整合并文件一次流式写出，不再重新读取刚写出的产品文件
+- 产品名由产品身份索引（Product_Identity）根据所有数据源的名称和商店ID解析，
+  名称写法不同的同一产品第一次就合并到同一个产品文件
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+
+from Extracted_Records import RecordTable, json_default
+from Product_Identity import source_identity_hints, is_placeholder
+from Safe_File_Writer import atomic_write_bytes
+
+DEFAULT_MAX_PENDING_PRODUCTS = 50
+DEFAULT_CHECKPOINT_EVERY = 5
+CHECKPOINT_INTERVAL_SECONDS = 30
+
+
+def source_application_name(data):
+    """从各数据源的提取结果中取应用名，没有时为 Unknown_Application"""
+    for source_data in data.values():
+        if source_data and isinstance(source_data, dict):
+            if 'Application' in source_data:
+                return source_data['Application']
+        elif source_data and isinstance(source_data, list) and len(source_data) > 0:
+            if 'Application' in source_data[0]:
+                return source_data[0]['Application']
+    return "Unknown_Application"
+
+
+def product_file_name(app_name):
+    """应用名 → 产品文件名 Product_<name>_Data.json"""
+    clean_name = re.sub(r'[^\w\s-]', '', app_name).strip()
+    clean_name = re.sub(r'[-\s]+', '_', clean_name)
+    return f"Product_{clean_name}_Data.json"
+
+
+def build_platform_data(data):
+    """构建平台数据结构"""
+    platforms = {}
+
+    # 从grabbed数据获取基础平台结构
+    if data['grabbed'] and isinstance(data['grabbed'], list) and len(data['grabbed']) > 0:
+        base_app_data = data['grabbed'][0]
+        platforms = base_app_data.get('Platforms', {})
+
+    # 添加用户行为数据
+    if data['user_behavior'] and 'Platforms' in data['user_behavior']:
+        for platform_name, behavior_data in data['user_behavior']['Platforms'].items():
+            if platform_name not in platforms:
+                platforms[platform_name] = {}
+
+            if 'User Behavior Data' in behavior_data:
+                platforms[platform_name]['User Behavior by Country'] = behavior_data['User Behavior Data']
+
+    # 添加用户留存数据
+    if data.get('user_retention') and 'Platforms' in data['user_retention']:
+        for platform_name, retention_data in data['user_retention']['Platforms'].items():
+            if platform_name not in platforms:
+                platforms[platform_name] = {}
+
+            platforms[platform_name]['Monthly App Retention'] = retention_data.get('Monthly App Retention', [])
+            platforms[platform_name]['Overall Retention'] = retention_data.get('Publisher Apps User Retention (Overall)', [])
+
+    return platforms
+
+
+def build_product(data):
+    """
+    根据各数据源的提取结果生成产品数据
+    data: {'grabbed', 'revenue', 'user_behavior', 'user_retention'} → 数据（缺失为 None）
+    """
+    return {
+        "Application": source_application_name(data),
+        "Last Updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "Data Sources": {
+            "Downloads & Basic Metrics": "Available" if data['grabbed'] else "Not Available",
+            "Revenue Data": "Available" if data['revenue'] else "Not Available",
+            "User Behavior Data": "Available" if data['user_behavior'] else "Not Available",
+            "User Retention Data": "Available" if data.get('user_retention') else "Not Available"
+        },
+        "Platforms": build_platform_data(data)
+    }
+
+
+def _has_value(value):
+    """空的数据段（[]、{}、空表格）不覆盖已有数据"""
+    if value is None:
+        return False
+    if isinstance(value, (list, dict, RecordTable)):
+        return len(value) > 0
+    return True
+
+
+def merge_products(existing, new):
+    """
+    合并同一产品的两次提取结果：任一次可用的数据源即为可用，
+    平台按字段合并，后提取的非空字段覆盖先前的同名字段
+    """
+    sources = existing.setdefault("Data Sources", {})
+    for source, status in new.get("Data Sources", {}).items():
+        if status == "Available" or source not in sources:
+            sources[source] = status
+
+    platforms = existing.setdefault("Platforms", {})
+    for platform, platform_data in new.get("Platforms", {}).items():
+        merged = platforms.setdefault(platform, {})
+        for field, value in platform_data.items():
+            if field not in merged or _has_value(value):
+                merged[field] = value
+
+    existing["Last Updated"] = new.get("Last Updated", existing.get("Last Updated"))
+    return existing
+
+
+class BatchAggregator:
+    """
+    批处理中的产品聚合阶段（可在多个线程中同时 add）
+    on_written(产品文件夹, 产品文件路径, sha256): 产品文件写出后调用（记录检查点）
+    identity: 产品身份索引（ProductIdentityIndex），None 时使用第一个数据源中的应用名
+    completed_folders(产品文件路径): 续跑/监视模式下之前已写入该产品文件的产品文件夹（这些文件夹本次可能被跳过）
+    checkpoint_every: 每加入多少个产品写出并记录一次检查点（0 表示只在溢出和 flush 时写出）
+    """
+
+    def __init__(self, output_dir, on_written=None, max_pending=DEFAULT_MAX_PENDING_PRODUCTS, identity=None,
+                 completed_folders=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+        self.output_dir = output_dir
+        self.on_written = on_written
+        self.max_pending = max(1, max_pending)
+        self.identity = identity
+        self.completed_folders = completed_folders
+        self.checkpoint_every = max(0, checkpoint_every)
+        # 上次检查点之后加入的产品数和上次检查点的时间
+        self.unsaved = 0
+        self.last_checkpoint = time.monotonic()
+        # 溢出写出在锁内进行，写出期间加入的同名产品不会错过合并
+        self.lock = threading.RLock()
+        # 产品文件名 → {"product": 产品数据, "folders": [产品文件夹], "saved": 检查点写出后未变化时为写出信息}
+        self.pending = {}
+        # 本批次写出的产品文件名 → {"sha256", "size", "mtime_ns", "products", "folders"}；溢出的产品 products 为 None
+        self.written = {}
+        # 溢出写出失败的产品文件夹，flush 时一并返回
+        self.failed = []
+
+    def add(self, product_folder_path, data):
+        """加入一个产品的提取结果，返回产品文件路径（写出在 flush 或溢出时进行）"""
+        product = build_product(data)
+        if self.identity is not None:
+            # 所有数据源的名称都登记为别名，商店ID优先于名称
+            application = self.identity.resolve(*source_identity_hints(data))
+            if application:
+                product["Application"] = application
+        filename = product_file_name(product["Application"])
+        if is_placeholder(product["Application"]):
+            # 没有识别出产品名（Unknown Product 等）的文件夹按文件夹区分，不同产品不会互相合并覆盖
+            filename = product_file_name(f"{product['Application']} {os.path.basename(os.path.normpath(product_folder_path))}")
+        with self.lock:
+            entry = self.pending.get(filename)
+            if entry is None and filename in self.written:
+                # 同一产品本批次已写出（溢出）：读回后合并，保证产品文件包含所有文件夹的数据
+                entry = {"product": self._load_written(filename), "folders": list(self.written[filename]["folders"])}
+                self.pending[filename] = entry
+            if entry is None:
+                # 同一产品的其他文件夹在之前的运行中已完成（续跑时被跳过）：以磁盘上的产品文件为基础合并，不丢失它们的数据
+                entry = self._load_existing(filename, product_folder_path)
+                if entry is not None:
+                    self.pending[filename] = entry
+            if entry is None:
+                self.pending[filename] = {"product": product, "folders": [product_folder_path]}
+            else:
+                merge_products(entry["product"], product)
+                entry["folders"].append(product_folder_path)
+                entry["saved"] = None
+                print(f"🔗 合并同一产品的多个文件夹: {product['Application']}")
+            print(f"📥 已加入批量聚合: {product['Application']}（内存中 {len(self.pending)} 个产品）")
+            self.unsaved += 1
+            if len(self.pending) > self.max_pending:
+                spill, self.pending = self.pending, {}
+                print(f"💽 内存中的产品超过 {self.max_pending} 个，先写出 {len(spill)} 个产品文件")
+                self.failed.extend(self._write_all(spill, keep_data=False))
+                self._checkpointed()
+            elif self.checkpoint_due():
+                self.checkpoint()
+        return os.path.join(self.output_dir, filename)
+
+    def checkpoint_due(self):
+        if not self.checkpoint_every or not self.unsaved:
+            return False
+        return (self.unsaved >= self.checkpoint_every
+                or time.monotonic() - self.last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS)
+
+    def checkpoint(self):
+        """写出内存中有变化的产品文件并记录检查点，产品数据仍保留在内存中"""
+        with self.lock:
+            changed = {filename: entry for filename, entry in self.pending.items() if not entry.get("saved")}
+            if changed:
+                print(f"📒 检查点: 写出 {len(changed)} 个有变化的产品文件")
+                os.makedirs(self.output_dir, exist_ok=True)
+                for filename, entry in changed.items():
+                    try:
+                        entry["saved"] = self._save_product(filename, entry)
+                    except Exception as e:
+                        # 结束时（flush）再重试写出
+                        print(f"⚠️ 检查点写出产品文件 {filename} 失败: {e}")
+            self._checkpointed()
+
+    def _checkpointed(self):
+        self.unsaved = 0
+        self.last_checkpoint = time.monotonic()
+        if self.identity is not None:
+            # 中断后续跑时，跳过的产品和重新提取的产品仍解析为同一个产品名
+            self.identity.save()
+
+    def _load_written(self, filename):
+        written = self.written[filename]
+        if written["products"] is not None:
+            return written["products"][0]
+        with open(os.path.join(self.output_dir, filename), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data[0] if isinstance(data, list) else data
+
+    def _load_existing(self, filename, product_folder_path):
+        """读取之前的运行写出的产品文件，没有其他已完成的文件夹或读取失败时返回 None"""
+        if self.completed_folders is None:
+            return None
+        product_path = os.path.join(self.output_dir, filename)
+        folder = os.path.abspath(product_folder_path)
+        folders = [other for other in self.completed_folders(product_path) if other != folder]
+        if not folders or not os.path.exists(product_path):
+            return None
+        try:
+            with open(product_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            product = data[0] if isinstance(data, list) else data
+        except Exception as e:
+            print(f"⚠️ 无法读取已有的产品文件 {filename}，将重新生成: {e}")
+            return None
+        print(f"🔗 合并之前已完成的 {len(folders)} 个文件夹的产品数据: {product.get('Application', filename)}")
+        # 这些文件夹随产品文件一起重新记录检查点
+        return {"product": product, "folders": folders}
+
+    def _save_product(self, filename, entry):
+        """写出一个产品文件（与 json.dump(indent=4) 格式一致），写出后才记录检查点，返回写出信息"""
+        content = json.dumps([entry["product"]], ensure_ascii=False, indent=4, default=json_default).encode('utf-8')
+        product_path = os.path.join(self.output_dir, filename)
+        # 临时文件 + 重命名写入，中断时不会留下写了一半的产品文件
+        atomic_write_bytes(product_path, content)
+        digest = hashlib.sha256(content).hexdigest()
+        stat = os.stat(product_path)
+        print(f"💾 产品数据已保存到: {product_path}")
+        if self.on_written:
+            for folder_path in entry["folders"]:
+                self.on_written(folder_path, product_path, digest)
+        return {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _write_product(self, filename, entry, keep_data):
+        """写出产品文件并登记到本批次写出的产品；检查点写出后没有再变化的产品不重复写出"""
+        saved = entry.get("saved") or self._save_product(filename, entry)
+        with self.lock:
+            self.written[filename] = dict(saved, products=[entry["product"]] if keep_data else None,
+                                          folders=entry["folders"])
+
+    def _write_all(self, entries, keep_data):
+        """写出一组产品文件，返回写出失败的产品文件夹"""
+        failed = []
+        os.makedirs(self.output_dir, exist_ok=True)
+        for filename, entry in entries.items():
+            try:
+                self._write_product(filename, entry, keep_data)
+            except Exception as e:
+                print(f"❌ 写出产品文件 {filename} 失败: {e}")
+                failed.extend(entry["folders"])
+        return failed
+
+    def flush(self):
+        """写出内存中剩余的产品文件（产品数据保留给合并文件使用），返回写出失败的产品文件夹"""
+        with self.lock:
+            entries, self.pending = self.pending, {}
+            failed, self.failed = self.failed, []
+        if entries:
+            unchanged = sum(1 for entry in entries.values() if entry.get("saved"))
+            print(f"\n💾 批量写出 {len(entries) - unchanged} 个产品文件（{unchanged} 个在检查点写出后没有变化）")
+            failed += self._write_all(entries, keep_data=True)
+        with self.lock:
+            self._checkpointed()
+        return failed
+
+    def take_written(self):
+        """取出本批次写出的产品文件信息（交给分离器和数据集后释放内存）"""
+        with self.lock:
+            written, self.written = self.written, {}
+        return written
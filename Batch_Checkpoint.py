@@ -0,0 +1,91 @@
+"""
+批处理检查点 - Batch Checkpoint
+功能：记录每个产品的完成状态，中断后可以从断点继续
+- 日志为追加写入的 JSON Lines，每完成一个产品写入一行并立即落盘
+- 崩溃时最多丢失最后一行（不完整的行在加载时被忽略）
+- 记录输入文件指纹和输出文件哈希，输入变化或输出被改动的产品会重新处理
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+from Backup_Manager import file_sha256
+from Html_Input_Source import scan_html_files
+
+
+def folder_fingerprint(folder_path):
+    """产品文件夹的输入指纹：所有HTML文件的名称、大小和修改时间"""
+    return sorted([name, stat.st_size, stat.st_mtime_ns] for name, _, stat in scan_html_files(folder_path))
+
+
+class BatchCheckpoint:
+    """批处理检查点日志"""
+
+    def __init__(self, journal_path, resume=False):
+        self.journal_path = journal_path
+        self.resume = resume
+        self.lock = threading.Lock()
+        self.entries = self._load() if resume else {}
+        if not resume and os.path.exists(journal_path):
+            # 新的批处理从空日志开始
+            os.remove(journal_path)
+
+    def _load(self):
+        """加载日志，同一产品以最后一条记录为准"""
+        entries = {}
+        if not os.path.exists(self.journal_path):
+            return entries
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        for line in content.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 崩溃时写了一半的行
+                continue
+            entries[entry["folder"]] = entry
+        if content and not content.endswith('\n'):
+            # 结束不完整的行，后续追加的记录从新行开始
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write('\n')
+        print(f"📒 检查点日志: {len(entries)} 个产品已有完成记录")
+        return entries
+
+    def is_complete(self, folder_path):
+        """产品在上次运行中已完成，且输入未变化、输出文件未被改动"""
+        entry = self.entries.get(os.path.abspath(folder_path))
+        if not entry:
+            return False
+        try:
+            if entry["inputs"] != folder_fingerprint(folder_path):
+                return False
+            output_path = entry["output"]
+            return os.path.exists(output_path) and file_sha256(output_path) == entry["sha256"]
+        except Exception:
+            return False
+
+    def folders_for_output(self, output_path):
+        """最后一次完成记录写入了该输出文件的产品文件夹"""
+        output_path = os.path.abspath(output_path)
+        with self.lock:
+            return [folder for folder, entry in self.entries.items() if entry["output"] == output_path]
+
+    def record(self, folder_path, output_path, sha256=None):
+        """记录产品完成，写入后立即落盘（sha256 为调用方已知的输出文件哈希，省去重新读取）"""
+        entry = {
+            "folder": os.path.abspath(folder_path),
+            "inputs": folder_fingerprint(folder_path),
+            "output": os.path.abspath(output_path),
+            "sha256": sha256 or file_sha256(output_path),
+            "completed_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[entry["folder"]] = entry
@@ -9,142 +9,180 @@
 import os
 import json
 import shutil
+import tempfile
 import subprocess
 import sys
+import argparse
+import contextlib
 from datetime import datetime
 import re
 from pathlib import Path
 
 import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from Async_Batch_Pipeline import AsyncBatchPipeline, DEFAULT_PREFETCH_PRODUCTS
+from Batch_Aggregator import BatchAggregator, DEFAULT_MAX_PENDING_PRODUCTS, DEFAULT_CHECKPOINT_EVERY
+from Backup_Manager import file_sha256
+from Batch_Checkpoint import BatchCheckpoint
+from Extraction_Cache import ExtractionCache, DEFAULT_CACHE_SIZE_MB
+from Extraction_Profiler import ExtractionProfiler, PROFILE_DIR, BATCH_PROFILE_NAME, DEFAULT_SAMPLE_INTERVAL_MS
+from Folder_Watcher import FolderWatcher, DEFAULT_DEBOUNCE_SECONDS, DEFAULT_POLL_INTERVAL, DEFAULT_REPORT_INTERVAL
+from Html_File_Classifier import sniff_file_type, identify_file_type_by_name
+from Html_Input_Source import (list_input_products, scan_html_files, stat_html_file, split_archive_path,
+                               open_html_binary, html_base_name, close_archives)
+from Html_Minimizer import HtmlMinimizer
+from Memory_Monitor import MemoryMonitor, format_mb
+from Product_Identity import ProductIdentityIndex
+from Product_Ranking_Report import write_ranking_report, default_source, REPORT_FILE as RANKING_REPORT_FILE
+from Product_Scheduler import ProductScheduler, split_files_by_platform, DEFAULT_READ_WORKERS
+from Retention_Curve_Analytics import RetentionCurves, REPORT_FILE as RETENTION_REPORT_FILE
+from Run_Manifest import RunManifest
+from Safe_File_Writer import atomic_write_json
+from Simple_Data_Separator import SimpleDataSeparator
+
+# 抓取脚本所在目录（脚本在此目录下运行并输出中间文件）
+SCRIPTS_DIR = "E:\\dataAI"
+# 最终产品数据输出目录
+FINAL_OUTPUT_DIR = r"D:\Users\Mussy\Desktop\result"
 
 class SmartProductProcessor:
-    def __init__(self, base_input_path, base_output_path="E:\\dataAI\\batch_results"):
+    def __init__(self, base_input_path, base_output_path="E:\\dataAI\\batch_results", cleaning_rules_file=None,
+                 in_process_extraction=True, workers=None, read_workers=DEFAULT_READ_WORKERS,
+                 use_async=True, prefetch_products=DEFAULT_PREFETCH_PRODUCTS, resume=False,
+                 memory_budget_mb=None, minimize_html=True, use_cache=True, cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+                 rankings_file=None, max_pending_products=DEFAULT_MAX_PENDING_PRODUCTS,
+                 checkpoint_every=DEFAULT_CHECKPOINT_EVERY, profile=False, profile_samples=False, profile_interval_ms=DEFAULT_SAMPLE_INTERVAL_MS, profile_top=0):
         self.base_input_path = base_input_path
         self.base_output_path = base_output_path
+        self.cleaning_rules_file = cleaning_rules_file
+        # 排名报告的规则文件，None 表示使用内置排名
+        self.rankings_file = rankings_file
+        # 进程内提取：并发读取产品文件并在进程池中解析；False 时按脚本逐个启动子进程
+        self.in_process_extraction = in_process_extraction
+        self.workers = workers
+        self.read_workers = read_workers
+        # 异步前端：目录扫描、预读和解析相互重叠（仅用于进程内提取）
+        self.use_async = use_async
+        self.prefetch_products = prefetch_products
+        # 检查点：resume 为 True 时跳过上次已完成的产品，批处理开始时创建
+        self.resume = resume
+        self.checkpoint = None
+        # 内存监控：记录每个产品的峰值内存；设置预算（MB）时超出预算会暂停读取和解析
+        self.memory = MemoryMonitor(memory_budget_mb)
+        # 解析前裁掉抓取脚本不读取的HTML内容（仅用于进程内提取），None 表示关闭
+        self.minimizer = HtmlMinimizer() if minimize_html else None
+        # 提取结果缓存：HTML内容和抓取脚本都未变化时跳过解析（仅用于进程内提取），None 表示关闭
+        self.cache = ExtractionCache(os.path.join(FINAL_OUTPUT_DIR, ".extraction_cache"), cache_size_mb) if use_cache else None
+        # 性能分析：各提取阶段计时；采样模式下每个产品写出折叠栈文件（火焰图输入），None 表示关闭
+        self.profiler = None
+        if profile or profile_samples:
+            self.profiler = ExtractionProfiler(os.path.join(FINAL_OUTPUT_DIR, PROFILE_DIR),
+                                               profile_interval_ms / 1000 if profile_samples else None)
+        # 批处理结束时列出自身耗时最多的函数个数，0 表示不列出
+        self.profile_top = profile_top
+        # 运行清单：缓存文件类型识别结果，文件未变化时不再重复扫描
+        self.manifest = RunManifest(os.path.join(FINAL_OUTPUT_DIR, ".run_manifest.json"))
         self.script_mappings = {
             'main_allplatform': 'Grabbed_Aggregated_Analytics_Data.py',
             'user_behavior': 'User_Behavior_Scraper.py',
-            'revenue': 'Revenue_Scraper.py'
+            'revenue': 'Revenue_Scraper.py',
+            'user_retention': 'User_Retention_Scraper.py'
         }
+        # 整个批处理共享的解析进程池，首次使用时创建
+        self.worker_pool = None
+        # 产品身份索引：规范化名称、商店ID和别名 → 产品名，不同数据源和文件夹中的同一产品合并到同一个产品文件
+        self.identity = ProductIdentityIndex(os.path.join(FINAL_OUTPUT_DIR, ".product_identity.json"))
+        # 批量聚合：提取结果先留在内存中，批处理结束时统一写出产品文件和合并文件
+        self.aggregator = BatchAggregator(FINAL_OUTPUT_DIR, self.complete_product, max_pending_products, self.identity,
+                                          self.completed_folders, checkpoint_every)
     
-    def get_folders_to_process(self):
-        """获取需要处理的文件夹列表"""
-        folders = []
+    def find_product_folders(self):
+        """
+        扫描输入目录，返回需要处理的产品文件夹列表
+        输入目录直接包含HTML文件时为单个产品模式，否则每个子文件夹是一个产品
+        zip归档中每个包含HTML文件的目录也是一个产品
+        """
         try:
-            for item in os.listdir(self.base_input_path):
-                item_path = os.path.join(self.base_input_path, item)
-                if os.path.isdir(item_path):
-                    folders.append(item_path)
+            folders, html_in_root = list_input_products(self.base_input_path)
         except Exception as e:
             print(f"❌ 读取文件夹时出错: {e}")
+            return []
+        
+        if html_in_root:
+            print("🎯 检测到单个产品模式 - 输入文件夹直接包含HTML文件")
+            print("=" * 80)
+            return [self.base_input_path]
+        
+        if not folders:
+            print(f"❌ 输入文件夹中既没有HTML文件，也没有子文件夹或归档: {self.base_input_path}")
+            return []
         
+        print(f"🎯 检测到批量产品模式 - 找到 {len(folders)} 个产品文件夹")
+        print("=" * 80)
         return folders
     
     def identify_file_type(self, filename):
-        """识别HTML文件类型"""
-        filename_lower = filename.lower()
-        if '行为' in filename or 'behavior' in filename_lower or 'behaviour' in filename_lower or 'userbehavior' in filename_lower or 'userbehaivor' in filename_lower:
-            return 'user_behavior'
-        elif '收入' in filename or 'revenue' in filename_lower:
-            return 'revenue'
-        elif 'allplatform' in filename_lower or '全平台' in filename or '下载量' in filename:
-            return 'main_allplatform'
-        else:
-            return 'unknown'
+        """识别HTML文件类型（仅根据文件名）"""
+        return identify_file_type_by_name(filename)
+    
+    def classify_file(self, file_path, stat=None):
+        """
+        识别HTML文件类型，返回 (类型, 识别方式)
+        优先使用运行清单缓存，其次扫描文件内容标记，最后回退到文件名规则
+        stat: 目录扫描时已获得的文件状态，可省去一次 stat 调用
+        """
+        try:
+            stat = stat or stat_html_file(file_path)
+            cached_type = self.manifest.get_file_type(file_path, stat)
+            if cached_type:
+                return cached_type, '缓存'
+            
+            file_type = sniff_file_type(file_path)
+            method = '内容识别'
+            if not file_type:
+                file_type = self.identify_file_type(os.path.basename(file_path))
+                method = '文件名识别'
+            
+            self.manifest.set_file_type(file_path, file_type, method, stat)
+            return file_type, method
+        except Exception as e:
+            print(f"⚠️ 内容识别失败，使用文件名识别 {os.path.basename(file_path)}: {e}")
+            return self.identify_file_type(os.path.basename(file_path)), '文件名识别'
     
     def extract_product_name(self, filename):
-        """从文件名提取产品名称"""
-        # 简单的产品名提取，可以根据需要优化
-        name_parts = filename.replace('.html', '').split('_')
-        if name_parts:
-            return name_parts[0]
-        return "Unknown Product"
+        """
+        从文件名提取产品名称：另存网页时标题中的 " | " 变为 " _ "，取第一段
+        （产品名本身的 ":" 也会变为 "_"，不能按 "_" 拆分）；产品身份索引中有记录时使用索引中的产品名
+        """
+        name = re.split(r'\s+_\s+', html_base_name(filename).replace('.html', ''))[0].strip()
+        return self.identity.lookup(name) or name or "Unknown Product"
     
     def analyze_folder_files(self, folder_path):
-        """分析文件夹中的HTML文件"""
+        """分析文件夹中的HTML文件（包括压缩文件和归档内的文件）"""
         html_files = []
         
-        for file in os.listdir(folder_path):
-            if file.endswith('.html'):
-                file_type = self.identify_file_type(file)
-                product_name = self.extract_product_name(file)
-                
-                html_files.append({
-                    'filename': file,
-                    'filepath': os.path.join(folder_path, file),
-                    'file_type': file_type,
-                    'product_name': product_name,
-                    'script': self.script_mappings.get(file_type, 'unknown')
-                })
-                
-                print(f"  📄 {file} → {self.script_mappings.get(file_type, '未知脚本')}")
+        for file, file_path, stat in scan_html_files(folder_path):
+            file_type, method = self.classify_file(file_path, stat)
+            product_name = self.extract_product_name(file)
+            
+            html_files.append({
+                'filename': file,
+                'filepath': file_path,
+                'file_type': file_type,
+                'product_name': product_name,
+                'script': self.script_mappings.get(file_type, 'unknown')
+            })
+            
+            print(f"  📄 {file} → {self.script_mappings.get(file_type, '未知脚本')} ({method})")
         
+        self.manifest.save()
         return html_files
     
-    def update_script_path(self, script_name, files):
-        """更新脚本中的HTML文件路径"""
-        try:
-            script_path = os.path.join("E:\\dataAI", script_name)
-            backup_path = script_path + ".backup"
-            
-            # 备份原文件
-            shutil.copy2(script_path, backup_path)
-            
-            # 读取脚本内容
-            with open(script_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if script_name in ['User_Behavior_Scraper.py']:
-                # 多平台脚本 - 更新html_files字典
-                android_file = None
-                ios_file = None
-                
-                for file_info in files:
-                    if 'android' in file_info['filename'].lower() or '安卓' in file_info['filename']:
-                        android_file = file_info['filepath'].replace('\\', '\\\\')
-                    elif 'ios' in file_info['filename'].lower() or '苹果' in file_info['filename']:
-                        ios_file = file_info['filepath'].replace('\\', '\\\\')
-                    else:
-                        # 如果没有明确的平台标识，默认为Android
-                        if not android_file:
-                            android_file = file_info['filepath'].replace('\\', '\\\\')
-                
-                if android_file or ios_file:
-                    # 构建新的html_files字典
-                    new_html_files = "html_files = {\n"
-                    if android_file:
-                        new_html_files += f'    "Android": r"{android_file}",\n'
-                    if ios_file:
-                        new_html_files += f'    "iOS": r"{ios_file}"\n'
-                    new_html_files += "}"
-                    
-                    # 替换html_files字典
-                    pattern = r'html_files\s*=\s*\{[^}]*\}'
-                    content = re.sub(pattern, new_html_files, content, flags=re.DOTALL)
-            
-            else:
-                # 单平台脚本 - 更新html_file_path变量
-                if files:
-                    file_path = files[0]['filepath'].replace('\\', '\\\\')
-                    pattern = r'html_file_path\s*=\s*r?"[^"]*"'
-                    replacement = f'html_file_path = r"{file_path}"'
-                    content = re.sub(pattern, replacement, content)
-            
-            # 写回文件
-            with open(script_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            print(f"✅ 更新脚本路径: {script_name}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ 更新脚本路径失败 {script_name}: {e}")
-            return False
-    
     def restore_script_backup(self, script_name):
         """恢复脚本备份"""
         try:
-            script_path = os.path.join("E:\\dataAI", script_name)
+            script_path = os.path.join(SCRIPTS_DIR, script_name)
             backup_path = script_path + ".backup"
             
             if os.path.exists(backup_path):
@@ -155,14 +193,62 @@ class SmartProductProcessor:
         except Exception as e:
             print(f"❌ 恢复脚本失败 {script_name}: {e}")
     
-    def run_script(self, script_name):
-        """运行脚本"""
+    def recover_script_backups(self):
+        """恢复旧版本运行中断时遗留的脚本备份（旧版本通过改写脚本传递HTML路径）"""
+        for script_name in self.script_mappings.values():
+            if os.path.exists(os.path.join(SCRIPTS_DIR, script_name + ".backup")):
+                print(f"⚠️ 发现上次运行遗留的脚本备份: {script_name}")
+                self.restore_script_backup(script_name)
+    
+    def create_scratch_dir(self):
+        """为一次产品提取创建独立的临时目录，脚本在其中运行并输出中间文件"""
+        scratch_root = os.path.join(self.base_output_path, ".scratch")
+        os.makedirs(scratch_root, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f"job_{os.getpid()}_", dir=scratch_root)
+    
+    def materialize_inputs(self, files, scratch_dir):
+        """
+        脚本只能读取普通HTML文件：把压缩文件和归档内的文件解压到临时目录
+        返回替换了路径的文件信息列表
+        """
+        materialized = []
+        for file_info in files:
+            file_path = file_info['filepath']
+            if split_archive_path(file_path)[1] is None and file_path.lower().endswith('.html'):
+                materialized.append(file_info)
+                continue
+            target = os.path.join(scratch_dir, html_base_name(file_info['filename']))
+            with open_html_binary(file_path) as source, open(target, 'wb') as f:
+                shutil.copyfileobj(source, f)
+            materialized.append(dict(file_info, filepath=target))
+        return materialized
+    
+    def script_arguments(self, script_name, files):
+        """HTML路径通过命令行参数传给脚本，返回每次运行的参数列表"""
+        if script_name == 'User_Behavior_Scraper.py':
+            # 多平台脚本 - 一次运行处理全部平台
+            platform_files = split_files_by_platform(files)
+            arguments = ['--unified-dir', '.']
+            if 'Android' in platform_files:
+                arguments += ['--android', platform_files['Android']]
+            if 'iOS' in platform_files:
+                arguments += ['--ios', platform_files['iOS']]
+            return [arguments]
+        elif script_name == 'Revenue_Scraper.py':
+            # Revenue脚本需要单独处理每个平台
+            return [[file_info['filepath']] for file_info in files]
+        else:
+            # 单文件脚本
+            return [[files[0]['filepath']]]
+    
+    def run_script(self, script_name, arguments, work_dir):
+        """在指定目录中运行脚本"""
         try:
-            script_path = os.path.join("E:\\dataAI", script_name)
+            script_path = os.path.join(SCRIPTS_DIR, script_name)
             print(f"🚀 运行: {script_name}")
             
-            result = subprocess.run([sys.executable, script_path], 
-                                  cwd="E:\\dataAI")
+            result = subprocess.run([sys.executable, script_path] + arguments, 
+                                  cwd=work_dir)
             
             if result.returncode == 0:
                 print(f"✅ {script_name} 运行成功")
@@ -175,13 +261,34 @@ class SmartProductProcessor:
             print(f"❌ 运行脚本失败 {script_name}: {e}")
             return False
     
-    def process_revenue_files_separately(self, files):
-        """单独处理Revenue文件"""
-        for file_info in files:
-            print(f"🚀 处理Revenue文件: {file_info['filename']}")
-            if self.update_script_path('Revenue_Scraper.py', [file_info]):
-                self.run_script('Revenue_Scraper.py')
-                self.restore_script_backup('Revenue_Scraper.py')
+    def get_worker_pool(self):
+        """获取批处理共享的解析进程池"""
+        if self.worker_pool is None:
+            self.worker_pool = ProcessPoolExecutor(max_workers=self.workers or os.cpu_count() or 1)
+        return self.worker_pool
+    
+    def close_worker_pool(self):
+        """关闭解析进程池"""
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+            self.worker_pool = None
+    
+    def extract_in_process(self, html_files, product=None):
+        """
+        并发读取产品的HTML文件，并在共享进程池中解析
+        返回 {数据类型: 数据}，见 ProductScheduler.run
+        """
+        try:
+            worker_pool = self.get_worker_pool()
+        except Exception as e:
+            print(f"⚠️ 无法创建进程池，改为在当前进程中解析: {e}")
+            worker_pool = None
+        scheduler = ProductScheduler(worker_pool, self.read_workers, self.memory, self.minimizer, self.cache, self.profiler)
+        return scheduler.run(html_files, product)
+    
+    def profile_phase(self, phase):
+        """主进程中批处理阶段的计时（未开启性能分析时不计时）"""
+        return self.profiler.phase('batch', phase) if self.profiler else contextlib.nullcontext()
     
     def process_product_folder(self, product_folder_path):
         """处理单个产品文件夹"""
@@ -196,6 +303,11 @@ class SmartProductProcessor:
                 print(f"⚠️ 文件夹中没有HTML文件: {folder_name}")
                 return False
             
+            if self.in_process_extraction:
+                # 并发读取全部文件并在进程池中解析，不启动子进程、不经过中间文件
+                print(f"⚡ 进程内提取 {len(html_files)} 个文件")
+                return self.finish_extracted_product(product_folder_path, self.extract_in_process(html_files, folder_name))
+            
             # 按脚本分组处理
             script_groups = {}
             for file_info in html_files:
@@ -207,22 +319,27 @@ class SmartProductProcessor:
             
             print(f"🔧 需要运行 {len(script_groups)} 个脚本")
             
-            # 处理每个脚本组
-            for script, files in script_groups.items():
-                print(f"🚀 处理脚本: {script}")
+            # 每个产品使用独立的临时目录，并发或重复运行互不干扰
+            scratch_dir = self.create_scratch_dir()
+            try:
+                retention_files = []
+                for script, files in script_groups.items():
+                    print(f"🚀 处理脚本: {script}")
+                    
+                    if script == 'User_Retention_Scraper.py':
+                        # 留存页面始终在进程内解析，不启动子进程
+                        retention_files = files
+                        continue
+                    files = self.materialize_inputs(files, scratch_dir)
+                    for arguments in self.script_arguments(script, files):
+                        self.run_script(script, arguments, scratch_dir)
                 
-                if script == 'Revenue_Scraper.py':
-                    # Revenue脚本需要单独处理每个平台
-                    self.process_revenue_files_separately(files)
-                else:
-                    # 其他脚本支持双平台
-                    if self.update_script_path(script, files):
-                        self.run_script(script)
-                        self.restore_script_backup(script)
-            
-            # 直接保存产品数据并清理原始文件
-            self.save_product_data_from_aggregator()
-            self.cleanup_raw_data()
+                data = self.load_script_outputs(scratch_dir)
+                data['user_retention'] = self.extract_in_process(retention_files).get('user_retention')
+                self.aggregator.add(product_folder_path, data)
+            finally:
+                # 中间文件随临时目录一起删除
+                shutil.rmtree(scratch_dir, ignore_errors=True)
             
             return True
             
@@ -230,195 +347,244 @@ class SmartProductProcessor:
             print(f"❌ 处理产品文件夹时出错: {e}")
             return False
     
-    def save_product_data_from_aggregator(self):
-        """直接从各个脚本输出生成产品数据文件"""
-        print("🔄 生成最终聚合数据...")
+    def finish_extracted_product(self, product_folder_path, results):
+        """把进程内提取的结果（ProductScheduler 的输出）交给批量聚合，返回是否成功"""
+        data = {
+            'grabbed': results.get('main_allplatform'),
+            'revenue': results.get('revenue'),
+            'user_behavior': results.get('user_behavior'),
+            'user_retention': results.get('user_retention')
+        }
+        with self.profile_phase('aggregate'):
+            self.aggregator.add(product_folder_path, data)
+        if self.profiler:
+            self.profiler.finish_product(os.path.basename(product_folder_path))
+        return True
+    
+    def complete_product(self, product_folder_path, product_path, sha256=None):
+        """产品文件写入成功后记录检查点（sha256 为已知的文件内容哈希）"""
+        if not product_path:
+            return False
+        if self.checkpoint:
+            try:
+                self.checkpoint.record(product_folder_path, product_path, sha256)
+            except Exception as e:
+                print(f"⚠️ 记录检查点失败: {e}")
+        return True
+    
+    def start_checkpoint(self):
+        """打开检查点日志，非续跑模式下从空日志开始"""
+        self.checkpoint = BatchCheckpoint(os.path.join(FINAL_OUTPUT_DIR, ".batch_checkpoint.jsonl"), self.resume)
+    
+    def completed_folders(self, product_path):
+        """续跑时之前的运行中已写入该产品文件、且仍然完成的产品文件夹（同一产品的其他文件夹被重新处理时一起合并）"""
+        if not (self.resume and self.checkpoint):
+            return []
+        # 输入已变化的文件夹会重新提取，提取成功时再单独加入
+        return [folder for folder in self.checkpoint.folders_for_output(product_path)
+                if self.checkpoint.is_complete(folder)]
+    
+    def is_product_complete(self, product_folder_path):
+        """续跑时判断产品是否已在上次运行中完成"""
+        return bool(self.resume and self.checkpoint and self.checkpoint.is_complete(product_folder_path))
+    
+    def load_script_outputs(self, scratch_dir):
+        """加载子进程脚本在临时目录中输出的中间文件"""
+        files = {
+            'grabbed': 'Aggregated_Analytics_Data.json',
+            'revenue': 'PolyBuzz_Revenue_Aggregated_Analytics_Data.json',
+            'user_behavior': 'User_Behavior_Combined_Analytics_Data.json'
+        }
         
-        try:
-            # 直接从各个脚本的输出文件整合数据
-            files = {
-                'grabbed': 'Aggregated_Analytics_Data.json',
-                'revenue': 'PolyBuzz_Revenue_Aggregated_Analytics_Data.json',
-                'user_behavior': 'User_Behavior_Combined_Analytics_Data.json'
-            }
-            
-            # 加载数据文件
-            data = {}
-            for key, file_path in files.items():
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data[key] = json.load(f)
-                    except:
-                        data[key] = None
-                else:
+        data = {}
+        for key, file_name in files.items():
+            file_path = os.path.join(scratch_dir, file_name)
+            if os.path.exists(file_path):
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        data[key] = json.load(f)
+                except:
                     data[key] = None
-            
-            # 获取应用名称
-            app_name = "Unknown_Application"
-            for source_data in data.values():
-                if source_data and isinstance(source_data, dict):
-                    if 'Application' in source_data:
-                        app_name = source_data['Application']
-                        break
-                elif source_data and isinstance(source_data, list) and len(source_data) > 0:
-                    if 'Application' in source_data[0]:
-                        app_name = source_data[0]['Application']
-                        break
-            
-            # 创建聚合数据结构
-            aggregated_data = [{
-                "Application": app_name,
-                "Last Updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "Data Sources": {
-                    "Downloads & Basic Metrics": "Available" if data['grabbed'] else "Not Available",
-                    "Revenue Data": "Available" if data['revenue'] else "Not Available", 
-                    "User Behavior Data": "Available" if data['user_behavior'] else "Not Available"
-                },
-                "Platforms": self.build_platform_data(data)
-            }]
-            
-            # 清理产品名称，用于文件名
-            import re
-            clean_name = re.sub(r'[^\w\s-]', '', app_name).strip()
-            clean_name = re.sub(r'[-\s]+', '_', clean_name)
-            
-            # 直接保存到最终输出目录
-            final_output_dir = r"D:\Users\Mussy\Desktop\result"
-            os.makedirs(final_output_dir, exist_ok=True)
-            
-            product_file = f"Product_{clean_name}_Data.json"
-            product_path = os.path.join(final_output_dir, product_file)
-            
-            with open(product_path, 'w', encoding='utf-8') as f:
-                json.dump(aggregated_data, f, ensure_ascii=False, indent=4)
-            
-            print(f"✅ 最终聚合数据生成成功")
-            print(f"💾 产品数据已保存到: {product_path}")
-                
+            else:
+                data[key] = None
+        return data
+    
+    def write_combined_outputs(self, written_products=None):
+        """
+        生成完整/不完整合并文件和内存映射数据集
+        written_products: 本批次写出的产品文件（BatchAggregator.take_written），其中的产品不再从磁盘重新读取
+        """
+        try:
+            separator = SimpleDataSeparator(FINAL_OUTPUT_DIR, written_products=written_products)
+            if separator.separate_products() and separator.save_separated_data():
+                print("✅ 数据分离成功")
+            else:
+                print("❌ 数据分离失败")
         except Exception as e:
-            print(f"❌ 生成最终聚合数据时出错: {e}")
+            print(f"❌ 运行数据分离器失败: {e}")
     
-    def build_platform_data(self, data):
-        """构建平台数据结构"""
-        platforms = {}
-        
-        # 从grabbed数据获取基础平台结构
-        if data['grabbed'] and isinstance(data['grabbed'], list) and len(data['grabbed']) > 0:
-            base_app_data = data['grabbed'][0]
-            platforms = base_app_data.get('Platforms', {})
-        
-        # 添加用户行为数据
-        if data['user_behavior'] and 'Platforms' in data['user_behavior']:
-            for platform_name, behavior_data in data['user_behavior']['Platforms'].items():
-                if platform_name not in platforms:
-                    platforms[platform_name] = {}
-                
-                # 添加用户行为数据
-                if 'User Behavior Data' in behavior_data:
-                    platforms[platform_name]['User Behavior by Country'] = behavior_data['User Behavior Data']
-        
-        return platforms
+    def finish_batch(self, successful_products, run_reports=True):
+        """
+        批处理（或监视模式的一轮）结束：写出产品文件，按规则清理，再写出合并文件和分析报告
+        run_reports=False 时不生成覆盖全部产品的分析报告（监视模式按时间间隔单独调用 run_reports）
+        返回产品文件成功写出的产品文件夹名
+        """
+        # 采样模式下结束阶段（写产品文件、合并文件、报告）单独写出一个折叠栈文件
+        sampling = self.profiler.sampling(BATCH_PROFILE_NAME) if self.profiler else contextlib.nullcontext()
+        with sampling:
+            with self.profile_phase('write_products'):
+                failed = {os.path.basename(folder) for folder in self.aggregator.flush()}
+            successful_products = [name for name in successful_products if name not in failed]
+            
+            written_products = self.aggregator.take_written()
+            # 先按规则清理本批次写出的产品文件，被清理改写的产品文件在写合并文件时重新读取
+            cleaned = bool(successful_products and self.cleaning_rules_file and written_products)
+            if cleaned:
+                print(f"\n🧽 按规则文件清理产品数据: {self.cleaning_rules_file}")
+                with self.profile_phase('cleaning_rules'):
+                    self.run_cleaning_rules([os.path.join(FINAL_OUTPUT_DIR, filename) for filename in written_products])
+                self.record_cleaned_products(written_products)
+            if successful_products:
+                print(f"\n🔄 生成合并文件（本批次 {len(successful_products)} 个产品）...")
+                with self.profile_phase('combined_outputs'):
+                    self.write_combined_outputs(written_products)
+                if run_reports:
+                    self.run_reports()
+        return successful_products
+    
+    def run_reports(self):
+        """生成覆盖全部产品的分析报告（留存曲线、排名）"""
+        with self.profile_phase('retention_analytics'):
+            self.run_retention_analytics()
+        with self.profile_phase('ranking_report'):
+            self.run_ranking_report()
+    
+    def record_cleaned_products(self, written_products):
+        """
+        清理规则改写了产品文件时按清理后的文件哈希重新记录检查点，
+        否则续跑或监视模式重启时哈希不符，已清理的产品会被重新提取
+        """
+        for filename, written in written_products.items():
+            product_path = os.path.join(FINAL_OUTPUT_DIR, filename)
+            try:
+                sha256 = file_sha256(product_path)
+            except OSError:
+                continue
+            if sha256 != written["sha256"]:
+                for folder_path in written["folders"]:
+                    self.complete_product(folder_path, product_path, sha256)
     
-    def run_simple_data_separator(self):
-        """运行简单数据分离器"""
+    def run_retention_analytics(self):
+        """批量拟合所有产品的留存曲线，写入留存曲线报告"""
         try:
-            separator_path = os.path.join("E:\\dataAI", "Simple_Data_Separator.py")
-            if os.path.exists(separator_path):
-                result = subprocess.run([sys.executable, separator_path], cwd="E:\\dataAI")
-                if result.returncode == 0:
-                    print("✅ 数据分离成功")
-                else:
-                    print("❌ 数据分离失败")
+            curves = RetentionCurves.from_source(FINAL_OUTPUT_DIR)
+            if not curves.applications:
+                print("⚠️ 没有留存数据，跳过留存曲线分析")
+                return
+            report_path = os.path.join(FINAL_OUTPUT_DIR, RETENTION_REPORT_FILE)
+            curves.write_report(report_path)
+            print(f"📉 留存曲线分析完成: {len(curves.applications)} 个产品平台 → {report_path}")
+        except Exception as e:
+            print(f"❌ 留存曲线分析失败: {e}")
+    
+    def run_ranking_report(self):
+        """按排名规则生成跨产品排名和同类百分位报告"""
+        try:
+            report_path = os.path.join(FINAL_OUTPUT_DIR, RANKING_REPORT_FILE)
+            count = write_ranking_report(default_source(FINAL_OUTPUT_DIR), report_path, self.rankings_file)
+            if count:
+                print(f"🏆 排名报告完成: {count} 个产品平台 → {report_path}")
             else:
-                print("❌ 简单数据分离器不存在")
+                print("⚠️ 没有产品数据，跳过排名报告")
         except Exception as e:
-            print(f"❌ 运行数据分离器失败: {e}")
+            print(f"❌ 生成排名报告失败: {e}")
     
-    def cleanup_raw_data(self):
-        """清理原始数据文件"""
-        print("🧹 清理原始数据文件...")
-        
+    def run_cleaning_rules(self, product_files=None):
+        """
+        批处理完成后按规则文件无人值守清理产品文件
+        product_files: 要清理的产品文件（本批次写出的产品），None 时清理结果目录中的所有产品文件
+        """
         try:
-            main_dir = "E:\\dataAI"
-            
-            # 删除原始JSON文件
-            json_patterns = [
-                'Aggregated_Analytics_Data.json',
-                'User_Behavior_*.json',
-                'PolyBuzz_*.json'
-            ]
-            
-            cleaned_files = 0
-            for pattern in json_patterns:
-                for file_path in glob.glob(os.path.join(main_dir, pattern)):
-                    os.remove(file_path)
-                    cleaned_files += 1
-                    print(f"🗑️ 删除: {os.path.basename(file_path)}")
+            cleaner_path = os.path.join(SCRIPTS_DIR, "Data_Cleaner.py")
+            if product_files is None:
+                product_files = glob.glob(os.path.join(FINAL_OUTPUT_DIR, "Product_*_Data.json"))
+            if not product_files:
+                print("⚠️ 没有需要清理的产品文件")
+                return
             
-            print(f"✅ 清理完成，删除了 {cleaned_files} 个原始文件")
+            command = [sys.executable, cleaner_path, '--rules', self.cleaning_rules_file, '--stream']
+            for product_file in product_files:
+                command.extend(['--data-file', product_file])
             
+            result = subprocess.run(command, cwd=SCRIPTS_DIR)
+            if result.returncode == 0:
+                print(f"✅ 已按规则清理 {len(product_files)} 个产品文件")
+            else:
+                print("❌ 按规则清理失败")
         except Exception as e:
-            print(f"❌ 清理过程中出错: {e}")
+            print(f"❌ 运行数据清理器失败: {e}")
     
-
     def process_all_folders(self):
         """智能处理输入文件夹 - 自动判断单个产品还是多个产品"""
+        # 上次运行中断时可能留下被改写的抓取脚本
+        self.recover_script_backups()
+        self.start_checkpoint()
+        self.memory.start()
+        if self.memory.budget_bytes:
+            print(f"🧠 内存预算: {format_mb(self.memory.budget_bytes)}")
         
-        
-        # 先检查输入文件夹是否直接包含HTML文件
-        html_files_in_root = [f for f in os.listdir(self.base_input_path) 
-                             if f.endswith('.html') and os.path.isfile(os.path.join(self.base_input_path, f))]
-        
-        if html_files_in_root:
-            # 如果根目录直接包含HTML文件，说明这是单个产品文件夹
-            print("🎯 检测到单个产品模式 - 输入文件夹直接包含HTML文件")
-            print("=" * 80)
-            success = self.process_product_folder(self.base_input_path)
-            
-            if success:
-                successful_products = [os.path.basename(self.base_input_path)]
-                print(f"✅ 产品处理成功")
+        try:
+            if self.in_process_extraction and self.use_async:
+                print("⚡ 异步流水线: 目录扫描、文件预读和解析并行进行")
+                successful_products = AsyncBatchPipeline(self, self.prefetch_products).run()
             else:
-                successful_products = []
-                print(f"❌ 产品处理失败")
-        else:
-            # 如果根目录不包含HTML文件，说明是多个产品文件夹的批量模式
-            folders = self.get_folders_to_process()
-            
-            if not folders:
-                print(f"❌ 输入文件夹中既没有HTML文件，也没有子文件夹: {self.base_input_path}")
-                return
-            
-            print(f"🎯 检测到批量产品模式 - 找到 {len(folders)} 个产品文件夹")
-            print("=" * 80)
-            
-            successful_products = []
-            
-            for i, folder_path in enumerate(folders, 1):
-                folder_name = os.path.basename(folder_path)
-                print(f"\n🚀 [{i}/{len(folders)}] 开始处理产品: {folder_name}")
-                print("=" * 80)
-                
-                try:
-                    success = self.process_product_folder(folder_path)
-                    if success:
-                        successful_products.append(folder_name)
-                        print(f"✅ 产品 '{folder_name}' 处理成功")
-                    else:
-                        print(f"❌ 产品 '{folder_name}' 处理失败")
-                except Exception as e:
-                    print(f"❌ 处理产品文件夹 '{folder_name}' 时出错: {e}")
-                    continue
+                successful_products = self.process_folders(self.find_product_folders())
+        finally:
+            self.close_worker_pool()
+            self.memory.stop()
+            close_archives()
         
-        # 处理完所有产品后，使用简单数据分离器
-        if successful_products:
-            print(f"\n🔄 使用简单数据分离器处理 {len(successful_products)} 个产品数据...")
-            self.run_simple_data_separator()
+        if successful_products is None:
+            return
+        
+        successful_products = self.finish_batch(successful_products)
         
         # 生成总体报告
         self.generate_batch_summary(successful_products)
     
+    def process_folders(self, folders):
+        """逐个处理产品文件夹，没有可处理的文件夹时返回 None"""
+        if not folders:
+            return None
+        
+        successful_products = []
+        
+        for i, folder_path in enumerate(folders, 1):
+            folder_name = os.path.basename(folder_path)
+            if self.is_product_complete(folder_path):
+                successful_products.append(folder_name)
+                print(f"⏭️ [{i}/{len(folders)}] 已在上次运行中完成，跳过: {folder_name}")
+                continue
+            
+            print(f"\n🚀 [{i}/{len(folders)}] 开始处理产品: {folder_name}")
+            print("=" * 80)
+            
+            self.memory.begin_product(folder_name)
+            try:
+                success = self.process_product_folder(folder_path)
+                if success:
+                    successful_products.append(folder_name)
+                    print(f"✅ 产品 '{folder_name}' 处理成功")
+                else:
+                    print(f"❌ 产品 '{folder_name}' 处理失败")
+            except Exception as e:
+                print(f"❌ 处理产品文件夹 '{folder_name}' 时出错: {e}")
+                continue
+            finally:
+                print(f"📈 {folder_name} 处理期间峰值内存: {format_mb(self.memory.end_product(folder_name))}")
+        
+        return successful_products
+    
     def generate_batch_summary(self, successful_products):
         """生成批量处理的总结报告"""
         summary = {
@@ -428,31 +594,46 @@ class SmartProductProcessor:
                 "Base_Output_Path": "E:\\dataAI",  # 最终聚合数据的位置
                 "Successful_Products": successful_products,
                 "Total_Products_Processed": len(successful_products),
-                "Final_Output_Files": []
+                "Final_Output_Files": [],
+                "Memory_Usage": self.memory.summary(),
+                "HTML_Minimizer": self.minimizer.summary() if self.minimizer else None,
+                "Extraction_Cache": self.cache.summary() if self.cache else None,
+                "Profile": self.profiler.summary() if self.profiler else None
             }
         }
         
         # 收集最终聚合数据文件
         final_files = [
             "Complete_Products_Data.json",
-            "Incomplete_Products_Data.json"
+            "Incomplete_Products_Data.json",
+            RETENTION_REPORT_FILE,
+            RANKING_REPORT_FILE
         ]
         
         summary["Batch_Processing_Summary"]["Final_Output_Files"] = final_files
         
         # 保存总结报告到目标目录
-        final_output_dir = r"D:\Users\Mussy\Desktop\result"
+        final_output_dir = FINAL_OUTPUT_DIR
         os.makedirs(final_output_dir, exist_ok=True)
         summary_path = os.path.join(final_output_dir, 'Batch_Processing_Summary.json')
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            json.dump(summary, f, ensure_ascii=False, indent=4)
+        atomic_write_json(summary_path, summary, indent=4)
         
         print(f"\n🎉 处理完成!")
         print(f"📊 成功处理了 {len(successful_products)} 个产品:")
         for product in successful_products:
             print(f"   ✅ {product}")
         print(f"📊 总结报告: {summary_path}")
-        print(f"📁 最终聚合数据: D:\\Users\\Mussy\\Desktop\\result")
+        print(f"📁 最终聚合数据: {FINAL_OUTPUT_DIR}")
+        if self.memory.peak:
+            print(f"📈 峰值内存: {format_mb(self.memory.peak)}")
+        if self.minimizer:
+            self.minimizer.print_summary()
+        if self.cache:
+            cache_summary = self.cache.summary()
+            print(f"♻️ 提取缓存: 命中 {cache_summary['Hits']} 个页面，解析 {cache_summary['Misses']} 个页面，"
+                  f"缓存 {cache_summary['Size_MB']} MB")
+        if self.profiler:
+            self.profiler.finish_batch(self.profile_top)
         
         # 所有数据已直接输出到目标目录，无需复制
     
@@ -468,11 +649,50 @@ def main():
     # 可选：设置临时输出路径（最终聚合数据始终保存到 E:\dataAI\）
     TEMP_OUTPUT = r"D:\Users\Mussy\Desktop\result"
     
+    # 可选：批处理完成后自动执行的清理规则文件（见 Data_Cleaner.py --rules），None 表示不清理
+    CLEANING_RULES_FILE = None
+    
     # ========================================
     
+    parser = argparse.ArgumentParser(description="智能产品数据处理器")
+    parser.add_argument('--input', default=INPUT_FOLDER, help="输入文件夹（单个产品或包含多个产品子文件夹）")
+    parser.add_argument('--rules', default=CLEANING_RULES_FILE, help="批处理完成后执行的清理规则文件")
+    parser.add_argument('--rankings', default=None, help="排名报告的规则文件（JSON），默认使用内置排名")
+    parser.add_argument('--workers', type=int, default=None, help="解析进程数，默认等于CPU核数")
+    parser.add_argument('--read-workers', type=int, default=DEFAULT_READ_WORKERS, help="同时读取的文件数")
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH_PRODUCTS, help="异步流水线同时预读的产品数")
+    parser.add_argument('--no-async', action='store_true', help="关闭异步流水线，逐个处理产品")
+    parser.add_argument('--scripts', action='store_true', help="按脚本逐个启动子进程提取（旧模式）")
+    parser.add_argument('--resume', action='store_true', help="从检查点继续，跳过上次已完成且未变化的产品")
+    parser.add_argument('--watch', action='store_true', help="监视模式：持续处理新增或修改的HTML导出文件")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE_SECONDS, help="监视模式的防抖秒数")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help="监视模式的轮询间隔秒数")
+    parser.add_argument('--poll', action='store_true', help="监视模式强制使用轮询（网络共享上文件系统事件不可靠）")
+    parser.add_argument('--report-interval', type=float, default=DEFAULT_REPORT_INTERVAL, metavar='SECONDS',
+                        help="监视模式中留存曲线和排名报告的最短刷新间隔秒数")
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MB',
+                        help="内存预算（MB，含解析进程）：超出时暂停读取和提交解析，直到内存回落")
+    parser.add_argument('--no-minimize', action='store_true', help="关闭解析前的HTML裁剪")
+    parser.add_argument('--no-cache', action='store_true', help="不使用提取结果缓存，重新解析全部页面")
+    parser.add_argument('--aggregate-batch', type=int, default=DEFAULT_MAX_PENDING_PRODUCTS, metavar='N',
+                        help="批量聚合时内存中最多保留的产品数，超出时先写出产品文件")
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY, metavar='N',
+                        help="每完成 N 个产品（或每 30 秒）写出产品文件并记录检查点，中断时最多重做这些产品；0 表示只在批处理结束时写出")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE_MB, metavar='MB',
+                        help="提取结果缓存的大小上限（MB），超出时淘汰最久未使用的结果")
+    parser.add_argument('--profile', action='store_true', help="性能分析：统计各提取阶段的耗时")
+    parser.add_argument('--profile-samples', action='store_true',
+                        help=f"采样调用栈，每个产品在结果目录的 {PROFILE_DIR} 中写出折叠栈文件（火焰图）")
+    parser.add_argument('--profile-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL_MS, metavar='MS',
+                        help="调用栈采样间隔（毫秒）")
+    parser.add_argument('--profile-top', type=int, default=0, metavar='N',
+                        help="批处理结束时列出整个批次自身耗时最多的 N 个函数（自动开启采样）")
+    args = parser.parse_args()
+    INPUT_FOLDER = args.input
+    
     if not os.path.exists(INPUT_FOLDER):
         print(f"❌ 输入路径不存在: {INPUT_FOLDER}")
-        print("💡 请在脚本中修改 INPUT_FOLDER 变量为正确的路径")
+        print("💡 请在脚本中修改 INPUT_FOLDER 变量或使用 --input 指定正确的路径")
         return
     
     print("🎯 智能产品数据处理器")
@@ -483,8 +703,28 @@ def main():
     print("🤖 自动检测: 单个产品 或 批量产品")
     print("=" * 60)
     
-    processor = SmartProductProcessor(INPUT_FOLDER, TEMP_OUTPUT)
-    processor.process_all_folders()
+    processor = SmartProductProcessor(INPUT_FOLDER, TEMP_OUTPUT, args.rules,
+                                      in_process_extraction=not args.scripts,
+                                      workers=args.workers,
+                                      read_workers=args.read_workers,
+                                      use_async=not args.no_async,
+                                      prefetch_products=args.prefetch,
+                                      resume=args.resume,
+                                      memory_budget_mb=args.memory_budget,
+                                      minimize_html=not args.no_minimize,
+                                      use_cache=not args.no_cache,
+                                      cache_size_mb=args.cache_size,
+                                      rankings_file=args.rankings,
+                                      max_pending_products=args.aggregate_batch,
+                                      checkpoint_every=args.checkpoint_every,
+                                      profile=args.profile,
+                                      profile_samples=args.profile_samples or args.profile_top > 0,
+                                      profile_interval_ms=args.profile_interval,
+                                      profile_top=args.profile_top)
+    if args.watch:
+        FolderWatcher(processor, args.debounce, args.poll_interval, args.poll, args.report_interval).run()
+    else:
+        processor.process_all_folders()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+国家用户行为矩阵 - Country Behavior Matrix
+功能：把所有产品的 "User Behavior by Country" 加载为稠密的 NumPy 数组，做跨产品的向量化比较
+- values[产品行, 国家, 指标]，产品行为 (应用, 平台)；缺失或 "N/A" 的值为 NaN，valid 为对应掩码
+- 排名、百分位和按活跃用户加权平均都是整列的数组运算，不再逐个产品嵌套循环
+- 可以保存为 .npz，之后直接加载数组，不必重新读取产品JSON
+
+用法:
+    python Country_Behavior_Matrix.py --metric "Day 30 Retention (%)" --country 美国 --top 10
+    python Country_Behavior_Matrix.py --weighted "Avg Time Per User"
+"""
+
+import argparse
+
+import numpy as np
+
+from Product_Data_Loader import DEFAULT_PRODUCTS_DIR, GLOBAL_REGION, iter_products, iter_platforms, to_number
+
+BEHAVIOR_SECTION = "User Behavior by Country"
+COUNTRY_KEY = "Country/Region"
+WEIGHT_METRIC = "Active Users"
+BEHAVIOR_METRICS = (
+    "Active Users",
+    "User Share (%)",
+    "Day 1 Retention (%)",
+    "Day 7 Retention (%)",
+    "Day 30 Retention (%)",
+    "Avg Time Per User",
+    "Avg Active Days",
+    "Active Days (%)",
+    "Sessions",
+    "Avg Session Duration",
+)
+
+
+def column_percentiles(values):
+    """
+    二维数组每一列内的百分位（0~100，越高越好），缺失值为 NaN
+    整列排序，一次计算所有列
+    """
+    valid = ~np.isnan(values)
+    # NaN 排在最后，前 n 个位置就是有效值的名次
+    ranks = np.argsort(np.argsort(values, axis=0, kind='stable'), axis=0).astype(float)
+    counts = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(counts > 1, ranks / (counts - 1) * 100, 100.0)
+    result[~valid] = np.nan
+    return result
+
+
+class CountryBehaviorMatrix:
+    """产品 × 国家 × 指标 的用户行为矩阵"""
+
+    def __init__(self, applications, platforms, countries, metrics, values):
+        self.applications = list(applications)
+        self.platforms = list(platforms)
+        self.countries = list(countries)
+        self.metrics = list(metrics)
+        self.values = values
+        self.valid = ~np.isnan(values)
+        self._country_index = {country: i for i, country in enumerate(self.countries)}
+        self._metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+    @classmethod
+    def from_products(cls, products, metrics=BEHAVIOR_METRICS):
+        """从产品数据构建矩阵：先收集坐标和数值，最后一次性写入数组"""
+        metric_index = {metric: i for i, metric in enumerate(metrics)}
+        country_index = {}
+        applications, platforms = [], []
+        rows, cols, layers, numbers = [], [], [], []
+
+        for application, platform, platform_data in iter_platforms(products):
+            records = platform_data.get(BEHAVIOR_SECTION)
+            if not records:
+                continue
+            row = len(applications)
+            applications.append(application)
+            platforms.append(platform)
+            for record in records:
+                country = record.get(COUNTRY_KEY)
+                if not country:
+                    continue
+                col = country_index.setdefault(country, len(country_index))
+                for metric, layer in metric_index.items():
+                    number = to_number(record.get(metric))
+                    if number is not None:
+                        rows.append(row)
+                        cols.append(col)
+                        layers.append(layer)
+                        numbers.append(number)
+
+        values = np.full((len(applications), len(country_index), len(metrics)), np.nan)
+        if numbers:
+            values[np.array(rows), np.array(cols), np.array(layers)] = np.array(numbers)
+        return cls(applications, platforms, country_index, metrics, values)
+
+    @classmethod
+    def from_source(cls, source=DEFAULT_PRODUCTS_DIR, metrics=BEHAVIOR_METRICS):
+        """从产品文件目录或合并文件构建矩阵"""
+        return cls.from_products(iter_products(source), metrics)
+
+    def save(self, path):
+        """保存为 .npz（压缩）"""
+        np.savez_compressed(path, values=self.values,
+                            applications=np.array(self.applications, dtype=str),
+                            platforms=np.array(self.platforms, dtype=str),
+                            countries=np.array(self.countries, dtype=str),
+                            metrics=np.array(self.metrics, dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        """从 save() 生成的 .npz 加载"""
+        with np.load(path) as data:
+            return cls(data['applications'].tolist(), data['platforms'].tolist(),
+                       data['countries'].tolist(), data['metrics'].tolist(), data['values'])
+
+    def metric(self, metric):
+        """某个指标的 产品 × 国家 二维视图"""
+        return self.values[:, :, self._metric_index[metric]]
+
+    def country_column(self, metric, country):
+        """某个指标在某个国家的所有产品值（一维视图）"""
+        return self.values[:, self._country_index[country], self._metric_index[metric]]
+
+    def rank_rows(self, metric, country=GLOBAL_REGION, top=10, ascending=False, platform=None):
+        """某个国家按指标排名，返回产品行下标数组，缺失值不参与排名"""
+        column = self.country_column(metric, country)
+        candidates = ~np.isnan(column)
+        if platform:
+            candidates &= np.array(self.platforms) == platform
+        indices = np.flatnonzero(candidates)
+        order = np.argsort(column[indices] if ascending else -column[indices], kind='stable')
+        return indices[order[:top] if top else order]
+
+    def rank(self, metric, country=GLOBAL_REGION, top=10, ascending=False, platform=None):
+        """某个国家按指标排名，返回 [(应用, 平台, 值)]"""
+        column = self.country_column(metric, country)
+        return [(self.applications[i], self.platforms[i], float(column[i]))
+                for i in self.rank_rows(metric, country, top, ascending, platform)]
+
+    def percentiles(self, metric):
+        """每个产品在每个国家内的百分位（0~100，越高越好），缺失值为 NaN"""
+        return column_percentiles(self.metric(metric))
+
+    def country_quantiles(self, metric, quantiles=(25, 50, 75)):
+        """每个国家在所有产品中的分位数，返回 {分位数: 各国家的值数组}"""
+        values = self.metric(metric)
+        has_values = ~np.isnan(values).all(axis=0)
+        result = {}
+        for quantile in quantiles:
+            column = np.full(len(self.countries), np.nan)
+            if has_values.any():
+                column[has_values] = np.nanpercentile(values[:, has_values], quantile, axis=0)
+            result[quantile] = column
+        return result
+
+    def weighted_average(self, metric, weight=WEIGHT_METRIC, exclude_global=True):
+        """每个产品跨国家按活跃用户加权的平均值（两者都有值的国家才参与），没有数据时为 NaN"""
+        values = self.metric(metric)
+        weights = self.metric(weight)
+        usable = ~np.isnan(values) & ~np.isnan(weights)
+        if exclude_global and GLOBAL_REGION in self._country_index:
+            usable[:, self._country_index[GLOBAL_REGION]] = False
+        weighted_sum = np.where(usable, values * weights, 0).sum(axis=1)
+        weight_sum = np.where(usable, weights, 0).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(weight_sum > 0, weighted_sum / weight_sum, np.nan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="跨产品的国家用户行为对比")
+    parser.add_argument('--source', default=DEFAULT_PRODUCTS_DIR, help="产品文件目录、产品文件或合并文件，或 save 生成的 .npz")
+    parser.add_argument('--metric', default="Day 30 Retention (%)", help="排名指标")
+    parser.add_argument('--country', default=GLOBAL_REGION, help="排名的国家/地区")
+    parser.add_argument('--platform', default=None, help="只看某个平台（Android / iOS）")
+    parser.add_argument('--top', type=int, default=10, help="显示前 N 名")
+    parser.add_argument('--weighted', metavar='METRIC', help="显示各产品按活跃用户加权的跨国家平均值")
+    parser.add_argument('--save', metavar='NPZ', help="把矩阵保存为 .npz，之后可直接用 --source 加载")
+    args = parser.parse_args()
+
+    if args.source.endswith('.npz'):
+        matrix = CountryBehaviorMatrix.load(args.source)
+    else:
+        matrix = CountryBehaviorMatrix.from_source(args.source)
+    print(f"📊 用户行为矩阵: {len(matrix.applications)} 个产品平台 × {len(matrix.countries)} 个国家/地区 × {len(matrix.metrics)} 个指标")
+    if not matrix.applications:
+        print("❌ 没有找到用户行为数据")
+        return
+
+    if args.save:
+        matrix.save(args.save)
+        print(f"💾 已保存: {args.save}")
+
+    if args.weighted:
+        averages = matrix.weighted_average(args.weighted)
+        order = np.argsort(-np.nan_to_num(averages, nan=-np.inf), kind='stable')
+        print(f"\n⚖️ {args.weighted}（按 {WEIGHT_METRIC} 加权，不含{GLOBAL_REGION}）:")
+        for i in order[:args.top]:
+            if not np.isnan(averages[i]):
+                print(f"   {matrix.applications[i]} ({matrix.platforms[i]}): {averages[i]:.2f}")
+        return
+
+    if args.country not in matrix.countries:
+        print(f"❌ 没有国家/地区: {args.country}")
+        return
+    print(f"\n🏆 {args.country} - {args.metric} 前 {args.top} 名:")
+    values = matrix.country_column(args.metric, args.country)
+    percentiles = matrix.percentiles(args.metric)[:, matrix.countries.index(args.country)]
+    rows = matrix.rank_rows(args.metric, args.country, args.top, platform=args.platform)
+    for position, i in enumerate(rows, 1):
+        print(f"   {position}. {matrix.applications[i]} ({matrix.platforms[i]}): {values[i]:g}（第 {percentiles[i]:.0f} 百分位）")
+
+
+if __name__ == "__main__":
+    main()
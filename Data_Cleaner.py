@@ -6,20 +6,189 @@
 
 import json
 import os
-from datetime import datetime
+import sys
+import argparse
 import copy
 
+from Json_Stream_Utils import iter_json_array, JsonArrayWriter
+from Safe_File_Writer import AtomicFileWriter, atomic_write_json
+from Backup_Manager import BackupManager
+from Mapped_Product_Dataset import MappedProductDataset, DATASET_FILE, structure_summary, print_structure
+
+# 数据源与平台字段的对应关系
+SOURCE_FIELD_MAPPING = {
+    'downloads': ['Downloads', 'Downloads Change', 'Cumulative Downloads', 'Cumulative Downloads Change', 
+                 'Active Users', 'Active Users Change', 'Recent Three Month Downloads'],
+    'revenue': ['Store Revenue', 'Store Revenue Change', 'Average Store Revenue', 'Device Info'],
+    'behavior': ['Active Users from Behavior', 'User Share', 'Avg Time Per User', 'User Behavior by Country'],
+    'retention': ['Monthly App Retention', 'Overall Retention']
+}
+
+def describe_operation(operation):
+    """生成操作的可读描述"""
+    action = operation['action']
+    if action == 'platform':
+        return f"删除平台 {operation['platform']}"
+    if action == 'source':
+        return f"删除数据源 {operation['source']}"
+    if action == 'countries':
+        scope = operation.get('platform') or '所有平台'
+        return f"删除国家/地区 {', '.join(operation['countries'])} ({scope})"
+    if action == 'time':
+        parts = [str(v) for v in (operation.get('year'), operation.get('start_month'), operation.get('end_month')) if v]
+        return f"删除时间段 {' '.join(parts)}"
+    return action
+
+def load_rules_file(rules_file):
+    """从规则文件读取操作列表，支持顶层列表或 {"operations": [...]} 两种格式"""
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    if isinstance(rules, dict):
+        rules = rules.get('operations', [])
+    if not isinstance(rules, list):
+        raise ValueError(f"规则文件格式错误: {rules_file}")
+    return rules
+
+class CleaningRules:
+    """
+    把多个删除操作编译成一组谓词，一次遍历数据集完成所有删除
+    统计结果按操作类型 (platform/source/status/countries/time) 汇总，status 为改为 Not Available 的数据源状态
+    """
+    
+    def __init__(self, operations):
+        self.operations = list(operations)
+        self.platforms = set()
+        self.fields = set()
+        self.source_names = []
+        self.global_countries = set()
+        self.platform_countries = {}
+        self.download_months = set()
+        self.retention_year_tokens = []
+        self._countries_cache = {}
+        
+        for operation in self.operations:
+            self._compile(operation)
+    
+    def _compile(self, operation):
+        """编译单个操作"""
+        action = operation.get('action')
+        if action == 'platform':
+            self.platforms.add(operation['platform'])
+        elif action == 'source':
+            source_name = operation['source'].lower()
+            if source_name not in SOURCE_FIELD_MAPPING:
+                raise ValueError(f"未知数据源: {operation['source']}，可用数据源: {list(SOURCE_FIELD_MAPPING.keys())}")
+            self.fields.update(SOURCE_FIELD_MAPPING[source_name])
+            if source_name not in self.source_names:
+                self.source_names.append(source_name)
+        elif action == 'countries':
+            countries = operation['countries']
+            if isinstance(countries, str):
+                countries = [countries]
+            platform = operation.get('platform')
+            if platform:
+                self.platform_countries.setdefault(platform, set()).update(countries)
+            else:
+                self.global_countries.update(countries)
+        elif action == 'time':
+            year = operation.get('year')
+            if year:
+                year = int(year)
+                for month in (operation.get('start_month'), operation.get('end_month')):
+                    if month:
+                        self.download_months.add((year, month))
+                self.retention_year_tokens.append(f"{year}年")
+        else:
+            raise ValueError(f"未知操作: {action}")
+    
+    def countries_for(self, platform_name):
+        """获取某个平台需要删除的国家/地区集合"""
+        if platform_name not in self._countries_cache:
+            self._countries_cache[platform_name] = self.global_countries | self.platform_countries.get(platform_name, set())
+        return self._countries_cache[platform_name]
+    
+    @staticmethod
+    def has_changes(stats):
+        """判断统计结果中是否有实际删除"""
+        return any(stats.values())
+    
+    def new_stats(self):
+        """创建统计计数"""
+        return {'platform': 0, 'source': 0, 'status': 0, 'countries': 0, 'time': 0}
+    
+    def apply(self, app, stats):
+        """对单个应用一次性执行所有删除操作"""
+        # 更新数据源状态
+        if self.source_names:
+            data_sources = app.get('Data Sources', {})
+            for ds_name in data_sources:
+                ds_lower = ds_name.lower()
+                if any(source_name in ds_lower for source_name in self.source_names):
+                    if data_sources[ds_name] != "Not Available":
+                        data_sources[ds_name] = "Not Available"
+                        stats['status'] += 1
+        
+        platforms = app.get('Platforms', {})
+        for platform_name in list(platforms.keys()):
+            if platform_name in self.platforms:
+                del platforms[platform_name]
+                stats['platform'] += 1
+                continue
+            
+            platform_data = platforms[platform_name]
+            
+            # 删除数据源字段
+            for field in self.fields.intersection(platform_data.keys()):
+                del platform_data[field]
+                stats['source'] += 1
+            
+            # 删除国家/地区
+            countries = self.countries_for(platform_name)
+            if countries and 'User Behavior by Country' in platform_data:
+                behavior_data = platform_data['User Behavior by Country']
+                kept = [c for c in behavior_data if c.get('Country/Region') not in countries]
+                stats['countries'] += len(behavior_data) - len(kept)
+                platform_data['User Behavior by Country'] = kept
+            
+            # 删除时间段
+            if self.download_months and 'Recent Three Month Downloads' in platform_data:
+                downloads = platform_data['Recent Three Month Downloads']
+                kept = [d for d in downloads if (d.get('Year'), d.get('Month')) not in self.download_months]
+                stats['time'] += len(downloads) - len(kept)
+                platform_data['Recent Three Month Downloads'] = kept
+            
+            if self.retention_year_tokens and 'Monthly App Retention' in platform_data:
+                retention = platform_data['Monthly App Retention']
+                kept = [
+                    m for m in retention
+                    if not any(token in m.get('Month', '') for token in self.retention_year_tokens)
+                ]
+                stats['time'] += len(retention) - len(kept)
+                platform_data['Monthly App Retention'] = kept
+    
+    def print_stats(self, stats):
+        """打印删除统计"""
+        for operation in self.operations:
+            print(f"  📋 {describe_operation(operation)}")
+        print(f"  🎯 删除平台 {stats['platform']} 个, 数据源字段 {stats['source']} 个, "
+              f"数据源状态 {stats['status']} 个, 国家数据 {stats['countries']} 条, 时间段记录 {stats['time']} 条")
+
 class DataCleaner:
-    def __init__(self, data_file="Comprehensive_Aggregated_Analytics_Data.json"):
+    def __init__(self, data_file="Comprehensive_Aggregated_Analytics_Data.json", backup_manager=None):
         self.data_file = data_file
-        self.backup_file = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{data_file}"
+        # 备份统一放在数据文件旁的 backups 目录，批量清理时可共享同一个备份管理器
+        self.backup_manager = backup_manager or BackupManager(
+            os.path.join(os.path.dirname(os.path.abspath(data_file)), "backups")
+        )
         self.data = None
+        self.modified = False
         
     def load_data(self):
         """加载数据文件"""
         try:
             with open(self.data_file, 'r', encoding='utf-8') as f:
                 self.data = json.load(f)
+            self.modified = False
             print(f"✅ 已加载数据文件: {self.data_file}")
             return True
         except Exception as e:
@@ -27,22 +196,37 @@ class DataCleaner:
             return False
     
     def backup_data(self):
-        """备份原始数据"""
+        """备份磁盘上的原始文件字节（在修改提交前调用）"""
         try:
-            with open(self.backup_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
-            print(f"✅ 数据已备份到: {self.backup_file}")
+            # 保存均通过原子替换完成，可以安全地使用硬链接
+            digest = self.backup_manager.backup_file(self.data_file, link=True)
+            print(f"✅ 数据已备份到: {self.backup_manager.backup_root} ({digest[:12]})")
+            return True
         except Exception as e:
             print(f"❌ 备份失败: {e}")
+            return False
     
-    def save_data(self):
-        """保存修改后的数据"""
+    def save_data(self, prune_backups=True):
+        """保存修改后的数据，没有修改时不写入也不备份"""
+        if not self.modified:
+            print("ℹ️ 数据没有修改，无需保存")
+            return True
+        
+        if not self.backup_data():
+            print("❌ 备份失败，已取消保存")
+            return False
+        
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
+            atomic_write_json(self.data_file, self.data, indent=4)
+            self.modified = False
             print(f"✅ 数据已保存到: {self.data_file}")
         except Exception as e:
             print(f"❌ 保存失败: {e}")
+            return False
+        
+        if prune_backups:
+            self.backup_manager.prune()
+        return True
     
     def show_data_structure(self):
         """显示数据结构"""
@@ -52,39 +236,7 @@ class DataCleaner:
         
         print("\n📊 当前数据结构:")
         print("=" * 60)
-        
-        for i, app in enumerate(self.data):
-            print(f"应用 {i+1}: {app.get('Application', 'Unknown')}")
-            print(f"  更新时间: {app.get('Last Updated', 'Unknown')}")
-            
-            # 显示数据源
-            data_sources = app.get('Data Sources', {})
-            print("  数据源:")
-            for source, status in data_sources.items():
-                status_icon = "✅" if status == "Available" else "❌"
-                print(f"    {status_icon} {source}")
-            
-            # 显示平台
-            platforms = app.get('Platforms', {})
-            print("  平台:")
-            for platform in platforms.keys():
-                print(f"    📱 {platform}")
-                
-                # 显示该平台的数据类型
-                platform_data = platforms[platform]
-                if 'User Behavior by Country' in platform_data:
-                    countries = len(platform_data['User Behavior by Country'])
-                    print(f"      - 用户行为数据: {countries} 个国家/地区")
-                
-                if 'Monthly App Retention' in platform_data:
-                    months = len(platform_data['Monthly App Retention'])
-                    print(f"      - 用户留存数据: {months} 个月份")
-                
-                if 'Recent Three Month Downloads' in platform_data:
-                    downloads = len(platform_data['Recent Three Month Downloads'])
-                    print(f"      - 下载趋势数据: {downloads} 个月份")
-            
-            print()
+        print_structure(structure_summary(app) for app in self.data)
     
     def delete_platform(self, platform_name):
         """删除指定平台的所有数据"""
@@ -94,15 +246,14 @@ class DataCleaner:
         
         deleted_count = 0
         for app in self.data:
-            platforms = app.get('Platforms', {})
-            if platform_name in platforms:
-                del platforms[platform_name]
+            if self._delete_platform_from_app(app, platform_name):
                 deleted_count += 1
                 print(f"✅ 已删除应用 '{app.get('Application')}' 的 {platform_name} 平台数据")
         
         if deleted_count == 0:
             print(f"⚠️ 未找到平台: {platform_name}")
         else:
+            self.modified = True
             print(f"🎯 总共删除了 {deleted_count} 个应用的 {platform_name} 平台数据")
     
     def delete_data_source(self, source_name):
@@ -111,38 +262,21 @@ class DataCleaner:
             print("❌ 请先加载数据")
             return
         
-        source_mapping = {
-            'downloads': ['Downloads', 'Downloads Change', 'Cumulative Downloads', 'Cumulative Downloads Change', 
-                         'Active Users', 'Active Users Change', 'Recent Three Month Downloads'],
-            'revenue': ['Store Revenue', 'Store Revenue Change', 'Average Store Revenue', 'Device Info'],
-            'behavior': ['Active Users from Behavior', 'User Share', 'Avg Time Per User', 'User Behavior by Country'],
-            'retention': ['Monthly App Retention', 'Overall Retention']
-        }
-        
-        if source_name.lower() not in source_mapping:
+        if source_name.lower() not in SOURCE_FIELD_MAPPING:
             print(f"❌ 未知数据源: {source_name}")
-            print(f"💡 可用数据源: {list(source_mapping.keys())}")
+            print(f"💡 可用数据源: {list(SOURCE_FIELD_MAPPING.keys())}")
             return
         
-        fields_to_delete = source_mapping[source_name.lower()]
         deleted_count = 0
-        
+        status_count = 0
         for app in self.data:
-            # 更新数据源状态
-            data_sources = app.get('Data Sources', {})
-            for ds_name, status in data_sources.items():
-                if source_name.lower() in ds_name.lower():
-                    data_sources[ds_name] = "Not Available"
-            
-            # 删除平台数据中的相关字段
-            platforms = app.get('Platforms', {})
-            for platform_name, platform_data in platforms.items():
-                for field in fields_to_delete:
-                    if field in platform_data:
-                        del platform_data[field]
-                        deleted_count += 1
+            deleted, status_changed = self._delete_data_source_from_app(app, source_name)
+            deleted_count += deleted
+            status_count += status_changed
         
-        print(f"✅ 已删除 {source_name} 数据源，共删除 {deleted_count} 个字段")
+        # 字段已不存在时，数据源状态改为 Not Available 也是需要保存的修改
+        self.modified = self.modified or deleted_count > 0 or status_count > 0
+        print(f"✅ 已删除 {source_name} 数据源，共删除 {deleted_count} 个字段，{status_count} 个数据源状态改为 Not Available")
     
     def delete_countries(self, countries_to_delete, platform=None):
         """删除指定国家/地区的数据"""
@@ -155,25 +289,9 @@ class DataCleaner:
         
         deleted_count = 0
         for app in self.data:
-            platforms = app.get('Platforms', {})
-            
-            for platform_name, platform_data in platforms.items():
-                if platform and platform_name != platform:
-                    continue
-                
-                if 'User Behavior by Country' in platform_data:
-                    behavior_data = platform_data['User Behavior by Country']
-                    original_length = len(behavior_data)
-                    
-                    # 过滤掉指定的国家/地区
-                    platform_data['User Behavior by Country'] = [
-                        country_data for country_data in behavior_data
-                        if country_data.get('Country/Region') not in countries_to_delete
-                    ]
-                    
-                    new_length = len(platform_data['User Behavior by Country'])
-                    deleted_count += (original_length - new_length)
+            deleted_count += self._delete_countries_from_app(app, countries_to_delete, platform)
         
+        self.modified = self.modified or deleted_count > 0
         print(f"✅ 已删除国家/地区: {', '.join(countries_to_delete)}")
         print(f"🎯 总共删除了 {deleted_count} 条国家数据")
     
@@ -185,43 +303,174 @@ class DataCleaner:
         
         deleted_count = 0
         for app in self.data:
-            platforms = app.get('Platforms', {})
+            deleted_count += self._delete_time_period_from_app(app, start_month, end_month, year)
+        
+        self.modified = self.modified or deleted_count > 0
+        print(f"✅ 已删除时间段数据，总共删除了 {deleted_count} 条记录")
+    
+    # ------------------------------------------------------------
+    # 单个应用级别的删除操作（内存模式和流式模式共用）
+    # ------------------------------------------------------------
+    
+    def _delete_platform_from_app(self, app, platform_name):
+        """从单个应用中删除指定平台，返回是否删除"""
+        platforms = app.get('Platforms', {})
+        if platform_name in platforms:
+            del platforms[platform_name]
+            return True
+        return False
+    
+    def _delete_data_source_from_app(self, app, source_name):
+        """从单个应用中删除指定数据源，返回 (删除的字段数, 改为 Not Available 的数据源状态数)"""
+        fields_to_delete = SOURCE_FIELD_MAPPING[source_name.lower()]
+        deleted_count = 0
+        status_count = 0
+        
+        # 更新数据源状态
+        data_sources = app.get('Data Sources', {})
+        for ds_name, status in data_sources.items():
+            if source_name.lower() in ds_name.lower() and status != "Not Available":
+                data_sources[ds_name] = "Not Available"
+                status_count += 1
+        
+        # 删除平台数据中的相关字段
+        platforms = app.get('Platforms', {})
+        for platform_name, platform_data in platforms.items():
+            for field in fields_to_delete:
+                if field in platform_data:
+                    del platform_data[field]
+                    deleted_count += 1
+        
+        return deleted_count, status_count
+    
+    def _delete_countries_from_app(self, app, countries_to_delete, platform=None):
+        """从单个应用中删除指定国家/地区，返回删除的条数"""
+        deleted_count = 0
+        platforms = app.get('Platforms', {})
+        
+        for platform_name, platform_data in platforms.items():
+            if platform and platform_name != platform:
+                continue
             
-            for platform_name, platform_data in platforms.items():
-                # 删除下载趋势数据
-                if 'Recent Three Month Downloads' in platform_data:
-                    downloads = platform_data['Recent Three Month Downloads']
-                    original_length = len(downloads)
-                    
-                    filtered_downloads = []
-                    for download in downloads:
-                        keep = True
-                        if year and download.get('Year') == year:
-                            if start_month and download.get('Month') == start_month:
-                                keep = False
-                            elif end_month and download.get('Month') == end_month:
-                                keep = False
-                        
-                        if keep:
-                            filtered_downloads.append(download)
-                    
-                    platform_data['Recent Three Month Downloads'] = filtered_downloads
-                    deleted_count += (original_length - len(filtered_downloads))
+            if 'User Behavior by Country' in platform_data:
+                behavior_data = platform_data['User Behavior by Country']
+                original_length = len(behavior_data)
                 
-                # 删除留存数据
-                if 'Monthly App Retention' in platform_data:
-                    retention = platform_data['Monthly App Retention']
-                    original_length = len(retention)
-                    
-                    if year:
-                        platform_data['Monthly App Retention'] = [
-                            month_data for month_data in retention
-                            if f"{year}年" not in month_data.get('Month', '')
-                        ]
+                # 过滤掉指定的国家/地区
+                platform_data['User Behavior by Country'] = [
+                    country_data for country_data in behavior_data
+                    if country_data.get('Country/Region') not in countries_to_delete
+                ]
+                
+                new_length = len(platform_data['User Behavior by Country'])
+                deleted_count += (original_length - new_length)
+        
+        return deleted_count
+    
+    def _delete_time_period_from_app(self, app, start_month=None, end_month=None, year=None):
+        """从单个应用中删除指定时间段，返回删除的条数"""
+        deleted_count = 0
+        platforms = app.get('Platforms', {})
+        
+        for platform_name, platform_data in platforms.items():
+            # 删除下载趋势数据
+            if 'Recent Three Month Downloads' in platform_data:
+                downloads = platform_data['Recent Three Month Downloads']
+                original_length = len(downloads)
+                
+                filtered_downloads = []
+                for download in downloads:
+                    keep = True
+                    if year and download.get('Year') == year:
+                        if start_month and download.get('Month') == start_month:
+                            keep = False
+                        elif end_month and download.get('Month') == end_month:
+                            keep = False
                     
-                    deleted_count += (original_length - len(platform_data['Monthly App Retention']))
+                    if keep:
+                        filtered_downloads.append(download)
+                
+                platform_data['Recent Three Month Downloads'] = filtered_downloads
+                deleted_count += (original_length - len(filtered_downloads))
+            
+            # 删除留存数据
+            if 'Monthly App Retention' in platform_data:
+                retention = platform_data['Monthly App Retention']
+                original_length = len(retention)
+                
+                if year:
+                    platform_data['Monthly App Retention'] = [
+                        month_data for month_data in retention
+                        if f"{year}年" not in month_data.get('Month', '')
+                    ]
+                
+                deleted_count += (original_length - len(platform_data['Monthly App Retention']))
         
-        print(f"✅ 已删除时间段数据，总共删除了 {deleted_count} 条记录")
+        return deleted_count
+    
+    def apply_rules(self, rules):
+        """内存模式下一次遍历执行编译后的全部删除操作"""
+        if not self.data:
+            print("❌ 请先加载数据")
+            return None
+        
+        stats = rules.new_stats()
+        for app in self.data:
+            rules.apply(app, stats)
+        
+        self.modified = self.modified or rules.has_changes(stats)
+        print(f"✅ 已按规则清理 {len(self.data)} 个应用")
+        rules.print_stats(stats)
+        return stats
+    
+    def stream_clean(self, rules, output_file=None):
+        """
+        流式清理：逐个应用读取、删除、写出，不把整个数据集加载到内存
+        rules: CleaningRules 或操作列表，例如 [{'action': 'platform', 'platform': 'iOS'},
+                                               {'action': 'source', 'source': 'retention'}]
+        output_file: 输出文件，留空则处理完成后原子替换原文件
+        """
+        if not isinstance(rules, CleaningRules):
+            try:
+                rules = CleaningRules(rules)
+            except (KeyError, ValueError) as e:
+                print(f"❌ 规则无效: {e}")
+                return False
+        
+        replace_original = output_file is None
+        target_file = output_file or self.data_file
+        
+        app_count = 0
+        stats = rules.new_stats()
+        try:
+            with AtomicFileWriter(target_file) as out:
+                writer = JsonArrayWriter(out, indent=4)
+                for app in iter_json_array(self.data_file):
+                    rules.apply(app, stats)
+                    writer.write(app)
+                    app_count += 1
+                writer.close()
+                
+                print(f"✅ 流式清理完成，共处理 {app_count} 个应用")
+                rules.print_stats(stats)
+                
+                if replace_original:
+                    # 没有任何删除时不替换原文件，也不产生备份
+                    if not rules.has_changes(stats):
+                        print("ℹ️ 数据没有修改，无需保存")
+                        return True
+                    # 替换前备份原始字节，不做反序列化
+                    if not self.backup_data():
+                        print("❌ 备份失败，已取消保存")
+                        return False
+                
+                out.commit()
+        except Exception as e:
+            print(f"❌ 流式清理失败: {e}")
+            return False
+        
+        print(f"✅ 数据已保存到: {target_file}")
+        return True
     
     def interactive_menu(self):
         """交互式菜单"""
@@ -284,24 +533,131 @@ class DataCleaner:
             else:
                 print("❌ 无效选择，请重试")
 
+def build_operations_from_args(args):
+    """根据命令行参数构建删除操作列表（规则文件中的操作在前）"""
+    operations = load_rules_file(args.rules) if args.rules else []
+    for platform in args.delete_platform or []:
+        operations.append({'action': 'platform', 'platform': platform})
+    for source in args.delete_source or []:
+        operations.append({'action': 'source', 'source': source})
+    if args.delete_countries:
+        operations.append({
+            'action': 'countries',
+            'countries': [c.strip() for c in args.delete_countries.split(',') if c.strip()],
+            'platform': args.country_platform
+        })
+    if args.year or args.month:
+        operations.append({'action': 'time', 'year': args.year, 'start_month': args.month})
+    return operations
+
+def run_unattended(data_files, operations, stream=False, output_file=None):
+    """
+    非交互批量清理：规则编译一次，每个文件只遍历一遍
+    同一次运行的所有备份记录在同一个备份代中，返回是否全部成功
+    """
+    try:
+        rules = CleaningRules(operations)
+    except (KeyError, ValueError) as e:
+        print(f"❌ 规则无效: {e}")
+        return False
+    
+    backup_manager = BackupManager(
+        os.path.join(os.path.dirname(os.path.abspath(data_files[0])), "backups")
+    )
+    
+    all_ok = True
+    for data_file in data_files:
+        print(f"\n🔄 清理文件: {data_file}")
+        cleaner = DataCleaner(data_file, backup_manager)
+        if stream:
+            all_ok = cleaner.stream_clean(rules, output_file) and all_ok
+            continue
+        
+        if not cleaner.load_data():
+            all_ok = False
+            continue
+        cleaner.apply_rules(rules)
+        all_ok = cleaner.save_data(prune_backups=False) and all_ok
+    
+    backup_manager.prune()
+    return all_ok
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="数据清理工具 - 不带删除参数时进入交互式菜单")
+    parser.add_argument('--data-file', action='append', help="聚合数据文件 (可重复，默认 Comprehensive_Aggregated_Analytics_Data.json)")
+    parser.add_argument('--rules', help="规则文件 (JSON)，包含要执行的删除操作列表")
+    parser.add_argument('--stream', action='store_true', help="流式模式：逐个应用处理，内存占用有界")
+    parser.add_argument('--output', help="流式模式输出文件，留空则替换原文件")
+    parser.add_argument('--delete-platform', action='append', help="删除指定平台 (可重复)")
+    parser.add_argument('--delete-source', action='append', help="删除指定数据源 (可重复)")
+    parser.add_argument('--delete-countries', help="删除国家/地区，逗号分隔")
+    parser.add_argument('--country-platform', help="删除国家/地区时限定的平台")
+    parser.add_argument('--year', type=int, help="删除时间段: 年份")
+    parser.add_argument('--month', help="删除时间段: 月份 (如 June)")
+    parser.add_argument('--show', action='store_true',
+                        help=f"只查看数据结构后退出（{DATASET_FILE} 数据集只读索引，JSON 文件流式读取）")
+    return parser.parse_args(argv)
+
+def show_structure(data_file):
+    """不加载整个文件查看数据结构"""
+    print(f"\n📊 数据结构: {data_file}")
+    print("=" * 60)
+    try:
+        if os.path.basename(data_file) == DATASET_FILE:
+            with MappedProductDataset(data_file) as dataset:
+                print_structure(dataset.summaries())
+        else:
+            print_structure(structure_summary(app) for app in iter_json_array(data_file))
+        return True
+    except Exception as e:
+        print(f"❌ 读取数据结构失败: {e}")
+        return False
+
 def main():
+    args = parse_args()
+    data_files = args.data_file or ["Comprehensive_Aggregated_Analytics_Data.json"]
+    
+    if args.show:
+        results = [show_structure(data_file) for data_file in data_files]
+        if not all(results):
+            sys.exit(1)
+        return
+    
+    try:
+        operations = build_operations_from_args(args)
+    except Exception as e:
+        print(f"❌ 读取规则文件失败: {e}")
+        sys.exit(1)
+    
+    if operations or args.stream:
+        if not operations:
+            print("❌ 流式模式需要至少指定一个删除操作")
+            sys.exit(1)
+        if args.output and len(data_files) > 1:
+            print("❌ 指定 --output 时只能处理一个数据文件")
+            sys.exit(1)
+        mode = "流式模式" if args.stream else "规则模式"
+        print(f"🛠️  数据清理工具启动 ({mode})")
+        print("="*60)
+        if not run_unattended(data_files, operations, args.stream, args.output):
+            sys.exit(1)
+        return
+    
     print("🛠️  数据清理工具启动")
     print("="*60)
     
-    cleaner = DataCleaner()
+    cleaner = DataCleaner(data_files[0])
     
     if not cleaner.load_data():
         return
     
-    # 自动备份
-    cleaner.backup_data()
-    
     # 显示使用方法
     print("\n💡 使用方法:")
     print("1. 查看数据结构了解当前内容")
     print("2. 选择要删除的内容类型")
     print("3. 保存修改")
-    print("4. 原始数据已自动备份")
+    print(f"4. 保存时自动备份原始文件到: {cleaner.backup_manager.backup_root}")
     
     # 启动交互式菜单
     cleaner.interactive_menu()
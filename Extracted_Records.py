@@ -0,0 +1,207 @@
+"""
+紧凑的提取结果表 - Extracted Records
+功能：抓取脚本提取的国家/月份/设备表格按列保存，不再每行一个带重复英文键的字典
+- 列名只保存一次（并做字符串驻留），每列一个序列；数字列压缩为 array（每个值 8 字节，而不是每个值一个 float 对象）
+- 从工作进程传回、写入提取缓存、在主进程中聚合时都保持这种形式（array 按原始字节 pickle，体积也更小）
+- 只在写JSON时（json_default）或调用 to_records() 时才展开为字典，输出与原来的字典列表完全一致
+"""
+
+import sys
+from array import array
+
+# PackedColumn 中每个值的类型
+_FLOAT, _INT, _OTHER = 0, 1, 2
+# 能用 double 精确表示的整数范围
+_EXACT_INT = 2 ** 53
+
+
+class _Missing:
+    """行中缺少某列时的占位值（展开时跳过该键）"""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __reduce__(self):
+        # 反序列化后仍是同一个对象
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+def unify_numeric_columns(columns, rows):
+    """
+    与 pandas DataFrame → to_dict(orient='records') 的类型结果保持一致：
+    某列全部是数字且同时有整数和小数时，整数转为小数（例如 100 → 100.0）
+    """
+    converted = [position for position in range(len(columns))
+                 if {type(row[position]) for row in rows if position < len(row)} == {int, float}]
+    if not converted:
+        return rows
+    result = []
+    for row in rows:
+        row = list(row)
+        for position in converted:
+            if position < len(row):
+                row[position] = float(row[position])
+        result.append(row)
+    return result
+
+
+class PackedColumn:
+    """
+    以数字为主的列：数值存 array('d')，每个值的类型（小数/整数/其他）存一个字节，
+    其他值（'N/A'、空字符串等）按行号存在字典里；遍历时还原为原来的值和类型
+    """
+
+    __slots__ = ('numbers', 'kinds', 'others')
+
+    def __init__(self, numbers, kinds, others):
+        self.numbers = numbers
+        self.kinds = kinds
+        self.others = others
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _value(self, index, number, kind):
+        if kind == _FLOAT:
+            return number
+        if kind == _INT:
+            return int(number)
+        return self.others[index]
+
+    def __iter__(self):
+        for index, (number, kind) in enumerate(zip(self.numbers, self.kinds)):
+            yield self._value(index, number, kind)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return self._value(index, self.numbers[index], self.kinds[index])
+
+    def __reduce__(self):
+        return (PackedColumn, (self.numbers, self.kinds, self.others))
+
+
+def compact_column(values):
+    """
+    压缩一列：全是小数 → array('d')，全是整数 → array('q')，以数字为主 → PackedColumn，
+    其他（国家名、月份等文本列）保持列表
+    """
+    numbers = array('d')
+    kinds = bytearray()
+    others = {}
+    for index, value in enumerate(values):
+        value_type = type(value)
+        if value_type is float:
+            numbers.append(value)
+            kinds.append(_FLOAT)
+        elif value_type is int and -_EXACT_INT <= value <= _EXACT_INT:
+            numbers.append(value)
+            kinds.append(_INT)
+        else:
+            numbers.append(0.0)
+            kinds.append(_OTHER)
+            others[index] = value
+    if not values or len(others) * 2 > len(values):
+        return values
+    if not others and _INT not in kinds:
+        return numbers
+    if not others and _FLOAT not in kinds:
+        return array('q', map(int, numbers))
+    return PackedColumn(numbers, bytes(kinds), others)
+
+
+class RecordTable:
+    """按列保存的表格；按记录遍历时给出字典（兼容原来的字典列表用法）"""
+
+    __slots__ = ('columns', 'data', '_positions')
+
+    def __init__(self, columns=(), data=None):
+        self.columns = [sys.intern(column) if isinstance(column, str) else column for column in columns]
+        self.data = list(data) if data is not None else [[] for _ in self.columns]
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+
+    @classmethod
+    def from_rows(cls, columns, rows):
+        """按位置的行（列表或元组）建表，数字列的类型与 DataFrame 转换结果一致"""
+        rows = unify_numeric_columns(columns, rows)
+        data = [[row[position] if position < len(row) else MISSING for row in rows]
+                for position in range(len(columns))]
+        table = cls(columns, data)
+        table.compact()
+        return table
+
+    def append(self, record):
+        """追加一行字典记录（出现新列时扩展列名，之前的行在该列为缺失）"""
+        length = len(self)
+        for column in record:
+            if column not in self._positions:
+                self._positions[column] = len(self.columns)
+                self.columns.append(sys.intern(column) if isinstance(column, str) else column)
+                self.data.append([MISSING] * length)
+        for position, column in enumerate(self.columns):
+            values = self.data[position]
+            if type(values) is not list:
+                # 已压缩的列重新变为列表再追加
+                values = self.data[position] = list(values)
+            values.append(record.get(column, MISSING))
+
+    def compact(self):
+        """提取完成后压缩数字列"""
+        self.data = [compact_column(values) for values in self.data]
+        return self
+
+    def column(self, name):
+        """某一列的全部值（缺失为 None），不展开整行"""
+        position = self._positions.get(name)
+        if position is None:
+            return [None] * len(self)
+        return [None if value is MISSING else value for value in self.data[position]]
+
+    def _record(self, row):
+        return {column: value for column, value in zip(self.columns, row) if value is not MISSING}
+
+    def to_records(self):
+        """展开为字典列表（只在序列化时使用）"""
+        return [self._record(row) for row in zip(*self.data)]
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def __iter__(self):
+        for row in zip(*self.data):
+            yield self._record(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_records()[index]
+        if index < 0:
+            index += len(self)
+        return self._record([values[index] for values in self.data])
+
+    def __eq__(self, other):
+        if isinstance(other, RecordTable):
+            return self.to_records() == other.to_records()
+        if isinstance(other, list):
+            return self.to_records() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"RecordTable({len(self.columns)} columns, {len(self)} rows)"
+
+    def __reduce__(self):
+        # 只序列化列名和各列数据，不带查找字典
+        return (RecordTable, (self.columns, self.data))
+
+
+def json_default(value):
+    """json.dump 的 default 钩子：写出时才把 RecordTable 展开为字典列表"""
+    if isinstance(value, RecordTable):
+        return value.to_records()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
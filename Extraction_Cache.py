@@ -0,0 +1,160 @@
+"""
+提取结果缓存 - Extraction Cache
+功能：把每个HTML页面的提取结果缓存到磁盘，只修改了整合逻辑时重新运行无需再次解析HTML
+- 缓存键 = 提取器版本 + 页面类型 + 平台 + HTML内容 sha256（与文件名、路径、修改时间无关）
+- 提取器版本由 EXTRACTOR_VERSION 和提取相关模块的源码哈希组成：抓取脚本、解析分派（Product_Scheduler）、
+  HTML裁剪、产品身份识别，以及被 pickle 保存的表格结构（Extracted_Records），修改其中任何一个后旧缓存自动失效
+- 结果用 pickle 保存，每个页面一个文件；总大小超出上限时按最近使用时间淘汰（LRU）
+"""
+
+import os
+import pickle
+import hashlib
+import threading
+
+from Safe_File_Writer import atomic_write_bytes
+
+# 提取结果格式变化但源码哈希不足以体现时（例如依赖库升级）手动递增
+EXTRACTOR_VERSION = "1"
+# 源码参与提取器版本计算的模块（影响缓存中的提取结果或其 pickle 格式的模块）
+EXTRACTOR_SOURCES = (
+    'Grabbed_Aggregated_Analytics_Data.py',
+    'Revenue_Scraper.py',
+    'User_Behavior_Scraper.py',
+    'User_Retention_Scraper.py',
+    'Product_Scheduler.py',
+    'Html_Minimizer.py',
+    'Extracted_Records.py',
+    'Product_Identity.py',
+)
+DEFAULT_CACHE_SIZE_MB = 1024
+CACHE_SUFFIX = '.pickle'
+
+# 缓存未命中（缓存的提取结果本身可能是 None）
+MISS = object()
+
+
+def extractor_version():
+    """提取器版本标识：手动版本号 + 提取相关模块的源码哈希"""
+    digest = hashlib.sha256(EXTRACTOR_VERSION.encode('utf-8'))
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for source in EXTRACTOR_SOURCES:
+        try:
+            with open(os.path.join(base_dir, source), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(source.encode('utf-8'))
+    return f"{EXTRACTOR_VERSION}-{digest.hexdigest()[:16]}"
+
+
+class ExtractionCache:
+    """磁盘上的提取结果缓存（可在多个读取线程中同时使用）"""
+
+    def __init__(self, cache_dir, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_size_mb * 1024 * 1024
+        self.version = extractor_version()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 缓存文件 → [大小, 最近使用时间]
+        self.entries = self._scan()
+        self.total_bytes = sum(size for size, _ in self.entries.values())
+        if self.total_bytes > self.max_bytes:
+            # 大小上限调小后先淘汰一次
+            with self.lock:
+                self._evict()
+
+    def _scan(self):
+        """扫描缓存目录，建立大小和最近使用时间索引"""
+        entries = {}
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(CACHE_SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    entries[entry.path] = [stat.st_size, stat.st_mtime]
+        return entries
+
+    def key(self, html, file_type, platform=None, minimized=False):
+        """缓存键：提取器版本、页面类型、平台、是否预处理和HTML原始字节的哈希"""
+        digest = hashlib.sha256(f"{self.version}|{file_type}|{platform}|{int(minimized)}|".encode('utf-8'))
+        digest.update(html)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """读取缓存的提取结果，没有时返回 MISS"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            # 更新最近使用时间，供 LRU 淘汰使用
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return MISS
+        except Exception as e:
+            print(f"⚠️ 提取缓存损坏，重新解析: {e}")
+            with self.lock:
+                self.misses += 1
+            return MISS
+        with self.lock:
+            self.hits += 1
+            if path in self.entries:
+                self.entries[path][1] = os.path.getmtime(path)
+        return data
+
+    def put(self, key, data):
+        """保存提取结果，超出大小上限时淘汰最久未使用的缓存"""
+        path = self._path(key)
+        try:
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+            atomic_write_bytes(path, payload)
+        except Exception as e:
+            print(f"⚠️ 保存提取缓存失败: {e}")
+            return
+        with self.lock:
+            previous = self.entries.get(path)
+            if previous:
+                self.total_bytes -= previous[0]
+            self.entries[path] = [len(payload), os.path.getmtime(path)]
+            self.total_bytes += len(payload)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到总大小降到上限的 90%（调用时已持有锁）"""
+        target = self.max_bytes * 0.9
+        for path, (size, _) in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del self.entries[path]
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def summary(self):
+        """缓存统计，写入批处理总结报告"""
+        with self.lock:
+            return {
+                "Extractor_Version": self.version,
+                "Hits": self.hits,
+                "Misses": self.misses,
+                "Evictions": self.evictions,
+                "Entries": len(self.entries),
+                "Size_MB": round(self.total_bytes / (1024 * 1024), 2),
+                "Max_Size_MB": round(self.max_bytes / (1024 * 1024), 2)
+            }
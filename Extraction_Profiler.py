@@ -0,0 +1,324 @@
+"""
+提取性能分析 - Extraction Profiler
+功能：找出慢的导出页面把时间花在哪里（带 class lambda 的 find_all、get_text、正则、JSON写出……）
+- 阶段计时：抓取脚本在各提取阶段打点（PhaseTimer.lap），批处理中的读取、聚合、写出等阶段也计时，
+  结束时按页面类型汇总每个阶段的耗时
+- 采样模式：解析期间由后台线程按固定间隔采样解析线程的调用栈，每个产品写出一个折叠栈文件（.folded），
+  可直接用 flamegraph.pl 或 speedscope 生成火焰图；批处理结束阶段（写产品文件、合并文件）单独一个文件
+- 汇总整个批次的采样，列出自身耗时最多的函数（--profile-top N）
+- 工作进程中的计时和采样随解析结果一起返回主进程；未开启分析时打点只有一次线程局部变量判断
+
+用法: python Extraction_Profiler.py 页面1.html [页面2.html ...] [--top N] [--interval MS] [--output 目录]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+import contextlib
+
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+DEFAULT_TOP_FUNCTIONS = 20
+PROFILE_DIR = "profiles"
+BATCH_PROFILE_NAME = "_batch_output"
+WHOLE_BATCH_PROFILE_NAME = "_whole_batch"
+
+# 当前线程正在分析的解析任务的记录（None 表示未开启）
+_state = threading.local()
+# 代码对象 → 火焰图中的函数名
+_labels = {}
+
+
+class PhaseTimer:
+    """抓取脚本中的阶段打点：lap(阶段) 记录距上一次打点的耗时，未开启分析时不做任何事"""
+
+    __slots__ = ('phases', 'last')
+
+    def __init__(self):
+        record = getattr(_state, 'record', None)
+        self.phases = record["phases"] if record is not None else None
+        self.last = time.perf_counter() if record is not None else 0.0
+
+    def lap(self, phase):
+        if self.phases is None:
+            return
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+
+def frame_label(code):
+    """函数名：模块（__init__ 用包名）:限定名，lambda 附加行号以区分不同的 class 过滤函数"""
+    label = _labels.get(code)
+    if label is None:
+        path, file_name = os.path.split(code.co_filename)
+        module = os.path.splitext(file_name)[0]
+        if module == '__init__':
+            module = os.path.basename(path)
+        elif code.co_filename.startswith('<'):
+            # <frozen importlib._bootstrap> 等内置模块
+            module = code.co_filename.strip('<>')
+        name = getattr(code, 'co_qualname', code.co_name)
+        if code.co_name == '<lambda>':
+            name = f"{name}@{code.co_firstlineno}"
+        label = _labels[code] = f"{module}:{name}".replace(';', ',').replace(' ', '_')
+    return label
+
+
+class StackSampler:
+    """后台线程按固定间隔采样目标线程的调用栈，结果为 {折叠栈: 采样次数}"""
+
+    def __init__(self, thread_id, interval, root_code=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        # 采样到这一层为止（不含），去掉工作进程框架的调用栈
+        self.root_code = root_code
+        self.samples = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            del frame
+            # 停止时正在等待的这次采样落在 stop() 中，不计入
+            if stack and not self.stopped.is_set():
+                key = ';'.join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self.samples
+
+
+def profiled_call(function, args, sample_interval=None):
+    """
+    在分析模式下调用解析函数（在工作进程中运行），返回 (结果, 分析记录)
+    分析记录: {"phases": {阶段: 秒}, "samples": {折叠栈: 次数}, "seconds": 总耗时}
+    """
+    record = {"phases": {}, "samples": {}, "seconds": 0.0}
+    _state.record = record
+    sampler = StackSampler(threading.get_ident(), sample_interval, profiled_call.__code__).start() if sample_interval else None
+    start = time.perf_counter()
+    try:
+        result = function(*args)
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        if sampler:
+            record["samples"] = sampler.stop()
+        _state.record = None
+    return result, record
+
+
+def _merge_samples(target, samples):
+    for stack, count in samples.items():
+        target[stack] = target.get(stack, 0) + count
+
+
+def write_folded(path, samples):
+    """写出折叠栈文件（每行 "栈 次数"，flamegraph.pl / speedscope 的输入格式）"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in sorted(samples.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def hot_functions(samples, top):
+    """按自身采样次数（栈顶函数）排序的前 top 个函数，同时给出累计采样次数（在栈中出现）"""
+    total = sum(samples.values())
+    own, inclusive = {}, {}
+    for stack, count in samples.items():
+        frames = stack.split(';')
+        own[frames[-1]] = own.get(frames[-1], 0) + count
+        for label in set(frames):
+            inclusive[label] = inclusive.get(label, 0) + count
+    ranked = sorted(own.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{
+        "Function": label,
+        "Self_Samples": count,
+        "Self_Percent": round(100 * count / total, 1),
+        "Total_Percent": round(100 * inclusive[label] / total, 1)
+    } for label, count in ranked]
+
+
+def safe_file_name(name):
+    return re.sub(r'[^\w.-]+', '_', name) or "product"
+
+
+class ExtractionProfiler:
+    """
+    批处理的性能分析汇总（在主进程中，可在多个线程中同时记录）
+    output_dir: 折叠栈文件目录；sample_interval: 采样间隔（秒），None 时只做阶段计时
+    """
+
+    def __init__(self, output_dir=None, sample_interval=None):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.lock = threading.Lock()
+        # 页面类型 → {"pages": 页面数, "seconds": 解析耗时, "phases": {阶段: 秒}}
+        self.stats = {}
+        # 产品 → 尚未写出的采样
+        self.product_samples = {}
+        # 整个批次的采样（用于汇总最耗时的函数）
+        self.samples = {}
+
+    def _stats(self, page_type):
+        return self.stats.setdefault(page_type, {"pages": 0, "seconds": 0.0, "phases": {}})
+
+    def add_phase(self, page_type, phase, seconds):
+        """记录主进程中的阶段耗时（读取、聚合、写出等）"""
+        with self.lock:
+            phases = self._stats(page_type)["phases"]
+            phases[phase] = phases.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, page_type, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(page_type, phase, time.perf_counter() - start)
+
+    def add_record(self, product, page_type, record):
+        """记录一个页面的解析分析结果（profiled_call 返回的记录）"""
+        with self.lock:
+            stats = self._stats(page_type)
+            stats["pages"] += 1
+            stats["seconds"] += record["seconds"]
+            for phase, seconds in record["phases"].items():
+                stats["phases"][phase] = stats["phases"].get(phase, 0.0) + seconds
+            if record["samples"]:
+                _merge_samples(self.samples, record["samples"])
+                if product is not None:
+                    _merge_samples(self.product_samples.setdefault(product, {}), record["samples"])
+
+    @contextlib.contextmanager
+    def sampling(self, name):
+        """采样当前线程（主进程中的批处理结束阶段），结束后写出 <name>.folded"""
+        if not self.sample_interval:
+            yield
+            return
+        sampler = StackSampler(threading.get_ident(), self.sample_interval).start()
+        try:
+            yield
+        finally:
+            samples = sampler.stop()
+            with self.lock:
+                _merge_samples(self.samples, samples)
+            self._write(name, samples)
+
+    def finish_product(self, product):
+        """产品提取完成：写出该产品的折叠栈文件"""
+        with self.lock:
+            samples = self.product_samples.pop(product, None)
+        if samples:
+            self._write(product, samples)
+
+    def _write(self, name, samples):
+        if not self.output_dir or not samples:
+            return
+        path = os.path.join(self.output_dir, f"{safe_file_name(name)}.folded")
+        try:
+            write_folded(path, samples)
+            print(f"🔥 调用栈采样已写出: {path}")
+        except Exception as e:
+            print(f"⚠️ 写出调用栈采样失败 {path}: {e}")
+
+    def summary(self, top=DEFAULT_TOP_FUNCTIONS):
+        """统计结果，写入批处理总结报告"""
+        with self.lock:
+            samples = dict(self.samples)
+            pages = {
+                page_type: {
+                    "Pages": stats["pages"],
+                    "Parse_Seconds": round(stats["seconds"], 3),
+                    "Phases": {phase: round(seconds, 3) for phase, seconds in
+                               sorted(stats["phases"].items(), key=lambda item: item[1], reverse=True)}
+                }
+                for page_type, stats in self.stats.items()
+            }
+        return {
+            "Sample_Interval_ms": round(self.sample_interval * 1000, 3) if self.sample_interval else None,
+            "Samples": sum(samples.values()),
+            "Page_Types": pages,
+            "Hot_Functions": hot_functions(samples, top) if samples else []
+        }
+
+    def finish_batch(self, top=0):
+        """批处理结束：写出整个批次的折叠栈文件，打印各阶段耗时和（top > 0 时）最耗时的函数"""
+        with self.lock:
+            samples = dict(self.samples)
+        self._write(WHOLE_BATCH_PROFILE_NAME, samples)
+        print_summary(self.summary(top or DEFAULT_TOP_FUNCTIONS), top)
+
+
+def print_summary(summary, top=0):
+    """打印阶段耗时和最耗时的函数"""
+    if summary["Page_Types"]:
+        print("⏱️ 提取阶段耗时:")
+        # 主进程的批处理阶段放在最后
+        for page_type, stats in sorted(summary["Page_Types"].items(), key=lambda item: not item[1]["Pages"]):
+            phases = "，".join(f"{phase} {seconds} 秒" for phase, seconds in stats["Phases"].items())
+            pages = f"{stats['Pages']} 个页面，解析 {stats['Parse_Seconds']} 秒" if stats["Pages"] else "主进程"
+            print(f"   {page_type}（{pages}）: {phases}")
+    if top and summary["Hot_Functions"]:
+        print(f"🔥 自身耗时最多的 {len(summary['Hot_Functions'])} 个函数"
+              f"（{summary['Samples']} 次采样，间隔 {summary['Sample_Interval_ms']} 毫秒）:")
+        for rank, function in enumerate(summary["Hot_Functions"], 1):
+            print(f"   {rank:>2}. {function['Function']}  自身 {function['Self_Percent']}%  累计 {function['Total_Percent']}%")
+    elif top:
+        print("⚠️ 没有采样数据（全部页面命中提取缓存时不会解析，可以加 --no-cache）")
+
+
+def profile_pages(file_paths, top, interval_ms, output_dir):
+    """单独分析几个页面：每个页面写出一个折叠栈文件，打印阶段耗时和最耗时的函数"""
+    # 延迟导入：只有单独分析需要加载抓取脚本；抓取脚本中的 PhaseTimer 读取的是 Extraction_Profiler 模块
+    # （不是作为脚本运行的 __main__）中的状态，所以分析函数也从该模块导入
+    import io
+    from Extraction_Profiler import ExtractionProfiler, profiled_call
+    from Html_File_Classifier import sniff_file_type, identify_file_type_by_name
+    from Html_Input_Source import open_html_text
+    from Product_Scheduler import parse_html
+
+    profiler = ExtractionProfiler(output_dir, interval_ms / 1000)
+    for file_path in file_paths:
+        file_type = sniff_file_type(file_path) or identify_file_type_by_name(os.path.basename(file_path))
+        if file_type == 'unknown':
+            print(f"⚠️ 无法识别页面类型，跳过: {file_path}")
+            continue
+        with open_html_text(file_path) as f:
+            html_content = f.read()
+        platform = 'iOS' if 'ios' in os.path.basename(file_path).lower() else 'Android'
+        # 抓取脚本的调试输出不影响计时结果的阅读
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, record = profiled_call(parse_html, (file_type, html_content, platform), profiler.sample_interval)
+        name = os.path.basename(file_path)
+        profiler.add_record(name, file_type, record)
+        profiler.finish_product(name)
+        print(f"📄 {name}（{file_type}）: {record['seconds']:.3f} 秒")
+    profiler.finish_batch(top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对导出页面的提取过程做阶段计时和调用栈采样")
+    parser.add_argument('html_files', nargs='+', help="HTML导出文件（可以是压缩文件）")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_FUNCTIONS, help="列出自身耗时最多的函数个数")
+    parser.add_argument('--interval', type=float, default=DEFAULT_SAMPLE_INTERVAL_MS, help="采样间隔（毫秒）")
+    parser.add_argument('--output', default=PROFILE_DIR, help="折叠栈文件的输出目录")
+    args = parser.parse_args()
+    profile_pages(args.html_files, args.top, args.interval, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+输入目录监视器 - Folder Watcher
+功能：长时间运行，发现新的或修改过的HTML导出文件后只重新处理受影响的产品
+- 安装了 watchdog 时使用文件系统事件（inotify / ReadDirectoryChangesW 等），否则定期轮询
+- 防抖：产品文件夹在 debounce 秒内没有新变化、且文件大小和修改时间稳定后才处理，避免读到写了一半的文件
+- 一轮处理完成后统一写出产品文件，只清理本轮写出的产品文件（可选）并增量刷新合并文件
+- 覆盖全部产品的分析报告（留存曲线、排名）按 report_interval 节流：频繁变化时最多每隔 report_interval 秒重新生成一次，
+  每轮的开销不随产品总数增长；退出监视前生成最后一次
+- zip归档变化时重新处理归档中的全部产品
+"""
+
+import os
+import time
+import threading
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+from Batch_Checkpoint import folder_fingerprint
+from Html_Input_Source import is_html_name, is_archive_name, archive_product_folders, list_input_products, close_archives
+
+DEFAULT_DEBOUNCE_SECONDS = 5.0
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_REPORT_INTERVAL = 60.0
+
+
+class _EventHandler:
+    """watchdog 事件处理器：只记录受影响的产品，处理在主循环中进行"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+            if path and (is_html_name(str(path)) or is_archive_name(str(path))):
+                self.watcher.mark_changed(str(path))
+
+
+class FolderWatcher:
+    """监视输入目录并增量处理产品"""
+
+    def __init__(self, processor, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, force_polling=False, report_interval=DEFAULT_REPORT_INTERVAL):
+        self.processor = processor
+        self.base_path = os.path.abspath(processor.base_input_path)
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        self.use_events = Observer is not None and not force_polling
+        self.lock = threading.Lock()
+        # 产品文件夹 → 最后一次发现变化的时间
+        self.pending = {}
+        # 产品文件夹 → 上次检查时的输入指纹（用于轮询和稳定性判断）
+        self.snapshots = {}
+        self.report_interval = report_interval
+        # 有产品刷新后还没有重新生成分析报告
+        self.reports_pending = False
+        self.last_report_time = None
+
+    def product_folder_for(self, file_path):
+        """HTML文件所属的产品文件夹：输入目录下的第一级子文件夹或归档，或输入目录本身"""
+        relative = os.path.relpath(os.path.abspath(file_path), self.base_path)
+        parts = relative.split(os.sep)
+        if len(parts) == 1:
+            return os.path.join(self.base_path, parts[0]) if is_archive_name(parts[0]) else self.base_path
+        return os.path.join(self.base_path, parts[0])
+
+    def mark_changed(self, file_path):
+        """记录文件变化（可能在 watchdog 线程中调用）"""
+        folder_path = self.product_folder_for(file_path)
+        folders = [folder_path]
+        if is_archive_name(folder_path):
+            try:
+                folders = archive_product_folders(folder_path)
+            except Exception:
+                # 归档还在写入中，稍后由下一个事件重新触发
+                return
+        with self.lock:
+            for folder in folders:
+                self.pending[folder] = time.monotonic()
+
+    def list_product_folders(self):
+        """当前的产品文件夹：输入目录直接包含HTML文件时为单个产品模式"""
+        return list_input_products(self.base_path)[0]
+
+    def poll(self):
+        """轮询模式：比较各产品文件夹的输入指纹"""
+        try:
+            folders = self.list_product_folders()
+        except Exception as e:
+            print(f"⚠️ 扫描输入目录失败: {e}")
+            return
+        for folder_path in folders:
+            try:
+                fingerprint = folder_fingerprint(folder_path)
+            except OSError:
+                continue
+            if self.snapshots.get(folder_path) != fingerprint:
+                self.snapshots[folder_path] = fingerprint
+                with self.lock:
+                    self.pending[folder_path] = time.monotonic()
+
+    def take_ready_products(self):
+        """取出已经稳定（防抖时间内没有变化）的产品文件夹"""
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            candidates = [folder for folder, changed in self.pending.items()
+                          if now - changed >= self.debounce_seconds]
+        for folder_path in candidates:
+            # 文件仍在变化（例如大文件还在复制）时重新计时
+            try:
+                fingerprint = folder_fingerprint(folder_path)
+            except OSError:
+                with self.lock:
+                    self.pending.pop(folder_path, None)
+                continue
+            with self.lock:
+                if self.snapshots.get(folder_path) != fingerprint:
+                    self.snapshots[folder_path] = fingerprint
+                    self.pending[folder_path] = now
+                else:
+                    self.pending.pop(folder_path, None)
+                    ready.append(folder_path)
+        return ready
+
+    def catch_up(self):
+        """启动时把检查点中没有完成记录（或输入已变化）的产品加入待处理队列"""
+        for folder_path in self.list_product_folders():
+            try:
+                self.snapshots[folder_path] = folder_fingerprint(folder_path)
+            except OSError:
+                continue
+            if not self.processor.is_product_complete(folder_path):
+                self.pending[folder_path] = 0
+
+    def process_ready(self, folders):
+        """重新提取受影响的产品并刷新合并文件"""
+        successful = []
+        for folder_path in folders:
+            folder_name = os.path.basename(folder_path)
+            print(f"\n🔔 检测到变化，重新处理产品: {folder_name}")
+            print("=" * 80)
+            try:
+                if self.processor.process_product_folder(folder_path):
+                    successful.append(folder_name)
+                    print(f"✅ 产品 '{folder_name}' 处理成功")
+                else:
+                    print(f"❌ 产品 '{folder_name}' 处理失败")
+            except Exception as e:
+                print(f"❌ 处理产品文件夹 '{folder_name}' 时出错: {e}")
+
+        # 不保留归档句柄，归档文件可以随时被替换
+        close_archives()
+        if not successful:
+            return
+        # 本轮的产品文件和合并文件一次写出，分析报告由 refresh_reports 按时间间隔生成
+        successful = self.processor.finish_batch(successful, run_reports=False)
+        if successful:
+            self.reports_pending = True
+            print(f"🔄 已刷新 {len(successful)} 个产品: {', '.join(successful)}")
+
+    def refresh_reports(self, force=False):
+        """距上次生成分析报告超过 report_interval 秒时重新生成（force 时只要有刷新就生成）"""
+        if not self.reports_pending:
+            return
+        now = time.monotonic()
+        if not force and self.last_report_time is not None and now - self.last_report_time < self.report_interval:
+            return
+        self.reports_pending = False
+        self.last_report_time = now
+        self.processor.run_reports()
+
+    def run(self):
+        """进入监视循环，Ctrl+C 退出"""
+        self.processor.recover_script_backups()
+        # 监视模式始终续用检查点，重启后不会重复处理已完成的产品
+        self.processor.resume = True
+        self.processor.start_checkpoint()
+        self.processor.memory.start()
+        self.catch_up()
+
+        observer = None
+        if self.use_events:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), self.base_path, recursive=True)
+            observer.start()
+            print(f"👀 监视输入目录（文件系统事件）: {self.base_path}")
+        else:
+            print(f"👀 监视输入目录（每 {self.poll_interval} 秒轮询）: {self.base_path}")
+        print(f"⏱️ 防抖时间: {self.debounce_seconds} 秒，分析报告最多每 {self.report_interval} 秒刷新一次，按 Ctrl+C 退出")
+
+        try:
+            while True:
+                if not self.use_events:
+                    self.poll()
+                ready = self.take_ready_products()
+                if ready:
+                    self.process_ready(ready)
+                self.refresh_reports()
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            print("\n🛑 停止监视")
+            self.refresh_reports(force=True)
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+            self.processor.close_worker_pool()
+            self.processor.memory.stop()
@@ -0,0 +1,66 @@
+"""
+HTML文件类型识别器 - HTML File Classifier
+功能：根据文件内容识别 data.ai 导出页面的类型
+- 按块扫描原始字节，命中第一个表格标记即返回，不做任何HTML解析
+- 扫描字节数有上限，超出上限仍未命中时回退到文件名规则
+- 压缩文件和归档内文件边读边解压，只解压到命中标记为止
+"""
+
+import re
+
+from Html_Input_Source import open_html_binary, html_base_name
+
+SNIFF_CHUNK_SIZE = 64 * 1024
+SNIFF_MAX_BYTES = 4 * 1024 * 1024
+
+# 表格标记 → 文件类型（这些属性只出现在对应页面的表格容器上）
+CONTENT_MARKERS = {
+    b'data-table-type="app_user_retention_table"': 'user_retention',
+    b'data-table-type="publisher_apps_user_retention_table"': 'user_retention',
+    b'table_change(__table__$app_usage_country)': 'user_behavior',
+    b'data-header-key="est_revenue__avg"': 'revenue',
+    b'data-key="est_revenue__avg"': 'revenue',
+    b'data-header-key="est_download__sum"': 'main_allplatform',
+    b'data-key="est_download__sum"': 'main_allplatform',
+}
+
+_MARKER_PATTERN = re.compile(b'|'.join(re.escape(marker) for marker in CONTENT_MARKERS))
+_MARKER_OVERLAP = max(len(marker) for marker in CONTENT_MARKERS) - 1
+
+
+def sniff_file_type(file_path, max_bytes=SNIFF_MAX_BYTES, chunk_size=SNIFF_CHUNK_SIZE):
+    """扫描文件字节识别类型，未命中时返回 None"""
+    return sniff_stream_type(open_html_binary(file_path), max_bytes, chunk_size)
+
+
+def sniff_stream_type(stream, max_bytes=SNIFF_MAX_BYTES, chunk_size=SNIFF_CHUNK_SIZE):
+    """扫描二进制流识别类型，扫描结束后关闭流，未命中时返回 None"""
+    scanned = 0
+    tail = b''
+    with stream:
+        while scanned < max_bytes:
+            chunk = stream.read(min(chunk_size, max_bytes - scanned))
+            if not chunk:
+                break
+            scanned += len(chunk)
+            match = _MARKER_PATTERN.search(tail + chunk)
+            if match:
+                return CONTENT_MARKERS[match.group(0)]
+            tail = chunk[-_MARKER_OVERLAP:]
+    return None
+
+
+def identify_file_type_by_name(filename):
+    """根据文件名识别HTML文件类型（内容识别失败时的回退规则）"""
+    filename = html_base_name(filename)
+    filename_lower = filename.lower()
+    if '行为' in filename or 'behavior' in filename_lower or 'behaviour' in filename_lower or 'userbehavior' in filename_lower or 'userbehaivor' in filename_lower:
+        return 'user_behavior'
+    elif '留存' in filename or 'retention' in filename_lower:
+        return 'user_retention'
+    elif '收入' in filename or 'revenue' in filename_lower:
+        return 'revenue'
+    elif 'allplatform' in filename_lower or '全平台' in filename or '下载量' in filename:
+        return 'main_allplatform'
+    else:
+        return 'unknown'
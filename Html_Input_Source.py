@@ -0,0 +1,243 @@
+"""
+HTML输入源 - Html Input Source
+功能：统一读取散放的、压缩的和打包在zip归档中的HTML导出文件
+- 支持 .html、.html.gz 和 .html.zst（需要安装 zstandard）
+- zip 归档中的文件用 "归档路径/归档内路径" 表示，例如 exports.zip/ProductA/x_revenue.html.gz；
+  归档中每个直接包含HTML文件的目录是一个产品文件夹，HTML文件在归档根目录时整个归档是一个产品
+- 读取时边读边解压，不解压到磁盘，也不会一次读入整个压缩文件
+"""
+
+import io
+import os
+import gzip
+import zipfile
+import threading
+from collections import namedtuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HTML_SUFFIXES = ('.html', '.html.gz', '.html.zst')
+ARCHIVE_SUFFIX = '.zip'
+
+# 归档内文件的状态：大小为解压后大小，修改时间取归档文件本身（归档被替换时指纹随之变化）
+ArchiveMemberStat = namedtuple('ArchiveMemberStat', ['st_size', 'st_mtime_ns'])
+
+# 没有 UTF-8 标记的归档内文件名按以下编码依次尝试（Windows 压缩工具常用本地编码）
+ARCHIVE_NAME_ENCODINGS = ('utf-8', 'gbk')
+# zip 规范规定没有 UTF-8 标记的文件名按 cp437 解码，zipfile 即如此处理
+_ZIP_UTF8_FLAG = 0x800
+
+# 已打开的归档：路径 → ((大小, 修改时间), ZipFile, {HTML文件名: ZipInfo})
+# 避免每读一个文件都重新解析中央目录
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def is_html_name(name):
+    """文件名是否为（可能压缩的）HTML导出文件"""
+    return name.lower().endswith(HTML_SUFFIXES)
+
+
+def is_archive_name(name):
+    """文件名是否为zip归档"""
+    return name.lower().endswith(ARCHIVE_SUFFIX)
+
+
+def html_base_name(name):
+    """去掉压缩扩展名后的HTML文件名（x.html.gz → x.html）"""
+    lower = name.lower()
+    for suffix in ('.gz', '.zst'):
+        if lower.endswith('.html' + suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def split_archive_path(path):
+    """
+    拆分归档内路径，返回 (归档路径, 归档内路径)
+    不在归档中时返回 (path, None)；路径就是归档本身时归档内路径为 ''
+    """
+    lower = path.lower()
+    start = 0
+    while True:
+        index = lower.find(ARCHIVE_SUFFIX, start)
+        if index == -1:
+            return path, None
+        end = index + len(ARCHIVE_SUFFIX)
+        if end == len(path) or path[end] in (os.sep, '/'):
+            archive_path = path[:end]
+            if os.path.isfile(archive_path):
+                return archive_path, path[end + 1:].replace(os.sep, '/')
+        start = end
+
+
+def _member_name(info):
+    """归档内文件名：没有 UTF-8 标记时按常用编码重新解码"""
+    if info.flag_bits & _ZIP_UTF8_FLAG:
+        return info.filename
+    try:
+        raw = info.filename.encode('cp437')
+    except UnicodeEncodeError:
+        return info.filename
+    for encoding in ARCHIVE_NAME_ENCODINGS:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return info.filename
+
+
+def open_archive(archive_path):
+    """打开（并缓存）zip归档，返回 (ZipFile, {HTML文件名: ZipInfo})；归档文件被替换后重新打开"""
+    stat = os.stat(archive_path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _archives_lock:
+        cached = _archives.get(archive_path)
+        if cached and cached[0] == key:
+            return cached[1], cached[2]
+        # 旧句柄上可能还有正在读取的文件，交给垃圾回收关闭
+        archive = zipfile.ZipFile(archive_path)
+        members = {}
+        for info in archive.infolist():
+            name = _member_name(info)
+            if not info.is_dir() and is_html_name(name):
+                members[name] = info
+        _archives[archive_path] = (key, archive, members)
+        return archive, members
+
+
+def close_archives():
+    """关闭缓存的归档句柄（批处理结束时调用，Windows 上之后才能替换归档文件）"""
+    with _archives_lock:
+        for _, archive, _ in _archives.values():
+            archive.close()
+        _archives.clear()
+
+
+def _archive_html_members(archive_path):
+    """归档中的HTML文件：[(归档内路径, ZipInfo)]"""
+    return list(open_archive(archive_path)[1].items())
+
+
+def archive_product_folders(archive_path):
+    """归档中的产品文件夹（每个直接包含HTML文件的目录），以 归档路径/目录 表示"""
+    folders = set()
+    for name, _ in _archive_html_members(archive_path):
+        directory = name.rpartition('/')[0]
+        folders.add(os.path.join(archive_path, *directory.split('/')) if directory else archive_path)
+    return sorted(folders)
+
+
+def scan_html_files(folder_path):
+    """
+    列出产品文件夹中的HTML文件，返回 [(文件名, 路径, 状态)]
+    文件夹可以是普通目录、zip归档或归档内的目录；状态只保证有 st_size 和 st_mtime_ns
+    """
+    archive_path, inner = split_archive_path(folder_path)
+    if inner is None:
+        files = []
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if is_html_name(entry.name) and entry.is_file():
+                    files.append((entry.name, entry.path, entry.stat()))
+        return files
+
+    archive_mtime_ns = os.stat(archive_path).st_mtime_ns
+    prefix = inner.rstrip('/') + '/' if inner else ''
+    files = []
+    for name, info in _archive_html_members(archive_path):
+        if not name.startswith(prefix) or '/' in name[len(prefix):]:
+            continue
+        file_name = name[len(prefix):]
+        files.append((file_name, os.path.join(folder_path, file_name),
+                      ArchiveMemberStat(info.file_size, archive_mtime_ns)))
+    return files
+
+
+def stat_html_file(file_path):
+    """HTML文件的状态（归档内文件见 ArchiveMemberStat）"""
+    archive_path, inner = split_archive_path(file_path)
+    if inner is None:
+        return os.stat(file_path)
+    info = open_archive(archive_path)[1][inner]
+    return ArchiveMemberStat(info.file_size, os.stat(archive_path).st_mtime_ns)
+
+
+class _DecompressedStream(io.RawIOBase):
+    """解压流：关闭时一并关闭底层的压缩字节流"""
+
+    def __init__(self, stream, source):
+        self.stream = stream
+        self.source = source
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self.stream.close()
+            finally:
+                self.source.close()
+        super().close()
+
+
+def open_html_binary(file_path):
+    """以二进制流打开HTML文件，压缩文件边读边解压"""
+    archive_path, inner = split_archive_path(file_path)
+    if inner is None:
+        source = open(file_path, 'rb')
+    else:
+        archive, members = open_archive(archive_path)
+        source = archive.open(members[inner])
+
+    lower = file_path.lower()
+    try:
+        if lower.endswith('.gz'):
+            stream = gzip.GzipFile(fileobj=source, mode='rb')
+        elif lower.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"读取 .zst 文件需要安装 zstandard: {os.path.basename(file_path)}")
+            stream = zstandard.ZstdDecompressor().stream_reader(source, closefd=False)
+        else:
+            return source
+    except Exception:
+        source.close()
+        raise
+    return io.BufferedReader(_DecompressedStream(stream, source))
+
+
+def open_html_text(file_path, encoding='utf-8'):
+    """以文本方式打开HTML文件，压缩文件边读边解压"""
+    return io.TextIOWrapper(open_html_binary(file_path), encoding=encoding)
+
+
+def list_input_products(base_path):
+    """
+    输入目录中的产品文件夹，返回 (产品文件夹列表, 是否单个产品模式)
+    输入目录直接包含HTML文件时为单个产品模式；否则每个子文件夹是一个产品，
+    zip归档按其中包含HTML文件的目录展开
+    """
+    folders = []
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                folders.append(entry.path)
+            elif not entry.is_file():
+                continue
+            elif is_html_name(entry.name):
+                return [base_path], True
+            elif is_archive_name(entry.name):
+                try:
+                    folders.extend(archive_product_folders(entry.path))
+                except (OSError, zipfile.BadZipFile) as e:
+                    print(f"⚠️ 无法读取归档 {entry.name}: {e}")
+    return folders, False
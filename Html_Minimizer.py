@@ -0,0 +1,228 @@
+"""
+HTML预处理器 - Html Minimizer
+功能：解析前在原始字节上裁掉抓取脚本从不读取的内容，减少 html.parser 需要处理的字节数
+- 只保留 <head>、表格容器（Table__TableWrapper / data-table-type）、highcharts-series-group 图表分组，
+  以及识别产品名和平台用到的 title / meta / h1 / 面包屑 / 应用信息元素
+- 保留区域内再去掉 <svg> 图标、<style>、<script>、注释、内联样式和 base64 内嵌资源
+- 没有找到任何保留区域时（未知页面结构）原样返回，不影响解析
+- 抓取脚本在 meta 中找不到平台时读取整个页面的文本（Google Play / Android、App Store / iOS 关键词），
+  关键词只出现在裁掉的内容中（例如侧边栏）时裁剪会改变识别结果，这样的页面也原样返回
+- 按页面类型统计裁掉的字节数；单独运行本脚本可以对比裁剪前后的解析时间并校验结果一致
+
+用法: python Html_Minimizer.py 页面1.html [页面2.html ...]
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import threading
+import contextlib
+
+from Product_Identity import PLATFORM_TERMS
+
+# 需要保留的元素的开始标签
+KEEP_START = re.compile(
+    rb'<head[\s>]'
+    rb'|<title[\s>]'
+    rb'|<meta\b'
+    rb'|<h1[\s>]'
+    rb'|<div\b[^>]*?\bdata-table-type="'
+    rb'|<div\b[^>]*?\bclass="[^"]*?(?:Table__TableWrapper|breadcrumb|app-info|product-info)'
+    rb'|<nav\b[^>]*?\bclass="[^"]*?breadcrumb'
+    rb'|<(?:div|span)\b[^>]*?\bclass="[^"]*?(?:[Pp]latform|[Ss]tore)'
+    rb'|<g\b[^>]*?\bclass="[^"]*?highcharts-series-group'
+)
+# 保留区域内可以去掉的内容
+DROP_PATTERN = re.compile(rb'<svg\b.*?</svg>|<style\b.*?</style>|<script\b.*?</script>|<!--.*?-->', re.S)
+BASE64_PATTERN = re.compile(rb'data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+')
+# 抓取脚本不读取内联样式
+STYLE_ATTRIBUTE = re.compile(rb'\sstyle="[^"]*"')
+CHART_MARKER = b'highcharts-series-group'
+# 页面文本之外的内容（与 BeautifulSoup get_text 一致：不含 script / style / template、注释和标签本身）
+NON_TEXT_PATTERN = re.compile(rb'<script\b.*?</script>|<style\b.*?</style>|<template\b.*?</template>|<!--.*?-->'
+                              rb'|<[/!?a-zA-Z][^>]*>', re.S | re.I)
+PLATFORM_TERM_PATTERNS = tuple(re.compile(b'|'.join(re.escape(term.encode()) for term in terms))
+                               for _, terms in PLATFORM_TERMS)
+
+_TAG_NAME = re.compile(rb'<([a-zA-Z0-9]+)')
+_VOID_TAGS = {b'meta'}
+_TAG_PATTERNS = {}
+
+
+def _tag_pattern(tag):
+    """匹配指定标签开始和结束标签的正则（缓存）"""
+    pattern = _TAG_PATTERNS.get(tag)
+    if pattern is None:
+        pattern = _TAG_PATTERNS[tag] = re.compile(rb'<(/?)' + tag + rb'\b[^>]*>')
+    return pattern
+
+
+def _element_end(html, tag, start_tag_end):
+    """元素结束位置（同名标签按嵌套深度配对），没有结束标签时到文档末尾"""
+    if tag in _VOID_TAGS:
+        return start_tag_end
+    depth = 1
+    for match in _tag_pattern(tag).finditer(html, start_tag_end):
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                return match.end()
+        elif not match.group(0).endswith(b'/>'):
+            depth += 1
+    return len(html)
+
+
+def _drop_bulk(match):
+    # 图表所在的 <svg> 必须保留
+    block = match.group(0)
+    return block if CHART_MARKER in block else b''
+
+
+def text_platforms(html):
+    """页面文本中出现了哪些平台的关键词（按 PLATFORM_TERMS 的顺序）"""
+    text = NON_TEXT_PATTERN.sub(b'', html).lower()
+    return tuple(bool(pattern.search(text)) for pattern in PLATFORM_TERM_PATTERNS)
+
+
+def minimize_html(html):
+    """裁剪HTML字节，返回保留区域拼接后的字节；没有保留区域时原样返回"""
+    regions = []
+    position = 0
+    while True:
+        match = KEEP_START.search(html, position)
+        if not match:
+            break
+        start = match.start()
+        start_tag_end = html.find(b'>', match.end() - 1)
+        if start_tag_end == -1:
+            break
+        start_tag_end += 1
+        tag = _TAG_NAME.match(html, start).group(1).lower()
+        end = _element_end(html, tag, start_tag_end)
+        regions.append(html[start:end])
+        position = end
+
+    if not regions:
+        return html
+    minimized = DROP_PATTERN.sub(_drop_bulk, b'\n'.join(regions))
+    minimized = BASE64_PATTERN.sub(b'data:,', minimized)
+    minimized = STYLE_ATTRIBUTE.sub(b'', minimized)
+    if text_platforms(minimized) != text_platforms(html):
+        # 整页文本中的平台关键词在裁剪后不同：抓取脚本识别的平台会变化，原样返回
+        return html
+    return minimized
+
+
+class HtmlMinimizer:
+    """裁剪HTML并按页面类型统计效果（可在多个读取线程中同时使用）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # 页面类型 → 统计
+        self.stats = {}
+
+    def minimize(self, html, file_type=None):
+        """裁剪HTML字节并记录统计"""
+        started = time.perf_counter()
+        minimized = minimize_html(html)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            stats = self.stats.setdefault(file_type or 'unknown', {
+                "pages": 0, "unchanged": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0
+            })
+            stats["pages"] += 1
+            stats["unchanged"] += minimized is html
+            stats["bytes_in"] += len(html)
+            stats["bytes_out"] += len(minimized)
+            stats["seconds"] += elapsed
+        return minimized
+
+    def summary(self):
+        """统计结果，写入批处理总结报告"""
+        to_mb = lambda value: round(value / (1024 * 1024), 2)
+        with self.lock:
+            return {
+                file_type: {
+                    "Pages": stats["pages"],
+                    "Unchanged_Pages": stats["unchanged"],
+                    "Input_MB": to_mb(stats["bytes_in"]),
+                    "Output_MB": to_mb(stats["bytes_out"]),
+                    "Removed_Percent": round(100 * (1 - stats["bytes_out"] / stats["bytes_in"]), 1) if stats["bytes_in"] else 0,
+                    "Minimize_Seconds": round(stats["seconds"], 3)
+                }
+                for file_type, stats in self.stats.items()
+            }
+
+    def print_summary(self):
+        """打印各页面类型的裁剪效果"""
+        summary = self.summary()
+        if not summary:
+            return
+        print("✂️ HTML预处理:")
+        for file_type, stats in summary.items():
+            print(f"   {file_type}: {stats['Pages']} 个页面，{stats['Input_MB']} MB → {stats['Output_MB']} MB"
+                  f"（减少 {stats['Removed_Percent']}%，耗时 {stats['Minimize_Seconds']} 秒）")
+
+
+def benchmark(file_paths):
+    """对比裁剪前后的解析时间，并校验解析结果一致"""
+    # 延迟导入：只有基准测试需要加载抓取脚本
+    from Html_File_Classifier import sniff_file_type, identify_file_type_by_name
+    from Html_Input_Source import open_html_binary
+    from Product_Scheduler import parse_html
+    from Extracted_Records import json_default
+
+    totals = {}
+    for file_path in file_paths:
+        file_type = sniff_file_type(file_path) or identify_file_type_by_name(os.path.basename(file_path))
+        if file_type == 'unknown':
+            print(f"⚠️ 无法识别页面类型，跳过: {file_path}")
+            continue
+        with open_html_binary(file_path) as f:
+            html = f.read()
+
+        timings = []
+        results = []
+        started = time.perf_counter()
+        minimized = minimize_html(html)
+        minimize_seconds = time.perf_counter() - started
+        for content in (html, minimized):
+            started = time.perf_counter()
+            # 抓取脚本的过程输出不影响对比
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = parse_html(file_type, content.decode('utf-8'), 'Android')
+            timings.append(time.perf_counter() - started)
+            results.append(json.dumps(result, ensure_ascii=False, sort_keys=True, default=json_default))
+
+        identical = results[0] == results[1]
+        print(f"📄 {os.path.basename(file_path)} ({file_type}): {len(html)} → {len(minimized)} 字节，"
+              f"解析 {timings[0]:.3f}s → {timings[1]:.3f}s + 裁剪 {minimize_seconds:.3f}s，"
+              f"{'结果一致 ✅' if identical else '结果不一致 ❌'}")
+
+        total = totals.setdefault(file_type, {"pages": 0, "bytes_in": 0, "bytes_out": 0,
+                                              "parse_before": 0.0, "parse_after": 0.0, "mismatches": 0})
+        total["pages"] += 1
+        total["bytes_in"] += len(html)
+        total["bytes_out"] += len(minimized)
+        total["parse_before"] += timings[0]
+        total["parse_after"] += timings[1] + minimize_seconds
+        total["mismatches"] += not identical
+
+    print("\n📊 按页面类型汇总:")
+    for file_type, total in totals.items():
+        removed = 100 * (1 - total["bytes_out"] / total["bytes_in"]) if total["bytes_in"] else 0
+        saved = total["parse_before"] - total["parse_after"]
+        print(f"   {file_type}: {total['pages']} 个页面，字节减少 {removed:.1f}%，"
+              f"解析 {total['parse_before']:.3f}s → {total['parse_after']:.3f}s（节省 {saved:.3f}s），"
+              f"结果不一致 {total['mismatches']} 个")
+    return totals
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    benchmark(sys.argv[1:])
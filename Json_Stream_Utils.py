@@ -0,0 +1,148 @@
+"""
+JSON流式读写工具 - JSON Stream Utils
+功能：按元素流式读取和写入顶层JSON数组
+- 读取：优先使用 ijson，未安装时回退到分块 raw_decode 解析，内存占用只与单个元素大小相关
+- 写入：逐个元素追加，输出格式与 json.dump(items, indent=N) 完全一致
+"""
+
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+READ_CHUNK_SIZE = 1024 * 1024
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+def iter_json_array(file_path, chunk_size=READ_CHUNK_SIZE):
+    """逐个产出顶层JSON数组中的元素"""
+    if ijson is not None:
+        with open(file_path, 'rb') as f:
+            # use_float=True 让数字保持 float 而不是 Decimal，与 json.load 结果一致
+            yield from ijson.items(f, 'item', use_float=True)
+        return
+
+    yield from _iter_json_array_fallback(file_path, chunk_size)
+
+
+def _iter_json_array_fallback(file_path, chunk_size):
+    """不依赖 ijson 的分块解析实现"""
+    decoder = json.JSONDecoder()
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size)
+        eof = not buffer
+        pos = 0
+
+        def skip_whitespace(buf, idx):
+            while idx < len(buf) and buf[idx] in _WHITESPACE:
+                idx += 1
+            return idx
+
+        # 跳过BOM和前导空白，定位数组起点
+        if buffer.startswith('\ufeff'):
+            pos = 1
+        pos = skip_whitespace(buffer, pos)
+        while pos >= len(buffer) and not eof:
+            more = f.read(chunk_size)
+            eof = not more
+            buffer, pos = more, 0
+            pos = skip_whitespace(buffer, pos)
+        if pos >= len(buffer) or buffer[pos] != '[':
+            raise ValueError(f"文件顶层不是JSON数组: {file_path}")
+        pos += 1
+        expect_comma = False
+
+        while True:
+            pos = skip_whitespace(buffer, pos)
+
+            # 缓冲区耗尽时继续读取
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError(f"JSON数组未正确结束: {file_path}")
+                buffer = buffer[pos:] + f.read(chunk_size)
+                pos = 0
+                eof = len(buffer) == 0
+                continue
+
+            char = buffer[pos]
+            if char == ']':
+                return
+            if expect_comma:
+                if char != ',':
+                    raise ValueError(f"JSON数组元素之间缺少逗号 (位置 {pos}): {file_path}")
+                pos += 1
+                expect_comma = False
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # 数字等标量可能恰好在缓冲区末尾被截断，需要读取更多内容再确认
+                truncated = end >= len(buffer) or (
+                    isinstance(item, (int, float)) and buffer[end] in _NUMBER_CHARS
+                )
+                if truncated and not eof:
+                    raise json.JSONDecodeError("元素可能被截断", buffer, end)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # 单个元素超过缓冲区时按当前大小翻倍读取，避免重复解析导致的平方级开销
+                buffer = buffer[pos:]
+                more = f.read(max(chunk_size, len(buffer)))
+                eof = not more
+                buffer += more
+                pos = 0
+                continue
+
+            yield item
+            pos = end
+            expect_comma = True
+
+            # 定期丢弃已消费的部分，保持缓冲区有界
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+class JsonArrayWriter:
+    """逐个写出JSON数组元素，格式与 json.dump(items, indent=indent) 一致"""
+
+    def __init__(self, f, indent=4, level=0, ensure_ascii=False, default=None):
+        """
+        f: 已打开的文本文件对象
+        level: 数组所在的嵌套层级（顶层数组为0），用于嵌入到外层对象中时计算缩进
+        default: json.dumps 的序列化钩子
+        """
+        self.f = f
+        self.indent = indent
+        self.level = level
+        self.ensure_ascii = ensure_ascii
+        self.default = default
+        self.count = 0
+        self.item_prefix = ' ' * (indent * (level + 1))
+
+    def format_item(self, item):
+        """把单个元素格式化为带缩进的文本（不含分隔符）"""
+        text = json.dumps(item, ensure_ascii=self.ensure_ascii, indent=self.indent, default=self.default)
+        # json.dumps 会转义字符串中的换行，所以这里的换行都是结构性的
+        return self.item_prefix + text.replace('\n', '\n' + self.item_prefix)
+
+    def write(self, item):
+        """写出一个元素"""
+        self.write_formatted(self.format_item(item))
+
+    def write_formatted(self, text):
+        """写出一个已由 format_item 格式化的元素文本"""
+        self.f.write('[\n' if self.count == 0 else ',\n')
+        self.f.write(text)
+        self.count += 1
+
+    def close(self):
+        """写出数组结尾"""
+        if self.count == 0:
+            self.f.write('[]')
+        else:
+            self.f.write('\n' + ' ' * (self.indent * self.level) + ']')
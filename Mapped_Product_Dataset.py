@@ -0,0 +1,376 @@
+"""
+内存映射产品数据集 - Mapped Product Dataset
+功能：合并数据的另一种磁盘格式，查看结构和查询单个产品时只读取需要的字节
+- Products_Dataset.bin：每个产品的头部（平台以外的字段）和每个平台的每个数据段
+  （基础指标、User Behavior by Country、Monthly App Retention 等）分别编码为紧凑JSON，依次拼接
+- Products_Dataset.idx.json：偏移索引，记录每个数据段的 (偏移, 长度, 行数)，以及应用名和数据源状态
+- 读取时内存映射数据文件，只在访问某个数据段时才解码；"应用X有多少个国家/地区" 只读索引即可回答
+- 重建时产品文件大小和修改时间未变的产品直接复制旧数据文件中的字节
+
+用法:
+    python Mapped_Product_Dataset.py build [--target-dir 目录] [--full-rebuild]
+    python Mapped_Product_Dataset.py show [--application 应用名]
+    python Mapped_Product_Dataset.py get 应用名 [--platform iOS] [--section "User Behavior by Country"]
+"""
+
+import os
+import sys
+import glob
+import json
+import mmap
+import argparse
+
+from Extracted_Records import RecordTable, json_default
+from Safe_File_Writer import AtomicFileWriter, atomic_write_json
+
+DEFAULT_TARGET_DIR = r"D:\Users\Mussy\Desktop\result"
+PRODUCT_FILE_PATTERN = "Product_*_Data.json"
+DATASET_FILE = "Products_Dataset.bin"
+INDEX_FILE = "Products_Dataset.idx.json"
+INDEX_VERSION = 1
+# 平台中的标量字段（下载、收入等）合并为一个数据段
+SCALARS_SECTION = "_scalars"
+# 作为独立数据段保存的字段类型（RecordTable 为批处理内存中尚未展开的提取表格）
+SECTION_TYPES = (list, dict, RecordTable)
+ROW_TYPES = (list, RecordTable)
+
+
+def index_path_for(dataset_path):
+    """数据文件对应的索引文件"""
+    return os.path.join(os.path.dirname(os.path.abspath(dataset_path)), INDEX_FILE)
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=json_default).encode('utf-8')
+
+
+def written_data(written_products, filename, stat):
+    """
+    批处理刚写出的产品文件在内存中的产品列表；文件之后被改写（大小或修改时间不同）或数据已释放时返回 None
+    written_products: 文件名 → {"sha256", "size", "mtime_ns", "products"}（见 Batch_Aggregator.py）
+    """
+    written = written_products.get(filename) if written_products else None
+    if not written or written.get("products") is None:
+        return None
+    if written["size"] != stat.st_size or written["mtime_ns"] != stat.st_mtime_ns:
+        return None
+    return written["products"]
+
+
+def structure_summary(product):
+    """产品结构摘要：应用名、更新时间、数据源和每个平台各数据段的行数"""
+    platforms = {}
+    for platform, platform_data in (product.get('Platforms') or {}).items():
+        if isinstance(platform_data, dict):
+            platforms[platform] = {
+                section: len(value) for section, value in platform_data.items() if isinstance(value, ROW_TYPES)
+            }
+    return {
+        "Application": product.get('Application', 'Unknown'),
+        "Last Updated": product.get('Last Updated', 'Unknown'),
+        "Data Sources": product.get('Data Sources', {}),
+        "Platforms": platforms
+    }
+
+
+def print_structure(summaries):
+    """打印产品结构摘要（见 structure_summary）"""
+    for i, summary in enumerate(summaries):
+        print(f"应用 {i+1}: {summary['Application']}")
+        print(f"  更新时间: {summary['Last Updated']}")
+
+        print("  数据源:")
+        for source, status in summary['Data Sources'].items():
+            status_icon = "✅" if status == "Available" else "❌"
+            print(f"    {status_icon} {source}")
+
+        print("  平台:")
+        for platform, sections in summary['Platforms'].items():
+            print(f"    📱 {platform}")
+            if 'User Behavior by Country' in sections:
+                print(f"      - 用户行为数据: {sections['User Behavior by Country']} 个国家/地区")
+            if 'Monthly App Retention' in sections:
+                print(f"      - 用户留存数据: {sections['Monthly App Retention']} 个月份")
+            if 'Recent Three Month Downloads' in sections:
+                print(f"      - 下载趋势数据: {sections['Recent Three Month Downloads']} 个月份")
+
+        print()
+
+
+class _SectionWriter:
+    """依次写入数据段并返回 [偏移, 长度]"""
+
+    def __init__(self, out):
+        self.out = out
+        self.position = 0
+
+    def write(self, data):
+        self.out.write(data)
+        entry = [self.position, len(data)]
+        self.position += len(data)
+        return entry
+
+
+def build_dataset(target_dir=DEFAULT_TARGET_DIR, dataset_path=None, full_rebuild=False, written_products=None):
+    """
+    从产品文件构建数据集，返回 (产品数, 复用的产品文件数)
+    产品文件未变化且旧数据文件完好时直接复制其中的字节；批处理刚写出的产品使用内存中的数据（见 written_data）
+    """
+    dataset_path = dataset_path or os.path.join(target_dir, DATASET_FILE)
+    old = None
+    if not full_rebuild:
+        try:
+            old = MappedProductDataset(dataset_path)
+        except (OSError, ValueError):
+            old = None
+
+    product_files = sorted(glob.glob(os.path.join(target_dir, PRODUCT_FILE_PATTERN)))
+    index = {"version": INDEX_VERSION, "sources": {}, "products": []}
+    reused_files = 0
+    try:
+        old_products = {}
+        if old:
+            for entry in old.index["products"]:
+                old_products.setdefault(entry["file"], []).append(entry)
+
+        with AtomicFileWriter(dataset_path, 'wb') as out:
+            writer = _SectionWriter(out)
+            for file_path in product_files:
+                filename = os.path.basename(file_path)
+                stat = os.stat(file_path)
+                source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                previous = old.index["sources"].get(filename) if old else None
+
+                if previous == source and filename in old_products:
+                    for entry in old_products[filename]:
+                        index["products"].append(_copy_entry(old, entry, writer))
+                    reused_files += 1
+                else:
+                    data = written_data(written_products, filename, stat)
+                    try:
+                        if data is None:
+                            with open(file_path, 'r', encoding='utf-8') as f:
+                                data = json.load(f)
+                    except Exception as e:
+                        print(f"⚠️ 无法读取产品文件 {filename}: {e}")
+                        continue
+                    products = data if isinstance(data, list) else [data]
+                    for item, product in enumerate(products):
+                        if isinstance(product, dict):
+                            index["products"].append(_write_product(product, filename, item, writer))
+                index["sources"][filename] = source
+            # 先释放旧数据文件的映射，Windows 上映射中的文件不能被替换
+            if old:
+                old.close()
+                old = None
+            out.commit()
+    finally:
+        if old:
+            old.close()
+
+    stat = os.stat(dataset_path)
+    index["data_size"] = stat.st_size
+    index["data_mtime_ns"] = stat.st_mtime_ns
+    # 数据文件写完后再写索引；索引中的大小和修改时间不符时读取方会拒绝使用
+    atomic_write_json(index_path_for(dataset_path), index, indent=None)
+    return len(index["products"]), reused_files
+
+
+def _write_product(product, filename, item, writer):
+    """编码一个产品，返回索引条目"""
+    header = {key: value for key, value in product.items() if key != 'Platforms'}
+    summary = structure_summary(product)
+    platforms = {}
+    for platform, platform_data in (product.get('Platforms') or {}).items():
+        if not isinstance(platform_data, dict):
+            continue
+        sections = {}
+        scalars = {key: value for key, value in platform_data.items() if not isinstance(value, SECTION_TYPES)}
+        sections[SCALARS_SECTION] = writer.write(_encode(scalars)) + [None]
+        for section, value in platform_data.items():
+            if isinstance(value, SECTION_TYPES):
+                sections[section] = writer.write(_encode(value)) + [len(value) if isinstance(value, ROW_TYPES) else None]
+        # 记录字段顺序，还原产品时与原文件一致
+        sections_order = list(platform_data.keys())
+        platforms[platform] = {"sections": sections, "order": sections_order}
+    return {
+        "application": summary["Application"],
+        "last_updated": summary["Last Updated"],
+        "data_sources": summary["Data Sources"],
+        "file": filename,
+        "item": item,
+        "header": writer.write(_encode(header)),
+        "platforms": platforms
+    }
+
+
+def _copy_entry(old, entry, writer):
+    """从旧数据文件复制一个产品的全部字节，返回新的索引条目"""
+    copied = dict(entry)
+    copied["header"] = writer.write(old.read_bytes(entry["header"]))
+    copied["platforms"] = {}
+    for platform, platform_entry in entry["platforms"].items():
+        sections = {
+            section: writer.write(old.read_bytes(location)) + [location[2]]
+            for section, location in platform_entry["sections"].items()
+        }
+        copied["platforms"][platform] = {"sections": sections, "order": platform_entry["order"]}
+    return copied
+
+
+class MappedProductDataset:
+    """只读访问内存映射的数据集（用完调用 close，或使用 with 语句）"""
+
+    def __init__(self, dataset_path):
+        self.dataset_path = dataset_path
+        with open(index_path_for(dataset_path), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get("version") != INDEX_VERSION:
+            raise ValueError(f"数据集索引版本不符: {self.index.get('version')}")
+        stat = os.stat(dataset_path)
+        if stat.st_size != self.index.get("data_size") or stat.st_mtime_ns != self.index.get("data_mtime_ns"):
+            raise ValueError("数据集文件与索引不一致，请重新构建")
+        self.file = open(dataset_path, 'rb')
+        # 空文件不能映射
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+        self._by_name = {}
+        for entry in self.index["products"]:
+            self._by_name.setdefault(entry["application"].lower(), entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def read_bytes(self, location):
+        offset, length = location[0], location[1]
+        return self.data[offset:offset + length]
+
+    def _decode(self, location):
+        return json.loads(self.read_bytes(location).decode('utf-8'))
+
+    def applications(self):
+        return [entry["application"] for entry in self.index["products"]]
+
+    def entry(self, application):
+        """产品的索引条目（应用名不区分大小写），不存在时抛出 KeyError"""
+        entry = self._by_name.get(application.lower())
+        if entry is None:
+            raise KeyError(application)
+        return entry
+
+    def summaries(self, application=None):
+        """产品结构摘要（只读索引，不读取数据文件）"""
+        entries = [self.entry(application)] if application else self.index["products"]
+        for entry in entries:
+            yield {
+                "Application": entry["application"],
+                "Last Updated": entry["last_updated"],
+                "Data Sources": entry["data_sources"],
+                "Platforms": {
+                    platform: {
+                        section: location[2] for section, location in platform_entry["sections"].items()
+                        if location[2] is not None
+                    }
+                    for platform, platform_entry in entry["platforms"].items()
+                }
+            }
+
+    def section(self, application, platform, section):
+        """只解码一个平台的一个数据段；SCALARS_SECTION 为标量字段"""
+        return self._decode(self.entry(application)["platforms"][platform]["sections"][section])
+
+    def platform(self, application, platform):
+        """解码一个平台的全部数据"""
+        return self._platform(self.entry(application), platform)
+
+    def _platform(self, entry, platform):
+        # 字段顺序与原文件一致
+        platform_entry = entry["platforms"][platform]
+        sections = platform_entry["sections"]
+        scalars = self._decode(sections[SCALARS_SECTION])
+        return {
+            key: scalars[key] if key in scalars else self._decode(sections[key])
+            for key in platform_entry["order"]
+        }
+
+    def _product(self, entry):
+        header = self._decode(entry["header"])
+        platforms = {platform: self._platform(entry, platform) for platform in entry["platforms"]}
+        product = {}
+        # Platforms 放回 Data Sources 之后（头部字段中不含 Platforms）
+        for key, value in header.items():
+            product[key] = value
+            if key == 'Data Sources':
+                product['Platforms'] = platforms
+        product.setdefault('Platforms', platforms)
+        return product
+
+    def product(self, application):
+        """解码完整产品数据"""
+        return self._product(self.entry(application))
+
+    def iter_products(self):
+        """逐个解码全部产品"""
+        for entry in self.index["products"]:
+            yield self._product(entry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="内存映射产品数据集")
+    parser.add_argument('--target-dir', default=DEFAULT_TARGET_DIR, help="产品文件和数据集所在目录")
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help="从产品文件构建（增量）")
+    build.add_argument('--full-rebuild', action='store_true', help="不复用旧数据文件")
+    show = commands.add_parser('show', help="查看数据结构（只读索引）")
+    show.add_argument('--application', help="只看一个应用")
+    get = commands.add_parser('get', help="输出一个产品（或一个数据段）的JSON")
+    get.add_argument('application')
+    get.add_argument('--platform')
+    get.add_argument('--section', help=f"数据段名称，{SCALARS_SECTION} 为标量字段")
+    args = parser.parse_args()
+
+    dataset_path = os.path.join(args.target_dir, DATASET_FILE)
+    if args.command == 'build':
+        try:
+            count, reused = build_dataset(args.target_dir, dataset_path, args.full_rebuild)
+        except Exception as e:
+            print(f"❌ 构建数据集失败: {e}")
+            sys.exit(1)
+        print(f"✅ 数据集已保存: {dataset_path}（{count} 个产品，复用 {reused} 个产品文件）")
+        return
+    if args.command not in ('show', 'get'):
+        parser.print_help()
+        return
+
+    try:
+        dataset = MappedProductDataset(dataset_path)
+    except (OSError, ValueError) as e:
+        print(f"❌ 无法打开数据集: {e}")
+        sys.exit(1)
+    with dataset:
+        try:
+            if args.command == 'show':
+                print("\n📊 当前数据结构:")
+                print("=" * 60)
+                print_structure(dataset.summaries(args.application))
+            elif args.section:
+                print(json.dumps(dataset.section(args.application, args.platform, args.section), ensure_ascii=False, indent=2))
+            elif args.platform:
+                print(json.dumps(dataset.platform(args.application, args.platform), ensure_ascii=False, indent=2))
+            else:
+                print(json.dumps(dataset.product(args.application), ensure_ascii=False, indent=2))
+        except KeyError as e:
+            print(f"❌ 没有找到: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+内存监控 - Memory Monitor
+功能：跟踪批处理（主进程 + 解析进程）的常驻内存，并按内存预算限制解析并发
+- 安装了 psutil 时使用 psutil，否则在 Linux 上读取 /proc，其他平台只能读取本进程的峰值
+- 后台线程定期采样，记录每个正在处理的产品期间的峰值
+- 超出预算时新的读取和解析任务等待，直到内存回落或没有其他任务在运行
+"""
+
+import os
+import sys
+import time
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_SAMPLE_INTERVAL = 0.2
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _proc_rss(pid):
+    """从 /proc 读取进程常驻内存（字节），不可用时返回 None"""
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _proc_children(pid):
+    """从 /proc 读取子进程列表"""
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", 'r') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def process_tree_rss():
+    """当前进程及其全部子进程的常驻内存之和（字节），无法测量时返回 None"""
+    if psutil is not None:
+        try:
+            process = psutil.Process()
+            total = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total
+        except psutil.Error:
+            return None
+
+    if sys.platform.startswith('linux'):
+        total = 0
+        pending = [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            rss = _proc_rss(pid)
+            if rss is not None:
+                total += rss
+            pending.extend(_proc_children(pid))
+        return total
+
+    if resource is not None:
+        # 只能拿到本进程的历史峰值（macOS 为字节，其他为 KB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return None
+
+
+def format_mb(value):
+    """字节数转换为 MB 显示"""
+    return "未知" if value is None else f"{value / (1024 * 1024):.0f} MB"
+
+
+class MemoryMonitor:
+    """采样内存占用，记录每个产品的峰值并执行内存预算"""
+
+    def __init__(self, budget_mb=None, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        self.budget_bytes = budget_mb * 1024 * 1024 if budget_mb else None
+        self.sample_interval = sample_interval
+        self.lock = threading.Lock()
+        self.current = None
+        self.peak = None
+        # 正在处理的产品 → 处理期间的峰值
+        self.active = {}
+        # 已完成的产品 → 峰值
+        self.product_peaks = {}
+        self.throttled_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台采样线程"""
+        if self._thread is None:
+            self.sample()
+            self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止采样线程"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.sample_interval):
+            self.sample()
+
+    def sample(self):
+        """采样一次，更新全局峰值和各产品峰值"""
+        rss = process_tree_rss()
+        if rss is None:
+            return None
+        with self.lock:
+            self.current = rss
+            self.peak = max(self.peak or 0, rss)
+            for product in self.active:
+                self.active[product] = max(self.active[product], rss)
+        return rss
+
+    def begin_product(self, product):
+        """开始跟踪一个产品"""
+        with self.lock:
+            self.active[product] = self.current or 0
+
+    def end_product(self, product):
+        """结束跟踪一个产品，返回处理期间的峰值（字节）"""
+        self.sample()
+        with self.lock:
+            peak = self.active.pop(product, None)
+            if peak:
+                self.product_peaks[product] = peak
+            return peak
+
+    def over_budget(self):
+        """当前内存是否超出预算（未设置预算或无法测量时始终为 False）"""
+        if not self.budget_bytes:
+            return False
+        rss = self.sample()
+        return rss is not None and rss > self.budget_bytes
+
+    def note_throttled(self):
+        """记录一次因内存预算而等待"""
+        with self.lock:
+            self.throttled_count += 1
+
+    def wait_for_headroom(self, busy):
+        """
+        同步等待内存回落到预算以内
+        busy: 返回是否还有其他任务在运行的函数；没有其他任务时直接放行，避免死等
+        """
+        if not self.over_budget():
+            return
+        self.note_throttled()
+        while self.over_budget() and busy():
+            time.sleep(self.sample_interval)
+
+    def summary(self):
+        """内存统计（MB），写入批处理总结报告"""
+        to_mb = lambda value: round(value / (1024 * 1024), 1)
+        with self.lock:
+            return {
+                "Budget_MB": to_mb(self.budget_bytes) if self.budget_bytes else None,
+                "Peak_RSS_MB": to_mb(self.peak) if self.peak else None,
+                "Throttled_Waits": self.throttled_count,
+                "Per_Product_Peak_RSS_MB": {product: to_mb(peak) for product, peak in self.product_peaks.items()}
+            }
@@ -0,0 +1,78 @@
+"""
+产品数据加载器 - Product Data Loader
+功能：为分析模块逐个读取产品数据
+- 数据源可以是产品文件目录（Product_*_Data.json）、单个产品文件，
+  简单数据分离器生成的合并文件（Complete_Products_Data.json / Incomplete_Products_Data.json），
+  或内存映射数据集（Products_Dataset.bin，见 Mapped_Product_Dataset.py）
+- 逐个产出产品，调用方只需要保留自己关心的字段
+"""
+
+import os
+import json
+import glob
+
+from Mapped_Product_Dataset import MappedProductDataset, DATASET_FILE
+
+DEFAULT_PRODUCTS_DIR = r"D:\Users\Mussy\Desktop\result"
+PRODUCT_FILE_PATTERN = "Product_*_Data.json"
+
+# 不是真实国家/地区的汇总行
+GLOBAL_REGION = "全球"
+
+
+def _products_in(data):
+    """从已加载的JSON中取出产品列表（产品文件为列表，合并文件为 {顶层键: {"products": [...]}}）"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        if 'Application' in data:
+            return [data]
+        for value in data.values():
+            if isinstance(value, dict) and isinstance(value.get('products'), list):
+                return value['products']
+    return []
+
+
+def iter_products(source=DEFAULT_PRODUCTS_DIR):
+    """逐个产出产品数据（dict）"""
+    if os.path.basename(source) == DATASET_FILE:
+        with MappedProductDataset(source) as dataset:
+            yield from dataset.iter_products()
+        return
+
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, PRODUCT_FILE_PATTERN)))
+    else:
+        files = [source]
+
+    for file_path in files:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ 无法读取产品文件 {os.path.basename(file_path)}: {e}")
+            continue
+        for product in _products_in(data):
+            if isinstance(product, dict):
+                yield product
+
+
+def iter_platforms(products):
+    """逐个产出 (应用名, 平台, 平台数据)"""
+    for product in products:
+        application = product.get('Application', 'Unknown')
+        for platform, platform_data in (product.get('Platforms') or {}).items():
+            if isinstance(platform_data, dict):
+                yield application, platform, platform_data
+
+
+def to_number(value):
+    """数值字段转换为 float，"N/A"、空字符串等无法转换的值返回 None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').replace('%', '').strip())
+    except ValueError:
+        return None
@@ -0,0 +1,259 @@
+"""
+产品身份索引 - Product Identity
+功能：把不同数据源、不同文件夹中的同一产品解析为同一个产品名，第一次批处理就能正确合并，不需要手动重跑
+- 规范化名称：全角/半角统一、忽略大小写、去掉 " (Google Play)" / "(iOS)" 平台后缀、末尾句点和标点差异
+  （例如 "PolyBuzz: Chat with AI Friends" 与另存网页时的 "PolyBuzz_ Chat with AI Friends" 是同一名称）
+- 商店ID：页面 canonical / og:url 链接和表格行（store-image 所在行）中的 data.ai 应用链接、Google Play / App Store 链接
+- 别名：同一产品出现过的所有名称
+- 索引持久化在结果目录的 .product_identity.json，名称和商店ID都用字典查找（O(1)）
+- 查找顺序：商店ID → 规范化名称；名称相同但同一商店的ID不同时视为不同产品，产品名后附加商店ID区分
+"""
+
+import os
+import re
+import json
+import threading
+import unicodedata
+
+from Safe_File_Writer import atomic_write_json
+
+IDENTITY_VERSION = 1
+
+# 名称末尾的平台后缀，例如 "PolyBuzz (Google Play)"
+_PLATFORM_SUFFIX = re.compile(r'\s*\(\s*(?:google play|ios|android|app store|iphone|ipad)\s*\)\s*$')
+_NON_WORD = re.compile(r'[\W_]+')
+# 抓取脚本提取不到名称时使用的占位名称（规范化后）
+PLACEHOLDER_NAMES = {'', 'unknown', 'unknown product', 'unknown application', 'unknown app'}
+
+# 链接 → 商店ID（命名空间/ID）：data.ai 的应用ID与商店自己的ID是两套编号，分开记录
+STORE_ID_PATTERNS = (
+    (re.compile(r'/apps/google-play/app/([\w.]+)'), 'data.ai/google-play'),
+    (re.compile(r'/apps/ios/app/(\d+)'), 'data.ai/ios'),
+    (re.compile(r'play\.google\.com/store/apps/details\?(?:[^"\'\s]*?&)?id=([\w.]+)'), 'google-play'),
+    (re.compile(r'(?:apps|itunes)\.apple\.com/\S*?/id(\d+)'), 'app-store'),
+)
+
+
+def normalize_name(name):
+    """产品名 → 规范化名称（用于比较，不用于输出）"""
+    if not name:
+        return ''
+    text = unicodedata.normalize('NFKC', str(name)).casefold().strip()
+    text = text.rstrip('.').strip()
+    text = _PLATFORM_SUFFIX.sub('', text)
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+def display_name(name):
+    """图表标签等处的名称去掉平台后缀和末尾句点，保留原来的写法"""
+    text = (name or '').strip()
+    if text.endswith('.'):
+        text = text[:-1].strip()
+    return re.sub(r'\s*\((?:Google Play|iOS)\)\s*$', '', text)
+
+
+def page_title_name(soup):
+    """页面标题中的产品名（"产品名 | data.ai…"），没有标题时为 Unknown Product"""
+    title_tag = soup.find('title')
+    title_text = title_tag.get_text(strip=True) if title_tag else ''
+    return re.split(r'\s*\|\s*|\s+_\s+', title_text)[0].strip() or "Unknown Product"
+
+
+# 抓取脚本识别平台的关键词（小写），按顺序查找：页面中同时出现时 Google Play 优先
+PLATFORM_TERMS = (
+    ("Google Play", ('google play', 'android')),
+    ("App Store", ('app store', 'ios')),
+)
+
+
+def page_text_platform(soup):
+    """整个页面文本中的平台关键词 → "Google Play" / "App Store"，都没有时为 None"""
+    text = soup.get_text().lower()
+    for platform, terms in PLATFORM_TERMS:
+        if any(term in text for term in terms):
+            return platform
+    return None
+
+
+def is_placeholder(name):
+    return normalize_name(name) in PLACEHOLDER_NAMES
+
+
+def store_ids_from_urls(urls):
+    """从链接中提取商店ID，保持出现顺序并去重"""
+    store_ids = []
+    for url in urls:
+        if not url:
+            continue
+        for pattern, namespace in STORE_ID_PATTERNS:
+            match = pattern.search(url)
+            if match:
+                store_id = f"{namespace}/{match.group(1)}"
+                if store_id not in store_ids:
+                    store_ids.append(store_id)
+    return store_ids
+
+
+def page_store_ids(soup):
+    """页面本身所属应用的商店ID：canonical / alternate 链接和 og:url 等 meta（只查找 <head>，不遍历整个页面）"""
+    scope = soup.head or soup
+    urls = [tag.get('href') for tag in scope.find_all('link', href=True)
+            if {'canonical', 'alternate'} & set(tag.get('rel') or ())]
+    urls += [tag.get('content') for tag in scope.find_all('meta', content=True)
+             if (tag.get('property') or tag.get('name')) in ('og:url', 'twitter:url')]
+    return store_ids_from_urls(urls)
+
+
+def element_store_ids(element):
+    """表格行等元素内链接中的商店ID"""
+    if element is None:
+        return []
+    return store_ids_from_urls(tag.get('href') for tag in element.find_all('a', href=True))
+
+
+def source_identity_hints(data):
+    """
+    各数据源提取结果中的名称和商店ID
+    data: {'grabbed', 'revenue', 'user_behavior', 'user_retention'} → 数据（缺失为 None）
+    返回 (names, store_ids)，同一产品文件夹中的所有名称都作为该产品的别名
+    """
+    names = []
+    store_ids = []
+
+    def collect(entry):
+        if not isinstance(entry, dict):
+            return
+        name = entry.get('Application')
+        if name and name not in names:
+            names.append(name)
+        for store_id in entry.get('Store IDs') or ():
+            if store_id not in store_ids:
+                store_ids.append(store_id)
+
+    for source, source_data in data.items():
+        if isinstance(source_data, list):
+            # 下载量页面可能列出多个应用，只有第一个是本产品
+            if source_data:
+                collect(source_data[0])
+        elif isinstance(source_data, dict):
+            collect(source_data)
+            for platform_data in (source_data.get('Platforms') or {}).values():
+                collect(platform_data)
+    return names, store_ids
+
+
+def _namespace(store_id):
+    return store_id.rsplit('/', 1)[0]
+
+
+class ProductIdentityIndex:
+    """持久化的产品身份索引（可在多个线程中同时 resolve）"""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self.dirty = False
+        # 产品ID → {"name": 产品名, "aliases": [名称], "store_ids": [商店ID]}
+        self.products = {}
+        # 规范化名称 → 产品ID
+        self.by_alias = {}
+        # 商店ID → 产品ID
+        self.by_store_id = {}
+        self._load()
+
+    def _load(self):
+        """加载索引，不存在或损坏时从空索引开始"""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != IDENTITY_VERSION:
+                return
+            for product_id, product in data["products"].items():
+                self.products[product_id] = product
+                for alias in [product["name"]] + product["aliases"]:
+                    self.by_alias.setdefault(normalize_name(alias), product_id)
+                for store_id in product["store_ids"]:
+                    self.by_store_id.setdefault(store_id, product_id)
+        except Exception as e:
+            print(f"⚠️ 产品身份索引无法读取，将重新生成: {e}")
+            self.products, self.by_alias, self.by_store_id = {}, {}, {}
+
+    def lookup(self, name=None, store_ids=()):
+        """只查找不登记：返回产品名，没有记录时返回 None"""
+        with self.lock:
+            product_id = self._find([name] if name else [], store_ids)
+            return self.products[product_id]["name"] if product_id else None
+
+    def resolve(self, names, store_ids=()):
+        """
+        解析一组名称和商店ID（同一产品的不同数据源）为产品名，并登记新的别名和商店ID
+        全部是占位名称且没有商店ID记录时返回 None
+        """
+        names = [name for name in names if not is_placeholder(name)]
+        with self.lock:
+            product_id = self._find(names, store_ids)
+            if product_id is None:
+                if not names:
+                    return None
+                product_id = self._create(names[0], store_ids)
+            self._register(product_id, names, store_ids)
+            return self.products[product_id]["name"]
+
+    def _find(self, names, store_ids):
+        for store_id in store_ids:
+            product_id = self.by_store_id.get(store_id)
+            if product_id is not None:
+                return product_id
+        for name in names:
+            product_id = self.by_alias.get(normalize_name(name))
+            if product_id is not None and not self._conflicts(product_id, store_ids):
+                return product_id
+        return None
+
+    def _conflicts(self, product_id, store_ids):
+        """同名产品在同一商店已有不同的ID：是另一个同名应用"""
+        namespaces = {_namespace(store_id) for store_id in self.products[product_id]["store_ids"]}
+        return any(_namespace(store_id) in namespaces and store_id not in self.by_store_id
+                   for store_id in store_ids)
+
+    def _create(self, name, store_ids):
+        key = normalize_name(name)
+        if key in self.by_alias:
+            # 同名的另一个应用：产品ID和产品名都附加商店ID，产品文件不会互相覆盖
+            product_id = store_ids[0]
+            name = f"{name} ({store_ids[0].rsplit('/', 1)[1]})"
+            print(f"⚠️ 发现同名的不同应用，使用产品名: {name}")
+        else:
+            product_id = key
+        self.products[product_id] = {"name": name, "aliases": [], "store_ids": []}
+        self.by_alias.setdefault(normalize_name(name), product_id)
+        self.dirty = True
+        return product_id
+
+    def _register(self, product_id, names, store_ids):
+        product = self.products[product_id]
+        for name in names:
+            key = normalize_name(name)
+            if key not in self.by_alias:
+                self.by_alias[key] = product_id
+            if self.by_alias[key] == product_id and name != product["name"] and name not in product["aliases"]:
+                product["aliases"].append(name)
+                self.dirty = True
+        for store_id in store_ids:
+            if store_id not in self.by_store_id:
+                self.by_store_id[store_id] = product_id
+                product["store_ids"].append(store_id)
+                self.dirty = True
+
+    def save(self):
+        """有变化时写回索引"""
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                atomic_write_json(self.index_path, {"version": IDENTITY_VERSION, "products": self.products}, indent=2)
+                self.dirty = False
+            except Exception as e:
+                print(f"⚠️ 保存产品身份索引失败: {e}")
@@ -0,0 +1,370 @@
+"""
+产品数据查询服务 - Product Query Service
+功能：本地只读HTTP服务，其他团队直接查询提取结果，不再通过邮件发送JSON文件
+- 启动时把产品数据加载到内存，按应用、平台、国家/地区和月份建立索引，查询只做索引查找和集合求交
+- 支持过滤（application / platform / country / month / where）、字段投影（fields）和分页（offset / limit）
+- 后台定期检查结果文件的大小和修改时间，变化后在后台重建索引再整体替换，查询不会读到一半的数据
+- 多线程处理请求；索引重建期间继续使用旧索引响应
+
+接口（GET，返回JSON）:
+    /health                               服务状态和数据规模
+    /products?application=&platform=      产品平台列表，默认只返回数值等标量字段
+    /products/<应用名>                     单个产品的完整数据
+    /countries?country=美国&platform=iOS   各产品在某个国家/地区的用户行为
+    /retention?month=2025年6月             各产品某个月份的留存
+    通用参数: fields=Downloads,Active%20Users  offset=0  limit=100  where=Downloads>=10000（可重复）
+
+用法:
+    python Product_Query_Service.py --source D:\\result --port 8765
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from Product_Data_Loader import DEFAULT_PRODUCTS_DIR, PRODUCT_FILE_PATTERN, iter_products, to_number
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_RELOAD_INTERVAL = 5.0
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+BEHAVIOR_SECTION = "User Behavior by Country"
+RETENTION_SECTION = "Monthly App Retention"
+COUNTRY_KEY = "Country/Region"
+
+_WHERE_PATTERN = re.compile(r'^(.+?)(>=|<=|!=|=|>|<)(.*)$')
+_COMPARE = {
+    '>=': lambda a, b: a >= b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b,
+    '=': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+
+
+class QueryError(Exception):
+    """查询参数错误（返回 400）"""
+
+
+def source_signature(source):
+    """数据源的 (文件, 大小, 修改时间) 列表，用于发现结果文件变化"""
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, PRODUCT_FILE_PATTERN)))
+    else:
+        files = [source]
+    signature = []
+    for file_path in files:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        signature.append((file_path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def parse_where(expressions):
+    """where=字段>=值 → [(字段, 比较函数, 值)]，值能转换为数字时按数字比较"""
+    conditions = []
+    for expression in expressions:
+        match = _WHERE_PATTERN.match(expression)
+        if not match:
+            raise QueryError(f"无法解析过滤条件: {expression}")
+        field, operator, raw = match.group(1).strip(), match.group(2), match.group(3).strip()
+        number = to_number(raw)
+        conditions.append((field, _COMPARE[operator], raw if number is None else number))
+    return conditions
+
+
+def matches(item, conditions):
+    for field, compare, expected in conditions:
+        value = item.get(field)
+        if isinstance(expected, float):
+            value = to_number(value)
+            if value is None:
+                return False
+        elif value is None:
+            return False
+        else:
+            value = str(value)
+        if not compare(value, expected):
+            return False
+    return True
+
+
+class _RowIndex:
+    """按某个键（国家/地区或月份）索引的明细行"""
+
+    def __init__(self):
+        # 键 → [(记录下标, 行)]
+        self.by_key = {}
+        # (键, 平台) → [(记录下标, 行)]
+        self.by_key_platform = {}
+        # (记录下标, 键) → 行
+        self.by_record = {}
+
+    def add(self, record_id, platform, key, row):
+        ref = (record_id, row)
+        self.by_key.setdefault(key, []).append(ref)
+        self.by_key_platform.setdefault((key, platform), []).append(ref)
+        self.by_record[(record_id, key)] = row
+
+    def lookup(self, key, record_ids=None, platform=None):
+        """某个键的明细行；record_ids 为已按应用过滤的记录下标"""
+        if record_ids is not None:
+            return [(record_id, self.by_record[(record_id, key)]) for record_id in record_ids
+                    if (record_id, key) in self.by_record]
+        if platform is not None:
+            return self.by_key_platform.get((key, platform), [])
+        return self.by_key.get(key, [])
+
+
+class ProductIndex:
+    """内存中的产品数据和索引（建立后只读，可在多个线程中同时查询）"""
+
+    def __init__(self, products, signature=()):
+        self.products = products
+        self.signature = signature
+        self.loaded_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        # 产品平台记录：(产品下标, 平台, 平台数据)
+        self.records = []
+        # 应用名/平台（小写）→ 记录下标列表（升序）
+        self.by_application = {}
+        self.by_platform = {}
+        self.countries = _RowIndex()
+        self.months = _RowIndex()
+        self.product_by_name = {}
+
+        for product_id, product in enumerate(products):
+            application = product.get('Application', 'Unknown')
+            self.product_by_name.setdefault(application.lower(), product_id)
+            for platform, platform_data in (product.get('Platforms') or {}).items():
+                if not isinstance(platform_data, dict):
+                    continue
+                record_id = len(self.records)
+                platform_key = platform.lower()
+                self.records.append((product_id, platform, platform_data))
+                self.by_application.setdefault(application.lower(), []).append(record_id)
+                self.by_platform.setdefault(platform_key, []).append(record_id)
+                for row in platform_data.get(BEHAVIOR_SECTION) or ():
+                    if row.get(COUNTRY_KEY):
+                        self.countries.add(record_id, platform_key, row[COUNTRY_KEY], row)
+                for row in platform_data.get(RETENTION_SECTION) or ():
+                    if row.get('Month'):
+                        self.months.add(record_id, platform_key, row['Month'], row)
+
+    @classmethod
+    def load(cls, source):
+        signature = source_signature(source)
+        return cls(list(iter_products(source)), signature)
+
+    def stats(self):
+        return {
+            "products": len(self.products),
+            "product_platforms": len(self.records),
+            "countries": len(self.countries.by_key),
+            "months": len(self.months.by_key),
+            "loaded_at": self.loaded_at
+        }
+
+    def record_ids(self, application=None, platform=None):
+        """按应用和平台过滤的记录下标（升序），None 表示不过滤"""
+        if application is not None:
+            ids = self.by_application.get(application.lower(), [])
+            if platform is not None:
+                ids = [record_id for record_id in ids if self.records[record_id][1].lower() == platform]
+            return ids
+        if platform is not None:
+            return self.by_platform.get(platform, [])
+        return None
+
+    def record_item(self, record_id, row=None, fields=None):
+        """记录 → 响应条目；没有指定 fields 时平台数据只返回标量字段"""
+        product_id, platform, platform_data = self.records[record_id]
+        item = {"Application": self.products[product_id].get('Application'), "Platform": platform}
+        data = platform_data if row is None else row
+        if fields:
+            item.update((field, data.get(field)) for field in fields if field in data)
+        else:
+            item.update((key, value) for key, value in data.items() if not isinstance(value, (list, dict)))
+        return item
+
+
+def paginate(items, offset, limit):
+    total = len(items)
+    page = items[offset:offset + limit]
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < total else None,
+        "items": page
+    }
+
+
+class ProductQueryService:
+    """持有当前索引，并在结果文件变化时后台重建"""
+
+    def __init__(self, source=DEFAULT_PRODUCTS_DIR, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.source = source
+        self.reload_interval = reload_interval
+        self.index = ProductIndex.load(source)
+        self.stop_event = threading.Event()
+        self.reloader = None
+
+    def start_reloader(self):
+        self.reloader = threading.Thread(target=self._reload_loop, name="product-index-reloader", daemon=True)
+        self.reloader.start()
+
+    def _reload_loop(self):
+        while not self.stop_event.wait(self.reload_interval):
+            try:
+                if source_signature(self.source) != self.index.signature:
+                    started = time.perf_counter()
+                    index = ProductIndex.load(self.source)
+                    # 整体替换引用，正在处理的请求继续使用旧索引
+                    self.index = index
+                    print(f"🔄 结果文件已变化，重新加载 {len(index.products)} 个产品"
+                          f"（{time.perf_counter() - started:.2f} 秒）")
+            except Exception as e:
+                print(f"❌ 重新加载产品数据失败，继续使用旧数据: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def query(self, path, params):
+        """执行查询，返回响应数据；路径不存在时返回 None"""
+        index = self.index
+        single = lambda name: params.get(name, [None])[-1]
+        fields = [field.strip() for field in (single('fields') or '').split(',') if field.strip()]
+        try:
+            offset = max(int(single('offset') or 0), 0)
+            limit = min(max(int(single('limit') or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            raise QueryError("offset 和 limit 必须是整数")
+        conditions = parse_where(params.get('where', []))
+        application = single('application')
+        platform = single('platform')
+        platform = platform.lower() if platform is not None else None
+
+        if path == '/health':
+            return {"status": "ok", "source": self.source, **index.stats()}
+
+        if path.startswith('/products/'):
+            product_id = index.product_by_name.get(unquote(path[len('/products/'):]).lower())
+            if product_id is None:
+                return None
+            return index.products[product_id]
+
+        selected = index.record_ids(application, platform)
+        if path == '/products':
+            # 产品平台列表的引用就是记录下标
+            refs = range(len(index.records)) if selected is None else selected
+            item = lambda ref, fields=None: index.record_item(ref, None, fields)
+            data = lambda ref: index.records[ref][2]
+        elif path in ('/countries', '/retention'):
+            key_name, rows = ('country', index.countries) if path == '/countries' else ('month', index.months)
+            key = single(key_name)
+            if key is None:
+                raise QueryError(f"缺少参数: {key_name}")
+            refs = rows.lookup(key, selected if application is not None else None, platform)
+            item = lambda ref, fields=None: index.record_item(ref[0], ref[1], fields)
+            data = lambda ref: ref[1]
+        else:
+            return None
+
+        if conditions:
+            # where 条件直接判断原始数据，投影在过滤之后
+            refs = [ref for ref in refs if matches(data(ref), conditions)]
+        # 只为当前页生成条目
+        page = paginate(refs, offset, limit)
+        page["items"] = [item(ref, fields) for ref in page["items"]]
+        return page
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_handler(service, verbose=False):
+    class QueryHandler(BaseHTTPRequestHandler):
+        # 保持连接，客户端连续查询时不必每次重新建立连接
+        protocol_version = "HTTP/1.1"
+        # 响应头和响应体分两次写出，关闭 Nagle 避免与延迟确认叠加产生 40ms 等待
+        disable_nagle_algorithm = True
+
+        def _send(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            try:
+                result = service.query(url.path.rstrip('/') or '/', parse_qs(url.query))
+            except QueryError as e:
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            if result is None:
+                self._send(404, {"error": f"未找到: {url.path}"})
+            else:
+                self._send(200, result)
+
+        do_HEAD = do_GET
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return QueryHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="产品数据只读查询服务")
+    parser.add_argument('--source', default=DEFAULT_PRODUCTS_DIR, help="产品文件目录、产品文件或合并文件")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="监听地址（默认只允许本机访问）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL, help="检查结果文件变化的间隔秒数")
+    parser.add_argument('--verbose', action='store_true', help="打印每个请求")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"❌ 数据源不存在: {args.source}")
+        return
+
+    started = time.perf_counter()
+    service = ProductQueryService(args.source, args.reload_interval)
+    stats = service.index.stats()
+    print(f"📦 已加载 {stats['products']} 个产品（{stats['product_platforms']} 个产品平台，"
+          f"{stats['countries']} 个国家/地区，{stats['months']} 个月份），耗时 {time.perf_counter() - started:.2f} 秒")
+    service.start_reloader()
+
+    server = _ThreadingHTTPServer((args.host, args.port), make_handler(service, args.verbose))
+    print(f"🌐 查询服务: http://{args.host}:{args.port}/health ，按 Ctrl+C 退出")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 停止查询服务")
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+产品排名报告 - Product Ranking Report
+功能：批处理结束后对所有产品生成排名和同类百分位报告，不再在表格里手工排序
+- 只遍历一次产品数据，建立列式索引：产品平台 × 基础指标（下载、收入、活跃用户及其变化等）的数组，
+  以及 产品平台 × 国家 × 用户行为指标 的矩阵（见 Country_Behavior_Matrix.py）
+- 排名由规则文件配置，所有排名和每个产品在同平台产品中的百分位都是整列的数组运算
+- 结果写入紧凑的 Product_Rankings.json
+
+规则文件格式（JSON）:
+    {"rankings": [
+        {"name": "下载增长", "metric": "Downloads Change", "top": 20},
+        {"name": "iOS 单用户收入", "metric": "Revenue per Active User", "platform": "iOS"},
+        {"name": "美国第30天留存", "metric": "Day 30 Retention (%)", "country": "美国"},
+        {"name": "各国第30天留存", "metric": "Day 30 Retention (%)", "country": "*", "top": 3}
+    ]}
+    country 为 "*" 时分别给出每个国家/地区的排名；ascending 为 true 时按从小到大排名
+
+用法:
+    python Product_Ranking_Report.py --source D:\\result\\Complete_Products_Data.json --rankings rankings.json
+"""
+
+import os
+import json
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from Country_Behavior_Matrix import CountryBehaviorMatrix, column_percentiles
+from Product_Data_Loader import DEFAULT_PRODUCTS_DIR, iter_products, iter_platforms, to_number
+from Safe_File_Writer import atomic_write_json
+
+COMPLETE_PRODUCTS_FILE = "Complete_Products_Data.json"
+REPORT_FILE = "Product_Rankings.json"
+ALL_COUNTRIES = "*"
+DEFAULT_TOP = 10
+
+# 平台数据中的基础指标
+BASE_METRICS = (
+    "Downloads",
+    "Downloads Change",
+    "Cumulative Downloads",
+    "Cumulative Downloads Change",
+    "Store Revenue",
+    "Store Revenue Change",
+    "Active Users",
+    "Active Users Change",
+)
+# 派生指标 → (分子, 分母)
+RATIO_METRICS = {
+    "Revenue per Active User": ("Store Revenue", "Active Users"),
+    "Revenue per Download": ("Store Revenue", "Downloads"),
+}
+
+DEFAULT_RANKINGS = [
+    {"name": "Top Downloads Growth", "metric": "Downloads Change"},
+    {"name": "Top Downloads", "metric": "Downloads"},
+    {"name": "Top Revenue", "metric": "Store Revenue"},
+    {"name": "Top Revenue per Active User", "metric": "Revenue per Active User"},
+    {"name": "Top Active Users Growth", "metric": "Active Users Change"},
+    {"name": "Best Day 30 Retention by Region", "metric": "Day 30 Retention (%)", "country": ALL_COUNTRIES, "top": 3},
+]
+
+
+def load_ranking_specs(path=None):
+    """读取排名规则文件，没有指定时使用默认排名"""
+    if not path:
+        return DEFAULT_RANKINGS
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    rankings = data.get('rankings') if isinstance(data, dict) else data
+    if not isinstance(rankings, list):
+        raise ValueError(f"排名规则文件缺少 rankings 列表: {path}")
+    return rankings
+
+
+def top_rows(values, top, ascending=False):
+    """
+    按列排名，返回每列前 top 名的行下标（二维，行数不足或缺失值时为 -1）
+    NaN 不参与排名
+    """
+    keys = values if ascending else -values
+    order = np.argsort(np.where(np.isnan(keys), np.inf, keys), axis=0, kind='stable')
+    if top:
+        order = order[:top]
+    ranked = np.take_along_axis(values, order, axis=0)
+    return np.where(np.isnan(ranked), -1, order)
+
+
+class ProductColumns:
+    """产品平台 × 指标 的列式索引，附带国家用户行为矩阵"""
+
+    def __init__(self, applications, platforms, metrics, values, behavior):
+        self.applications = list(applications)
+        self.platforms = list(platforms)
+        self.metrics = list(metrics)
+        self.values = values
+        self.behavior = behavior
+        self._metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+        self._percentiles = None
+
+    @classmethod
+    def from_products(cls, products):
+        """遍历一次产品数据，同时建立基础指标数组和国家用户行为矩阵"""
+        applications, platforms, rows = [], [], []
+
+        def scan():
+            for product in products:
+                for application, platform, platform_data in iter_platforms((product,)):
+                    applications.append(application)
+                    platforms.append(platform)
+                    numbers = (to_number(platform_data.get(metric)) for metric in BASE_METRICS)
+                    rows.append([np.nan if number is None else number for number in numbers])
+                yield product
+
+        behavior = CountryBehaviorMatrix.from_products(scan())
+        base = np.array(rows, dtype=float).reshape(len(rows), len(BASE_METRICS))
+
+        index = {metric: i for i, metric in enumerate(BASE_METRICS)}
+        ratios = []
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for numerator, denominator in RATIO_METRICS.values():
+                bottom = base[:, index[denominator]]
+                ratios.append(np.where(bottom > 0, base[:, index[numerator]] / bottom, np.nan))
+        values = np.column_stack([base] + ratios) if ratios else base
+        return cls(applications, platforms, BASE_METRICS + tuple(RATIO_METRICS), values, behavior)
+
+    @classmethod
+    def from_source(cls, source):
+        return cls.from_products(iter_products(source))
+
+    def column(self, metric):
+        return self.values[:, self._metric_index[metric]]
+
+    def peer_percentiles(self):
+        """每个产品在同平台产品中各指标的百分位（产品平台 × 指标）"""
+        if self._percentiles is None:
+            result = np.full(self.values.shape, np.nan)
+            platforms = np.array(self.platforms)
+            for platform in set(self.platforms):
+                peers = platforms == platform
+                result[peers] = column_percentiles(self.values[peers])
+            self._percentiles = result
+        return self._percentiles
+
+    @staticmethod
+    def _entries(rows, values, percentiles, source):
+        """排名行下标 → 报告条目（source 为提供应用名和平台的索引）"""
+        entries = []
+        for row in rows:
+            if row < 0:
+                break
+            entries.append({
+                "Application": source.applications[row],
+                "Platform": source.platforms[row],
+                "Value": round(float(values[row]), 4),
+                "Percentile": None if np.isnan(percentiles[row]) else round(float(percentiles[row]), 1)
+            })
+        return entries
+
+    def rank(self, spec):
+        """按一条排名规则排名；country 为 "*" 时返回 {国家: 排名}"""
+        metric = spec['metric']
+        top = spec.get('top', DEFAULT_TOP)
+        ascending = spec.get('ascending', False)
+        platform = spec.get('platform')
+        country = spec.get('country')
+
+        if country is None:
+            if metric not in self._metric_index:
+                raise ValueError(f"未知指标: {metric}")
+            values = self.column(metric)
+            percentiles = self.peer_percentiles()[:, self._metric_index[metric]]
+            if platform:
+                values = np.where(np.array(self.platforms) == platform, values, np.nan)
+            rows = top_rows(values[:, None], top, ascending)[:, 0]
+            return self._entries(rows, values, percentiles, self)
+
+        behavior = self.behavior
+        if metric not in behavior.metrics:
+            raise ValueError(f"未知用户行为指标: {metric}")
+        values = behavior.metric(metric)
+        percentiles = behavior.percentiles(metric)
+        if platform:
+            values = np.where((np.array(behavior.platforms) == platform)[:, None], values, np.nan)
+        if country == ALL_COUNTRIES:
+            columns = range(len(behavior.countries))
+        elif country in behavior.countries:
+            columns = [behavior.countries.index(country)]
+        else:
+            raise ValueError(f"没有国家/地区: {country}")
+        columns = list(columns)
+        # 所有国家一次排序
+        ranked = top_rows(values[:, columns], top, ascending)
+        results = {
+            behavior.countries[column]: self._entries(ranked[:, i], values[:, column], percentiles[:, column], behavior)
+            for i, column in enumerate(columns)
+        }
+        if country != ALL_COUNTRIES:
+            return results[country]
+        return {name: entries for name, entries in results.items() if entries}
+
+    def build_report(self, specs, source=None):
+        """计算所有排名和同类百分位，返回报告数据"""
+        rankings = {}
+        for spec in specs:
+            name = spec.get('name') or spec.get('metric')
+            try:
+                rankings[name] = self.rank(spec)
+            except (KeyError, ValueError) as e:
+                print(f"⚠️ 跳过排名 {name}: {e}")
+
+        percentiles = self.peer_percentiles()
+        return {
+            "Product_Rankings": {
+                "generated_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "source": source,
+                "total_product_platforms": len(self.applications),
+                "rankings": rankings,
+                # 紧凑格式：metrics 为列，每行 [应用, 平台, 各指标百分位...]
+                "peer_percentiles": {
+                    "metrics": self.metrics,
+                    "rows": [
+                        [application, platform] + [None if np.isnan(value) else round(float(value), 1) for value in row]
+                        for application, platform, row in zip(self.applications, self.platforms, percentiles)
+                    ]
+                }
+            }
+        }
+
+
+def default_source(directory=DEFAULT_PRODUCTS_DIR):
+    """优先使用合并后的完整产品文件，不存在时读取产品文件目录"""
+    complete = os.path.join(directory, COMPLETE_PRODUCTS_FILE)
+    return complete if os.path.exists(complete) else directory
+
+
+def write_ranking_report(source, output, rankings_file=None):
+    """生成排名报告，返回产品平台数（没有产品时不写文件）"""
+    specs = load_ranking_specs(rankings_file)
+    columns = ProductColumns.from_source(source)
+    if not columns.applications:
+        return 0
+    atomic_write_json(output, columns.build_report(specs, source), indent=None)
+    return len(columns.applications)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="跨产品排名和同类百分位报告")
+    parser.add_argument('--source', default=None, help=f"合并文件或产品文件目录，默认为结果目录下的 {COMPLETE_PRODUCTS_FILE}")
+    parser.add_argument('--rankings', default=None, help="排名规则文件（JSON），默认使用内置排名")
+    parser.add_argument('--output', default=None, help=f"报告文件，默认为结果目录下的 {REPORT_FILE}")
+    args = parser.parse_args()
+
+    source = args.source or default_source()
+    directory = source if os.path.isdir(source) else os.path.dirname(os.path.abspath(source))
+    output = args.output or os.path.join(directory, REPORT_FILE)
+    try:
+        count = write_ranking_report(source, output, args.rankings)
+    except Exception as e:
+        print(f"❌ 生成排名报告失败: {e}")
+        return
+    if not count:
+        print("❌ 没有找到产品数据")
+        return
+    print(f"🏆 排名报告: {count} 个产品平台 → {output}")
+
+
+if __name__ == "__main__":
+    main()
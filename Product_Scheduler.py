@@ -0,0 +1,232 @@
+"""
+产品内调度器 - Product Scheduler
+功能：并发读取一个产品的全部HTML文件，并把解析分派到工作进程池
+- 文件读取在线程池中进行，网络共享上的I/O延迟相互重叠
+- 每个文件读完立即提交解析，不等待同一产品的其他文件
+- 所有解析完成后按数据类型和平台汇总结果
+- 开启性能分析时记录读取耗时，解析任务包装为 profiled_call，分析记录随结果返回后交给 ExtractionProfiler
+"""
+
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+import Grabbed_Aggregated_Analytics_Data
+import Revenue_Scraper
+import User_Behavior_Scraper
+import User_Retention_Scraper
+from Extraction_Cache import MISS
+from Extraction_Profiler import profiled_call
+from Html_Input_Source import open_html_binary, open_html_text
+
+DEFAULT_READ_WORKERS = 8
+
+# 需要按平台拆分的多平台数据类型
+MULTI_PLATFORM_TYPES = ('user_behavior', 'user_retention')
+
+
+def split_files_by_platform(files):
+    """按文件名把HTML文件分到平台，没有明确平台标识的文件默认为Android"""
+    platform_files = {}
+    for file_info in files:
+        filename = file_info['filename']
+        if 'android' in filename.lower() or '安卓' in filename:
+            platform_files['Android'] = file_info['filepath']
+        elif 'ios' in filename.lower() or '苹果' in filename:
+            platform_files['iOS'] = file_info['filepath']
+        elif 'Android' not in platform_files:
+            platform_files['Android'] = file_info['filepath']
+    return platform_files
+
+
+# 读取结果：缓存键、HTML内容（命中缓存时为 None）、缓存的提取结果（未命中时为 MISS）
+ReadResult = namedtuple('ReadResult', ['cache_key', 'html_content', 'cached'])
+
+
+def decode_html(html, minimizer=None, file_type=None):
+    """HTML字节转换为文本，minimizer（HtmlMinimizer）在解码前裁掉解析用不到的字节"""
+    if minimizer is not None:
+        html = minimizer.minimize(html, file_type)
+    return html.decode('utf-8')
+
+
+def read_html_file(file_path, minimizer=None, file_type=None):
+    """读取HTML文件内容（在读取线程中运行），压缩文件边读边解压"""
+    if minimizer is None:
+        with open_html_text(file_path) as f:
+            return f.read()
+    with open_html_binary(file_path) as f:
+        return decode_html(f.read(), minimizer, file_type)
+
+
+def parse_html(file_type, html_content, platform=None):
+    """按数据类型解析HTML内容（在工作进程中运行）"""
+    if file_type == 'main_allplatform':
+        return Grabbed_Aggregated_Analytics_Data.extract_aggregated_data(html_content) or None
+    elif file_type == 'revenue':
+        return Revenue_Scraper.extract_revenue_data(html_content)
+    elif file_type == 'user_behavior':
+        return User_Behavior_Scraper.parse_behavior_html(html_content, platform)
+    elif file_type == 'user_retention':
+        return User_Retention_Scraper.parse_retention_html(html_content, platform)
+    raise ValueError(f"未知的文件类型: {file_type}")
+
+
+class ProductScheduler:
+    """调度一个产品的读取和解析任务"""
+
+    def __init__(self, worker_pool=None, read_workers=DEFAULT_READ_WORKERS, memory=None, minimizer=None,
+                 cache=None, profiler=None):
+        # worker_pool 为 None 时在当前进程中解析
+        self.worker_pool = worker_pool
+        self.read_workers = read_workers
+        # MemoryMonitor：超出内存预算时等待已提交的解析完成后再提交新任务
+        self.memory = memory
+        # HtmlMinimizer：读取后先裁剪再交给解析，None 时不裁剪
+        self.minimizer = minimizer
+        # ExtractionCache：HTML内容未变化的页面直接使用缓存的提取结果，None 时不使用缓存
+        self.cache = cache
+        # ExtractionProfiler：阶段计时和调用栈采样，None 时不分析
+        self.profiler = profiler
+
+    def build_jobs(self, html_files):
+        """
+        把文件列表转换为解析任务 [(数据类型, 平台, 文件路径)]
+        基础指标只解析第一个文件；收入按文件顺序解析，保留最后一个成功的结果
+        """
+        files_by_type = {}
+        for file_info in html_files:
+            files_by_type.setdefault(file_info['file_type'], []).append(file_info)
+
+        jobs = []
+        for file_type, files in files_by_type.items():
+            if file_type in MULTI_PLATFORM_TYPES:
+                for platform, file_path in split_files_by_platform(files).items():
+                    jobs.append((file_type, platform, file_path))
+            elif file_type == 'main_allplatform':
+                jobs.append((file_type, None, files[0]['filepath']))
+            elif file_type == 'revenue':
+                for file_info in files:
+                    jobs.append((file_type, None, file_info['filepath']))
+        return jobs
+
+    def read_job(self, job):
+        """读取解析任务对应的HTML文件，返回 ReadResult；命中提取缓存时不再解码"""
+        file_type, platform, file_path = job
+        start = time.perf_counter()
+        try:
+            if self.cache is None:
+                return ReadResult(None, read_html_file(file_path, self.minimizer, file_type), MISS)
+            with open_html_binary(file_path) as f:
+                html = f.read()
+            cache_key = self.cache.key(html, file_type, platform, self.minimizer is not None)
+            cached = self.cache.get(cache_key)
+            if cached is not MISS:
+                return ReadResult(cache_key, None, cached)
+            return ReadResult(cache_key, decode_html(html, self.minimizer, file_type), MISS)
+        finally:
+            if self.profiler is not None:
+                self.profiler.add_phase(file_type, 'read', time.perf_counter() - start)
+
+    def store_result(self, read_result, job_data):
+        """把新解析的结果写入提取缓存"""
+        if self.cache is not None and read_result.cached is MISS:
+            self.cache.put(read_result.cache_key, job_data)
+
+    def parse_call(self, job, html_content):
+        """解析任务的函数和参数；开启性能分析时包装为 profiled_call，结果由 parse_outcome 拆开"""
+        file_type, platform, _ = job
+        if self.profiler is None:
+            return parse_html, (file_type, html_content, platform)
+        return profiled_call, (parse_html, (file_type, html_content, platform), self.profiler.sample_interval)
+
+    def parse_outcome(self, job, outcome, product=None):
+        """解析任务的返回值 → 提取结果（开启性能分析时把分析记录交给 profiler）"""
+        if self.profiler is None:
+            return outcome
+        job_data, record = outcome
+        self.profiler.add_record(product, job[0], record)
+        return job_data
+
+    def submit_parse(self, job, html_content):
+        """提交解析任务，没有进程池时直接解析"""
+        function, arguments = self.parse_call(job, html_content)
+        if self.worker_pool is None:
+            future = Future()
+            try:
+                future.set_result(function(*arguments))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self.worker_pool.submit(function, *arguments)
+
+    def run(self, html_files, product=None):
+        """
+        并发读取并解析一个产品的HTML文件（product 为产品名，用于按产品记录调用栈采样）
+        返回 {数据类型: 数据}，多平台类型为 {"Application": ..., "Platforms": {平台: 数据}}
+        """
+        jobs = self.build_jobs(html_files)
+        if not jobs:
+            return {}
+
+        parse_futures = {}
+        uncached = {}
+        with ThreadPoolExecutor(max_workers=min(self.read_workers, len(jobs))) as reader:
+            read_futures = {reader.submit(self.read_job, job): job for job in jobs}
+            for future in as_completed(read_futures):
+                # 取出后不再保留读取结果，原始内容在解析提交后即可释放
+                job = read_futures.pop(future)
+                try:
+                    read_result = future.result()
+                except Exception as e:
+                    print(f"❌ 读取文件时出错 {os.path.basename(job[2])}: {e}")
+                    continue
+                finally:
+                    del future
+                if read_result.cached is not MISS:
+                    print(f"♻️ 使用缓存的提取结果: {os.path.basename(job[2])}")
+                    parse_futures[job] = Future()
+                    parse_futures[job].set_result(read_result.cached)
+                    continue
+                # 只保留缓存键，解析完成后写入缓存
+                uncached[job] = read_result._replace(html_content=None)
+                if self.memory:
+                    self.memory.wait_for_headroom(lambda: any(not f.done() for f in parse_futures.values()))
+                try:
+                    parse_futures[job] = self.submit_parse(job, read_result.html_content)
+                except Exception as e:
+                    print(f"❌ 提交解析任务时出错 {os.path.basename(job[2])}: {e}")
+                del read_result
+
+        results = {}
+        for job in jobs:
+            if job not in parse_futures:
+                continue
+            file_type, platform, file_path = job
+            try:
+                job_data = parse_futures[job].result()
+            except Exception as e:
+                print(f"❌ 解析文件时出错 {os.path.basename(file_path)}: {e}")
+                continue
+            if job in uncached:
+                job_data = self.parse_outcome(job, job_data, product)
+                self.store_result(uncached[job], job_data)
+            self.merge_result(results, job, job_data)
+
+        return results
+
+    def merge_result(self, results, job, job_data):
+        """把单个文件的解析结果合并到产品结果中"""
+        file_type, platform, file_path = job
+        if not job_data:
+            print(f"⚠️ 没有提取到数据: {os.path.basename(file_path)}")
+            return
+
+        if file_type in MULTI_PLATFORM_TYPES:
+            platforms = results.setdefault(file_type, {"Application": job_data["Application"], "Platforms": {}})
+            platforms["Platforms"][platform] = job_data
+        else:
+            results[file_type] = job_data
+        print(f"✅ 解析完成: {os.path.basename(file_path)}")
+
@@ -2,19 +2,68 @@
 删除 Data Sources 字段脚本
 专门用于删除产品数据中的 "Data Sources" 部分
 现在处理新的 Product_*.json 文件格式
+- 多进程并行处理产品文件
+- 先按字节预扫描，没有 Data Sources 的文件不解析、不改写
+- 通过临时文件 + 重命名原子写回，不会留下写了一半的文件
 """
 
 import json
 import os
 import glob
-from datetime import datetime
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def remove_data_sources(target_dir=r"D:\Users\Mussy\Desktop\result"):
+from Backup_Manager import BackupManager
+from Safe_File_Writer import atomic_write_json
+
+DATA_SOURCES_MARKER = b'"Data Sources"'
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+def file_has_data_sources(file_path):
+    """按字节分块扫描文件，判断是否可能包含 Data Sources 字段"""
+    overlap = len(DATA_SOURCES_MARKER) - 1
+    tail = b''
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(SCAN_CHUNK_SIZE)
+            if not chunk:
+                return False
+            if DATA_SOURCES_MARKER in tail + chunk:
+                return True
+            tail = chunk[-overlap:]
+
+def strip_data_sources_file(file_path, backup_root):
+    """
+    处理单个产品文件（在工作进程中运行）
+    返回 (文件路径, 被删除 Data Sources 的应用列表, 备份内容哈希)
+    """
+    # 预扫描：没有标记的文件直接跳过
+    if not file_has_data_sources(file_path):
+        return file_path, [], None
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    removed_apps = []
+    for app in data:
+        if 'Data Sources' in app:
+            del app['Data Sources']
+            removed_apps.append(app.get('Application', 'Unknown'))
+    
+    # 标记可能出现在其他字段的值里，解析后确认没有字段时保持文件不变
+    if not removed_apps:
+        return file_path, [], None
+    
+    # 修改提交前备份原始字节；写回是原子替换，可以使用硬链接
+    digest = BackupManager(backup_root).store_object(file_path, link=True)
+    atomic_write_json(file_path, data, indent=4)
+    return file_path, removed_apps, digest
+
+def remove_data_sources(target_dir=r"D:\Users\Mussy\Desktop\result", workers=None):
     """删除所有产品文件中的 Data Sources 字段"""
     
-    # 创建备份目录
-    backup_dir = os.path.join(target_dir, "backup_" + datetime.now().strftime('%Y%m%d_%H%M%S'))
-    os.makedirs(backup_dir, exist_ok=True)
+    # 备份统一存放在 backups 目录，只备份真正被修改的文件
+    backup_manager = BackupManager(os.path.join(target_dir, "backups"))
     
     try:
         # 查找所有产品文件
@@ -24,61 +73,79 @@ def remove_data_sources(target_dir=r"D:\Users\Mussy\Desktop\result"):
             print("❌ 未找到任何产品文件")
             return
         
-        print(f"✅ 找到 {len(product_files)} 个产品文件")
+        workers = workers or os.cpu_count() or 1
+        print(f"✅ 找到 {len(product_files)} 个产品文件，使用 {workers} 个工作进程")
         
         removed_count = 0
         processed_files = 0
+        modified_files = 0
+        failed_files = 0
         
-        for file_path in product_files:
+        def handle_result(file_path, removed_apps, digest):
+            nonlocal removed_count, processed_files, modified_files
             filename = os.path.basename(file_path)
-            print(f"\n🔄 处理文件: {filename}")
-            
-            # 备份文件
-            backup_path = os.path.join(backup_dir, filename)
-            
-            # 读取数据
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 备份
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            
-            # 删除 Data Sources 字段
-            file_removed_count = 0
-            for app in data:
-                if 'Data Sources' in app:
-                    del app['Data Sources']
-                    file_removed_count += 1
-                    print(f"  🗑️ 已删除应用 '{app.get('Application', 'Unknown')}' 的 Data Sources")
-            
-            # 保存修改后的数据
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            
-            removed_count += file_removed_count
             processed_files += 1
-            print(f"  ✅ 文件处理完成，删除了 {file_removed_count} 个 Data Sources")
+            if not removed_apps:
+                print(f"⏭️ {filename}: 没有 Data Sources 字段，文件保持不变")
+                return
+            
+            # 备份对象已由工作进程写入，这里记录到本次备份代清单
+            backup_manager.record(file_path, digest)
+            for app_name in removed_apps:
+                print(f"  🗑️ 已删除应用 '{app_name}' 的 Data Sources")
+            print(f"✅ {filename}: 删除了 {len(removed_apps)} 个 Data Sources")
+            removed_count += len(removed_apps)
+            modified_files += 1
+        
+        if workers == 1:
+            for file_path in product_files:
+                try:
+                    handle_result(*strip_data_sources_file(file_path, backup_manager.backup_root))
+                except Exception as e:
+                    failed_files += 1
+                    print(f"❌ 处理文件失败 {os.path.basename(file_path)}: {e}")
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(strip_data_sources_file, file_path, backup_manager.backup_root): file_path
+                    for file_path in product_files
+                }
+                for future in as_completed(futures):
+                    try:
+                        handle_result(*future.result())
+                    except Exception as e:
+                        failed_files += 1
+                        print(f"❌ 处理文件失败 {os.path.basename(futures[future])}: {e}")
+        
+        backup_manager.prune()
         
         print(f"\n🎉 全部完成!")
-        print(f"📊 处理了 {processed_files} 个文件")
+        print(f"📊 处理了 {processed_files} 个文件，修改了 {modified_files} 个文件")
+        if failed_files:
+            print(f"⚠️ {failed_files} 个文件处理失败，已保持原样")
         print(f"📊 总共删除了 {removed_count} 个 Data Sources 字段")
         print(f"💾 修改后的数据已保存到各产品文件")
-        print(f"🔒 所有原始数据备份在: {backup_dir}")
-        
+        if modified_files:
+            print(f"🔒 原始数据备份在: {backup_manager.backup_root} (备份代 {backup_manager.generation_id})")
+    
     except Exception as e:
         print(f"❌ 操作失败: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="删除产品JSON文件中的 Data Sources 字段")
+    parser.add_argument('--target-dir', default=r"D:\Users\Mussy\Desktop\result", help="产品文件目录")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数，默认等于CPU核数，1 表示串行")
+    args = parser.parse_args()
+    
     print("🗑️ 产品数据 Data Sources 删除工具")
     print("="*60)
     print("这个脚本将删除所有产品JSON文件中的 'Data Sources' 字段")
-    print("处理目录: D:\\Users\\Mussy\\Desktop\\result")
+    print(f"处理目录: {args.target_dir}")
     print("原始数据会自动备份")
     print("="*60)
     
     # 直接执行删除操作
-    remove_data_sources()
+    remove_data_sources(args.target_dir, args.workers)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,249 @@
+"""
+留存曲线分析 - Retention Curve Analytics
+功能：把各产品各平台的 "Monthly App Retention" 转换为 产品平台 × 月份 × 天数 的 NumPy 数组，批量计算
+- 留存衰减曲线：对第1~30天留存在对数坐标下做最小二乘拟合 r(d) = a · d^(-b)，所有产品的所有月份一次算完
+- 月度同期群变化：每个月份与该产品上一个有数据的月份相比，第1/7/30天留存的变化（百分点）
+- 按拟合曲线外推第60/90天留存
+- 月份按日历对齐（2025年6月 等），不同产品的同一月份在同一列
+
+用法:
+    python Retention_Curve_Analytics.py --source D:\\result --top 10
+"""
+
+import os
+import re
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from Product_Data_Loader import DEFAULT_PRODUCTS_DIR, iter_products, iter_platforms, to_number
+from Safe_File_Writer import atomic_write_json
+
+RETENTION_SECTION = "Monthly App Retention"
+RETENTION_DAYS = (0, 1, 2, 3, 4, 5, 6, 7, 14, 30)
+RETENTION_COLUMNS = tuple(f"Day {day} Retention" for day in RETENTION_DAYS)
+PROJECTED_DAYS = (60, 90)
+# 报告中比较月度变化的天数
+CHANGE_DAYS = (1, 7, 30)
+# 拟合至少需要的有效天数
+MIN_FIT_POINTS = 3
+REPORT_FILE = "Retention_Curves.json"
+
+_MONTH_PATTERN = re.compile(r'(\d{4})\D+(\d{1,2})')
+
+
+def month_sort_key(label):
+    """月份标签的排序键（"2025年6月" → (2025, 6)），无法识别的标签排在最后"""
+    match = _MONTH_PATTERN.search(label or '')
+    if match:
+        return (int(match.group(1)), int(match.group(2)))
+    return (float('inf'), 0)
+
+
+class RetentionCurves:
+    """产品平台 × 月份 × 天数 的留存数组（百分比，缺失为 NaN）"""
+
+    def __init__(self, applications, platforms, months, values):
+        self.applications = list(applications)
+        self.platforms = list(platforms)
+        self.months = list(months)
+        self.values = values
+        self.days = np.array(RETENTION_DAYS, dtype=float)
+        self._fit = None
+
+    @classmethod
+    def from_products(cls, products):
+        """从产品数据构建数组：先收集坐标和数值，最后一次性写入"""
+        month_index = {}
+        applications, platforms = [], []
+        rows, cols, layers, numbers = [], [], [], []
+
+        for application, platform, platform_data in iter_platforms(products):
+            records = platform_data.get(RETENTION_SECTION)
+            if not records:
+                continue
+            row = len(applications)
+            applications.append(application)
+            platforms.append(platform)
+            for record in records:
+                month = record.get('Month')
+                if not month:
+                    continue
+                col = month_index.setdefault(month, len(month_index))
+                for layer, column in enumerate(RETENTION_COLUMNS):
+                    number = to_number(record.get(column))
+                    if number is not None:
+                        rows.append(row)
+                        cols.append(col)
+                        layers.append(layer)
+                        numbers.append(number)
+
+        # 月份按日历排序，再把收集到的列号映射到排序后的位置
+        months = sorted(month_index, key=lambda label: (month_sort_key(label), month_index[label]))
+        position = np.empty(len(month_index), dtype=int)
+        for i, month in enumerate(months):
+            position[month_index[month]] = i
+
+        values = np.full((len(applications), len(months), len(RETENTION_DAYS)), np.nan)
+        if numbers:
+            values[np.array(rows), position[np.array(cols)], np.array(layers)] = np.array(numbers)
+        return cls(applications, platforms, months, values)
+
+    @classmethod
+    def from_source(cls, source=DEFAULT_PRODUCTS_DIR):
+        """从产品文件目录或合并文件构建"""
+        return cls.from_products(iter_products(source))
+
+    def day(self, day):
+        """某一天的 产品平台 × 月份 留存视图"""
+        return self.values[:, :, RETENTION_DAYS.index(day)]
+
+    def fit(self):
+        """
+        拟合所有产品所有月份的衰减曲线 log r = log a - b · log d（只用第1天及以后、留存大于0的点）
+        返回 (a, b, r2)，形状均为 产品平台 × 月份；有效点不足时为 NaN
+        """
+        if self._fit is not None:
+            return self._fit
+        fitted = self.days >= 1
+        x = np.log(self.days[fitted])
+        observed = self.values[:, :, fitted]
+        usable = observed > 0
+        y = np.log(np.where(usable, observed, 1.0))
+
+        n = usable.sum(axis=-1)
+        sx = np.where(usable, x, 0).sum(axis=-1)
+        sy = np.where(usable, y, 0).sum(axis=-1)
+        sxx = np.where(usable, x * x, 0).sum(axis=-1)
+        sxy = np.where(usable, x * y, 0).sum(axis=-1)
+        syy = np.where(usable, y * y, 0).sum(axis=-1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denominator = n * sxx - sx * sx
+            slope = (n * sxy - sx * sy) / denominator
+            intercept = (sy - slope * sx) / n
+            total = n * syy - sy * sy
+            r2 = np.where(total > 0, (n * sxy - sx * sy) ** 2 / (denominator * total), 1.0)
+
+        enough = (n >= MIN_FIT_POINTS) & (denominator > 0)
+        a = np.where(enough, np.exp(intercept), np.nan)
+        b = np.where(enough, -slope, np.nan)
+        r2 = np.where(enough, r2, np.nan)
+        self._fit = (a, b, r2)
+        return self._fit
+
+    def project(self, days=PROJECTED_DAYS):
+        """按拟合曲线外推留存，返回 产品平台 × 月份 × len(days)，限制在 0~100"""
+        a, b, _ = self.fit()
+        days = np.asarray(days, dtype=float)
+        return np.clip(a[..., None] * days ** -b[..., None], 0, 100)
+
+    def previous_cohort(self):
+        """每个月份对应的该产品上一个有数据的月份下标（没有时为 -1）"""
+        has_data = ~np.isnan(self.values).all(axis=-1)
+        index = np.where(has_data, np.arange(len(self.months)), -1)
+        last_seen = np.maximum.accumulate(index, axis=1)
+        previous = np.full_like(last_seen, -1)
+        previous[:, 1:] = last_seen[:, :-1]
+        return np.where(has_data, previous, -1)
+
+    def cohort_change(self, day):
+        """某一天的留存相对上一个月份的变化（百分点），产品平台 × 月份，没有上一个月份时为 NaN"""
+        values = self.day(day)
+        previous = self.previous_cohort()
+        earlier = np.take_along_axis(values, np.maximum(previous, 0), axis=1)
+        return np.where(previous >= 0, values - earlier, np.nan)
+
+    def latest_cohort(self, mask=None):
+        """每个产品平台最近一个有数据（或 mask 为 True）的月份下标，没有时为 -1"""
+        if mask is None:
+            mask = ~np.isnan(self.values).all(axis=-1)
+        if not len(self.months):
+            return np.full(len(self.applications), -1)
+        return np.where(mask, np.arange(len(self.months)), -1).max(axis=1)
+
+    def summary(self):
+        """每个产品平台最近月份的留存、拟合曲线、外推和月度变化"""
+        a, b, r2 = self.fit()
+        projected = self.project()
+        changes = {day: self.cohort_change(day) for day in CHANGE_DAYS}
+        latest = self.latest_cohort()
+        # 最近的月份往往还没有第30天数据，曲线取最近一个能拟合的月份
+        fitted = self.latest_cohort(~np.isnan(a))
+        has_data = ~np.isnan(self.values).all(axis=-1)
+
+        def number(value, digits=2):
+            return None if np.isnan(value) else round(float(value), digits)
+
+        results = []
+        for row, cohort in enumerate(latest):
+            if cohort < 0:
+                continue
+            entry = {
+                "Application": self.applications[row],
+                "Platform": self.platforms[row],
+                "Cohorts": int(has_data[row].sum()),
+                "Latest_Month": self.months[cohort],
+            }
+            for day in CHANGE_DAYS:
+                entry[f"Day {day} Retention"] = number(self.day(day)[row, cohort])
+            curve = fitted[row]
+            entry["Fitted_Month"] = self.months[curve] if curve >= 0 else None
+            entry["Curve_Scale"] = number(a[row, curve])
+            entry["Decay_Exponent"] = number(b[row, curve], 4)
+            entry["Fit_R2"] = number(r2[row, curve], 4)
+            for i, day in enumerate(PROJECTED_DAYS):
+                entry[f"Projected Day {day} Retention"] = number(projected[row, curve, i])
+            for day in CHANGE_DAYS:
+                entry[f"Day {day} Change vs Previous Month"] = number(changes[day][row, cohort])
+            results.append(entry)
+        return results
+
+    def write_report(self, path):
+        """把汇总结果写入报告文件"""
+        products = self.summary()
+        atomic_write_json(path, {
+            "Retention_Curves": {
+                "generated_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "model": "retention(d) = Curve_Scale * d ^ -Decay_Exponent, fitted on day 1-30",
+                "months": self.months,
+                "total_products": len(products),
+                "products": products
+            }
+        }, indent=2)
+        return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description="留存曲线批量分析")
+    parser.add_argument('--source', default=DEFAULT_PRODUCTS_DIR, help="产品文件目录、产品文件或合并文件")
+    parser.add_argument('--output', default=None, help=f"报告文件，默认为产品目录下的 {REPORT_FILE}")
+    parser.add_argument('--top', type=int, default=10, help="打印外推第90天留存最高的前 N 个")
+    args = parser.parse_args()
+
+    curves = RetentionCurves.from_source(args.source)
+    print(f"📉 留存数组: {len(curves.applications)} 个产品平台 × {len(curves.months)} 个月份 × {len(RETENTION_DAYS)} 天")
+    if not curves.applications:
+        print("❌ 没有找到留存数据")
+        return
+
+    output = args.output
+    if output is None:
+        directory = args.source if os.path.isdir(args.source) else os.path.dirname(os.path.abspath(args.source))
+        output = os.path.join(directory, REPORT_FILE)
+    products = curves.write_report(output)
+    print(f"💾 留存曲线报告: {output}")
+
+    ranked = sorted((p for p in products if p["Projected Day 90 Retention"] is not None),
+                    key=lambda p: p["Projected Day 90 Retention"], reverse=True)
+    print(f"\n🏆 外推第90天留存前 {args.top} 名（最近可拟合的月份）:")
+    for position, p in enumerate(ranked[:args.top], 1):
+        change = p["Day 30 Change vs Previous Month"]
+        change_text = f"，D30 环比 {change:+.2f}" if change is not None else ""
+        print(f"   {position}. {p['Application']} ({p['Platform']}) {p['Fitted_Month']}: "
+              f"D90 ≈ {p['Projected Day 90 Retention']:.2f}%，衰减指数 {p['Decay_Exponent']}{change_text}")
+
+
+if __name__ == "__main__":
+    main()
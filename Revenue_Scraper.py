@@ -1,9 +1,13 @@
-import pandas as pd
 from bs4 import BeautifulSoup
 from lxml import etree
 import json
+import argparse
 import re # Import regular expression module
 
+from Extracted_Records import RecordTable, json_default
+from Extraction_Profiler import PhaseTimer
+from Product_Identity import page_store_ids, page_text_platform
+
 def extract_product_name_from_html(soup):
     """
     Extract product name from HTML content
@@ -64,11 +68,9 @@ def extract_platform_from_html(soup):
             return "App Store"
     
     # Method 2: Look for platform indicators in the HTML content
-    html_text = soup.get_text().lower()
-    if 'google play' in html_text or 'android' in html_text:
-        return "Google Play"
-    elif 'app store' in html_text or 'ios' in html_text:
-        return "App Store"
+    platform = page_text_platform(soup)
+    if platform:
+        return platform
     
     # Method 3: Try to extract from specific platform elements
     platform_elements = soup.find_all(['div', 'span'], class_=lambda x: x and ('platform' in x.lower() or 'store' in x.lower()))
@@ -143,112 +145,141 @@ PLATFORM_COLOR_MAP = {
 
 html_file_path = r"D:\\Users\\Mussy\\Desktop\\新建文件夹\\PolyBuzz_ Chat with AI Friends _ data.ai收入.html"
 
-try:
-    with open(html_file_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-except FileNotFoundError:
-    print(f"Error: The file '{html_file_path}' was not found.")
-    exit()
-except Exception as e:
-    print(f"An error occurred while reading the file: {e}")
-    exit()
-
-soup = BeautifulSoup(html_content, 'html.parser')
-
-# Extract product name from HTML
-product_name = extract_product_name_from_html(soup)
-print(f"提取到的产品名: {product_name}")
-
-# Extract platform from HTML
-platform = extract_platform_from_html(soup)
-print(f"提取到的平台: {platform}")
-
-# Initialize grouped_output globally so both table and chart data can add to it
-grouped_output = {}
-
-# --- Table Data Extraction ---
-table_wrapper = soup.find('div', class_='Table__TableWrapper-sc-5979c7d8-0')
-
-if table_wrapper:
-    # Extract headers
-    headers = []
-
-    # The header for '设备' is in the first row with data-header-key="device_code"
-    header_row_device = table_wrapper.find('div', class_=lambda x: x and 'TableHeader__StickyTableRow-sc-194ff62d-5' in x.split())
-    if header_row_device:
-        device_header_cell = header_row_device.find('div', {'data-header-key': 'device_code'})
-        if device_header_cell:
-            headers.append(device_header_cell.get_text(strip=True))
-
-    # The header for '平均商店收入' is in the second row with data-header-key="est_revenue__avg"
-    data_header_row = table_wrapper.find('div', class_=lambda x: x and 'TableHeader__TableRow-sc-194ff62d-4' in x.split() and 'bAcynv' in x.split())
-    if data_header_row:
-        avg_revenue_header_cell = data_header_row.find('div', {'data-header-key': 'est_revenue__avg'})
-        if avg_revenue_header_cell:
-            span_content = avg_revenue_header_cell.find('span', class_='Tooltip__ContentWrapper-sc-a710cec5-0')
-            if span_content:
-                headers.append(span_content.get_text(strip=True))
-            else:
-                headers.append(avg_revenue_header_cell.get_text(strip=True))
+def extract_revenue_data(html_content):
+    """
+    Extract the device revenue table from a data.ai revenue page
+    Returns {"Application", "Platform", "Store IDs", "Revenue Data"}, or None when no table data was found
+    """
+    # Phase timings for the extraction profiler (no-op unless profiling is enabled)
+    timer = PhaseTimer()
+    soup = BeautifulSoup(html_content, 'html.parser')
+    timer.lap('soup')
+    final_json_output = None
+
+    # Extract product name from HTML
+    product_name = extract_product_name_from_html(soup)
+    print(f"提取到的产品名: {product_name}")
+
+    # Extract platform from HTML
+    platform = extract_platform_from_html(soup)
+    print(f"提取到的平台: {platform}")
+
+    # Store IDs from the page's own links, used to identify the product across sources
+    store_ids = page_store_ids(soup)
+    timer.lap('identity')
+
+    # --- Table Data Extraction ---
+    table_wrapper = soup.find('div', class_='Table__TableWrapper-sc-5979c7d8-0')
+
+    if table_wrapper:
+        # Extract headers
+        headers = []
+
+        # The header for '设备' is in the first row with data-header-key="device_code"
+        header_row_device = table_wrapper.find('div', class_=lambda x: x and 'TableHeader__StickyTableRow-sc-194ff62d-5' in x.split())
+        if header_row_device:
+            device_header_cell = header_row_device.find('div', {'data-header-key': 'device_code'})
+            if device_header_cell:
+                headers.append(device_header_cell.get_text(strip=True))
+
+        # The header for '平均商店收入' is in the second row with data-header-key="est_revenue__avg"
+        data_header_row = table_wrapper.find('div', class_=lambda x: x and 'TableHeader__TableRow-sc-194ff62d-4' in x.split() and 'bAcynv' in x.split())
+        if data_header_row:
+            avg_revenue_header_cell = data_header_row.find('div', {'data-header-key': 'est_revenue__avg'})
+            if avg_revenue_header_cell:
+                span_content = avg_revenue_header_cell.find('span', class_='Tooltip__ContentWrapper-sc-a710cec5-0')
+                if span_content:
+                    headers.append(span_content.get_text(strip=True))
+                else:
+                    headers.append(avg_revenue_header_cell.get_text(strip=True))
     
-    print(f"Extracted headers (Chinese): {headers}")
-    print(f"Number of extracted headers (Chinese): {len(headers)}")
+        print(f"Extracted headers (Chinese): {headers}")
+        print(f"Number of extracted headers (Chinese): {len(headers)}")
 
-    # Data extraction
-    data = []
+        # Data extraction
+        data = []
 
-    # Directly find the fixed and scrollable tables using their distinguishing classes
-    fixed_table_grid = table_wrapper.find('div', class_=lambda x: x and 'ReactVirtualized__Table' in x.split() and 'FixedStyledTable' in x.split())
-    scrollable_table_grid = table_wrapper.find('div', class_=lambda x: x and 'ReactVirtualized__Table' in x.split() and 'StyledTable' in x.split() and 'FixedStyledTable' not in x.split())
+        # Directly find the fixed and scrollable tables using their distinguishing classes
+        fixed_table_grid = table_wrapper.find('div', class_=lambda x: x and 'ReactVirtualized__Table' in x.split() and 'FixedStyledTable' in x.split())
+        scrollable_table_grid = table_wrapper.find('div', class_=lambda x: x and 'ReactVirtualized__Table' in x.split() and 'StyledTable' in x.split() and 'FixedStyledTable' not in x.split())
 
-    if fixed_table_grid and scrollable_table_grid:
-        fixed_rows = fixed_table_grid.find_all('div', class_='ReactVirtualized__Table__row', attrs={'aria-rowindex': True})
-        scrollable_rows = scrollable_table_grid.find_all('div', class_='ReactVirtualized__Table__row', attrs={'aria-rowindex': True})
+        if fixed_table_grid and scrollable_table_grid:
+            fixed_rows = fixed_table_grid.find_all('div', class_='ReactVirtualized__Table__row', attrs={'aria-rowindex': True})
+            scrollable_rows = scrollable_table_grid.find_all('div', class_='ReactVirtualized__Table__row', attrs={'aria-rowindex': True})
 
-        print(f"Fixed rows found: {len(fixed_rows)}")
-        print(f"Scrollable rows found: {len(scrollable_rows)}")
+            print(f"Fixed rows found: {len(fixed_rows)}")
+            print(f"Scrollable rows found: {len(scrollable_rows)}")
 
-        min_rows = min(len(fixed_rows), len(scrollable_rows))
+            min_rows = min(len(fixed_rows), len(scrollable_rows))
 
-        for i in range(min_rows):
-            row_data = []
-            # Extract device name
-            device_name_div = fixed_rows[i].find('div', {'data-testid': 'text-component'})
-            row_data.append(device_name_div.get_text(strip=True) if device_name_div else "")
+            for i in range(min_rows):
+                row_data = []
+                # Extract device name
+                device_name_div = fixed_rows[i].find('div', {'data-testid': 'text-component'})
+                row_data.append(device_name_div.get_text(strip=True) if device_name_div else "")
 
-            # Extract Average Store Revenue
-            avg_revenue_str = scrollable_rows[i].find('div', {'data-key': 'est_revenue__avg'}).get_text(strip=True) if scrollable_rows[i].find('div', {'data-key': 'est_revenue__avg'}) else ""
-            row_data.append(convert_to_numeric(avg_revenue_str))
+                # Extract Average Store Revenue
+                avg_revenue_str = scrollable_rows[i].find('div', {'data-key': 'est_revenue__avg'}).get_text(strip=True) if scrollable_rows[i].find('div', {'data-key': 'est_revenue__avg'}) else ""
+                row_data.append(convert_to_numeric(avg_revenue_str))
 
-            data.append(row_data)
-            print(f"Row {i} data length: {len(row_data)}")
+                data.append(row_data)
+                print(f"Row {i} data length: {len(row_data)}")
 
-    # Adjust headers to include only the desired ones and convert to English
-    final_headers = []
-    if headers:
-        final_headers.append(HEADER_MAP.get(headers[0], headers[0])) # '设备'
-        if len(headers) > 1: # Ensure '平均商店收入' exists
-            final_headers.append(HEADER_MAP.get(headers[1], headers[1]))
+        # Adjust headers to include only the desired ones and convert to English
+        final_headers = []
+        if headers:
+            final_headers.append(HEADER_MAP.get(headers[0], headers[0])) # '设备'
+            if len(headers) > 1: # Ensure '平均商店收入' exists
+                final_headers.append(HEADER_MAP.get(headers[1], headers[1]))
 
-    print(f"Final headers (English): {final_headers}")
-    print(f"Number of final headers (English): {len(final_headers)}")
+        print(f"Final headers (English): {final_headers}")
+        print(f"Number of final headers (English): {len(final_headers)}")
 
-    if data and final_headers:
-        df = pd.DataFrame(data, columns=final_headers)
-        print("✅ 成功提取表格数据：")
+        if data and final_headers:
+            table = RecordTable.from_rows(final_headers, data)
+            print("✅ 成功提取表格数据：")
         
-        # Include product name and platform in the final output
-        final_json_output = {
-            "Application": product_name,
-            "Platform": platform,
-            "Revenue Data": df.to_dict(orient='records')
-        }
-
-        output_json_path = "PolyBuzz_Revenue_Aggregated_Analytics_Data.json"
+            # Include product name and platform in the final output
+            final_json_output = {
+                "Application": product_name,
+                "Platform": platform,
+                "Store IDs": store_ids,
+                "Revenue Data": table
+            }
+        else:
+            print("No data (table) to save.")
+    else:
+        print("Could not find the main table wrapper in the HTML content.")
+
+    timer.lap('table')
+
+    # Release the parse tree now instead of leaving its reference cycles to the garbage collector
+    soup.decompose()
+    timer.lap('decompose')
+    return final_json_output
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract device revenue data from a data.ai export page")
+    parser.add_argument('html_file', nargs='?', default=html_file_path, help="HTML export file (defaults to html_file_path)")
+    parser.add_argument('--output', default="PolyBuzz_Revenue_Aggregated_Analytics_Data.json", help="Output JSON file")
+    args = parser.parse_args()
+
+    try:
+        with open(args.html_file, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+    except FileNotFoundError:
+        print(f"Error: The file '{args.html_file}' was not found.")
+        return
+    except Exception as e:
+        print(f"An error occurred while reading the file: {e}")
+        return
+
+    final_json_output = extract_revenue_data(html_content)
+    if final_json_output:
+        output_json_path = args.output
         with open(output_json_path, 'w', encoding='utf-8') as json_file:
-            json.dump(final_json_output, json_file, ensure_ascii=False, indent=4)
+            json.dump(final_json_output, json_file, ensure_ascii=False, indent=4, default=json_default)
         print(f"整合后的数据已保存到文件：{output_json_path}")
-    else:
-        print("No data (table) to save.")
-else:
-    print("Could not find the main table wrapper in the HTML content.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+运行清单 - Run Manifest
+功能：在批处理之间持久化按文件指纹（路径 + 大小 + 修改时间）缓存的信息
+- 当前用于缓存HTML文件类型识别结果，文件未变化时无需再次扫描内容
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+from Html_Input_Source import stat_html_file
+from Safe_File_Writer import atomic_write_json
+
+MANIFEST_VERSION = 1
+
+
+def file_fingerprint(file_path, stat=None):
+    """文件指纹：大小 + 纳秒级修改时间"""
+    stat = stat or stat_html_file(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class RunManifest:
+    """批处理运行清单"""
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.data = self._load()
+        self.dirty = False
+        # 异步前端会在多个线程中同时识别文件
+        self.lock = threading.Lock()
+
+    def _load(self):
+        """加载清单，不存在或损坏时返回空清单"""
+        empty = {"version": MANIFEST_VERSION, "files": {}}
+        if not os.path.exists(self.manifest_path):
+            return empty
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return empty
+            return data
+        except Exception as e:
+            print(f"⚠️ 运行清单无法读取，将重新生成: {e}")
+            return empty
+
+    def get_file_type(self, file_path, stat=None):
+        """文件未变化时返回缓存的类型，否则返回 None"""
+        entry = self.data["files"].get(os.path.abspath(file_path))
+        if entry and entry["fingerprint"] == file_fingerprint(file_path, stat):
+            return entry["file_type"]
+        return None
+
+    def set_file_type(self, file_path, file_type, method, stat=None):
+        """记录文件类型识别结果"""
+        entry = {
+            "fingerprint": file_fingerprint(file_path, stat),
+            "file_type": file_type,
+            "method": method,
+            "classified_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with self.lock:
+            self.data["files"][os.path.abspath(file_path)] = entry
+            self.dirty = True
+
+    def save(self):
+        """有变化时写回清单"""
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                atomic_write_json(self.manifest_path, self.data, indent=2)
+                self.dirty = False
+            except Exception as e:
+                print(f"⚠️ 保存运行清单失败: {e}")
@@ -0,0 +1,76 @@
+"""
+安全文件写入工具 - Safe File Writer
+功能：先写入同目录临时文件，确认完成后再原子替换目标文件
+- 进程崩溃或异常时目标文件保持原样，不会留下写了一半的文件
+- 替换通过 os.replace 完成，原文件的 inode 不会被改写（硬链接备份因此保持有效）
+"""
+
+import os
+import json
+import tempfile
+
+DEFAULT_FILE_MODE = 0o644
+
+
+class AtomicFileWriter:
+    """先写临时文件，commit() 时原子替换目标文件；未 commit 的临时文件在退出时删除"""
+
+    def __init__(self, path, mode='w', encoding='utf-8'):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory
+        )
+        if 'b' in mode:
+            self.file = os.fdopen(fd, mode)
+        else:
+            self.file = os.fdopen(fd, mode, encoding=encoding, newline='')
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.committed:
+            self.discard()
+        return False
+
+    def write(self, data):
+        """写入内容"""
+        return self.file.write(data)
+
+    def commit(self):
+        """刷新到磁盘并原子替换目标文件"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        # mkstemp 创建的文件权限为 0600，这里沿用目标文件原有权限
+        try:
+            mode = os.stat(self.path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = DEFAULT_FILE_MODE
+        os.chmod(self.temp_path, mode)
+        os.replace(self.temp_path, self.path)
+        self.committed = True
+
+    def discard(self):
+        """放弃写入，删除临时文件"""
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def atomic_write_json(path, data, indent=4, ensure_ascii=False, default=None):
+    """原子写入JSON文件（default 为 json.dump 的序列化钩子）"""
+    with AtomicFileWriter(path) as writer:
+        json.dump(data, writer.file, ensure_ascii=ensure_ascii, indent=indent, default=default)
+        writer.commit()
+
+
+def atomic_write_bytes(path, data):
+    """原子写入二进制内容"""
+    with AtomicFileWriter(path, 'wb') as writer:
+        writer.write(data)
+        writer.commit()
@@ -9,6 +9,9 @@
 - 将完整数据的产品放入一个JSON
 - 将不完整数据的产品放入另一个JSON
 - 简单直接，无复杂逻辑
+- 增量模式：完整性索引记录每个产品文件的哈希和数据源状态，
+  只重新读取有变化的产品；未变化产品在合并文件中的字节直接复制到新文件
+- 由批处理调用时（Batch_Aggregator.py），本批次刚写出的产品直接使用内存中的数据，不再从磁盘重新读取
 
 作者: AI Assistant
 创建时间: 2025-09-26
@@ -18,21 +21,69 @@
 import os
 import json
 import glob
+import argparse
 from datetime import datetime
 
+from Extracted_Records import json_default
+from Json_Stream_Utils import JsonArrayWriter
+from Safe_File_Writer import AtomicFileWriter, atomic_write_json
+from Backup_Manager import file_sha256
+from Mapped_Product_Dataset import build_dataset, written_data, DATASET_FILE
+
+DEFAULT_TARGET_DIR = r"D:\Users\Mussy\Desktop\result"
+INDEX_FILE_NAME = ".completeness_index.json"
+INDEX_VERSION = 1
+
+# 输出类型 → (文件名, 顶层键, 描述)
+OUTPUT_FILES = {
+    'complete': ("Complete_Products_Data.json", "Complete_Products_Data", "包含所有3种数据源的完整产品数据"),
+    'incomplete': ("Incomplete_Products_Data.json", "Incomplete_Products_Data", "缺少部分数据源的不完整产品数据"),
+}
+
 class SimpleDataSeparator:
     """简单数据分离器"""
     
-    def __init__(self):
-        """初始化分离器"""
+    def __init__(self, target_dir=DEFAULT_TARGET_DIR, full_rebuild=False, written_products=None):
+        """
+        初始化分离器
+        written_products: 文件名 → {"sha256", "size", "mtime_ns", "products"}，批处理刚写出的产品文件；
+                          文件大小和修改时间仍一致时直接使用其中的产品数据
+        """
+        self.target_dir = target_dir
+        self.full_rebuild = full_rebuild
+        self.written_products = written_products or {}
+        self.index_path = os.path.join(target_dir, INDEX_FILE_NAME)
+        self.index = self.load_index()
+        # 只保存 (文件名, 索引条目)，不在内存中保留完整产品数据
         self.complete_products = []
         self.incomplete_products = []
+        # 本次有变化的产品: (文件名, 序号) → 产品数据
+        self.changed_products = {}
+        self._cached_file = (None, None)
+    
+    def load_index(self):
+        """加载完整性索引，不存在或版本不符时返回空索引"""
+        empty_index = {"version": INDEX_VERSION, "files": {}, "outputs": {}}
+        if self.full_rebuild or not os.path.exists(self.index_path):
+            return empty_index
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("version") != INDEX_VERSION:
+                return empty_index
+            return index
+        except Exception as e:
+            print(f"⚠️ 完整性索引无法读取，将全量重建: {e}")
+            return empty_index
+    
+    def save_index(self):
+        """保存完整性索引"""
+        atomic_write_json(self.index_path, self.index, indent=2)
     
     def load_all_product_files(self):
         """加载所有产品文件"""
-        # 从目标目录查找所有产品数据文件
-        target_dir = r"D:\Users\Mussy\Desktop\result"
-        product_files = glob.glob(os.path.join(target_dir, "Product_*_Data.json"))
+        # 从目标目录查找所有产品数据文件，按文件名排序保证输出顺序稳定
+        product_files = sorted(glob.glob(os.path.join(self.target_dir, "Product_*_Data.json")))
         
         print(f"🔍 找到 {len(product_files)} 个产品文件:")
         for file in product_files:
@@ -62,6 +113,56 @@ class SimpleDataSeparator:
         # 如果3个都有，就是完整的
         return available_count == 3
     
+    def refresh_file_entry(self, file_path):
+        """
+        获取产品文件的索引条目，返回 (条目, 是否重新解析)
+        大小和修改时间未变时直接复用；否则比较内容哈希，只有内容变化才重新解析
+        """
+        filename = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        old_entry = self.index["files"].get(filename)
+        
+        data = written_data(self.written_products, filename, stat)
+        if data is not None:
+            digest = self.written_products[filename]["sha256"]
+        else:
+            if old_entry and old_entry["size"] == stat.st_size and old_entry["mtime_ns"] == stat.st_mtime_ns:
+                return old_entry, False
+            digest = file_sha256(file_path)
+        
+        if old_entry and old_entry["sha256"] == digest:
+            old_entry["size"] = stat.st_size
+            old_entry["mtime_ns"] = stat.st_mtime_ns
+            return old_entry, False
+        
+        if data is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        
+        # 处理数据格式（可能是列表或单个对象）
+        products = data if isinstance(data, list) else [data]
+        
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "is_list": isinstance(data, list),
+            "products": []
+        }
+        for item, product in enumerate(products):
+            if not isinstance(product, dict):
+                continue
+            entry["products"].append({
+                "item": item,
+                "application": product.get('Application', 'Unknown'),
+                "sources": product.get('Data Sources', {}),
+                "complete": self.is_product_complete(product)
+            })
+            self.changed_products[(filename, item)] = product
+        
+        self.index["files"][filename] = entry
+        return entry, True
+    
     def separate_products(self):
         """分离完整和不完整的产品数据"""
         product_files = self.load_all_product_files()
@@ -72,94 +173,175 @@ class SimpleDataSeparator:
         
         print(f"\n🔄 开始分离产品数据...")
         
+        seen_files = set()
+        changed_files = 0
         for file_path in product_files:
+            filename = os.path.basename(file_path)
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # 处理数据格式（可能是列表或单个对象）
-                products = data if isinstance(data, list) else [data]
+                entry, changed = self.refresh_file_entry(file_path)
+                if changed:
+                    changed_files += 1
+                seen_files.add(filename)
                 
-                for product in products:
-                    if not isinstance(product, dict):
-                        continue
+                for product_meta in entry["products"]:
+                    app_name = product_meta["application"]
                     
-                    app_name = product.get('Application', 'Unknown')
-                    
-                    if self.is_product_complete(product):
-                        self.complete_products.append(product)
+                    if product_meta["complete"]:
+                        self.complete_products.append((filename, product_meta))
                         print(f"  ✅ 完整产品: {app_name}")
                     else:
-                        self.incomplete_products.append(product)
+                        self.incomplete_products.append((filename, product_meta))
                         print(f"  ⚠️  不完整产品: {app_name}")
                         
             except Exception as e:
                 print(f"❌ 加载文件 {file_path} 失败: {e}")
                 continue
         
+        # 移除已删除或无法读取的产品文件
+        for filename in list(self.index["files"].keys()):
+            if filename not in seen_files:
+                del self.index["files"][filename]
+        
         print(f"\n📊 分离结果:")
         print(f"  ✅ 完整产品: {len(self.complete_products)} 个")
         print(f"  ⚠️  不完整产品: {len(self.incomplete_products)} 个")
+        print(f"  🔁 重新读取的产品文件: {changed_files} 个，复用索引: {len(seen_files) - changed_files} 个")
         
         return True
     
+    def load_product(self, filename, item):
+        """按需从产品文件读取单个产品（缓存最近一个文件）"""
+        key = (filename, item)
+        if key in self.changed_products:
+            return self.changed_products[key]
+        
+        cached_name, cached_products = self._cached_file
+        if cached_name != filename:
+            with open(os.path.join(self.target_dir, filename), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            cached_products = data if isinstance(data, list) else [data]
+            self._cached_file = (filename, cached_products)
+        return cached_products[item]
+    
+    def output_is_reusable(self, kind, output_path):
+        """判断上次生成的合并文件是否仍与索引中的偏移一致"""
+        recorded = self.index["outputs"].get(kind)
+        if not recorded or not os.path.exists(output_path):
+            return False
+        stat = os.stat(output_path)
+        return recorded["size"] == stat.st_size and recorded["mtime_ns"] == stat.st_mtime_ns
+    
+    def write_output(self, kind, records, current_time):
+        """
+        流式写出合并文件，格式与 json.dump(indent=2) 一致
+        未变化的产品直接从旧合并文件复制对应字节，并记录新的偏移
+        """
+        filename, top_key, description = OUTPUT_FILES[kind]
+        output_path = os.path.join(self.target_dir, filename)
+        formatter = JsonArrayWriter(None, indent=2, level=2, default=json_default)
+        old_output = open(output_path, 'rb') if self.output_is_reusable(kind, output_path) else None
+        copied = 0
+        
+        try:
+            header = (
+                '{\n'
+                f'  {json.dumps(top_key)}: {{\n'
+                f'    "generated_time": {json.dumps(current_time)},\n'
+                f'    "total_products": {len(records)},\n'
+                f'    "description": {json.dumps(description, ensure_ascii=False)},\n'
+                '    "products": '
+            ).encode('utf-8')
+            
+            with AtomicFileWriter(output_path, 'wb') as out:
+                out.write(header)
+                position = len(header)
+                
+                for i, (product_file, meta) in enumerate(records):
+                    separator = b'[\n' if i == 0 else b',\n'
+                    out.write(separator)
+                    position += len(separator)
+                    
+                    chunk = None
+                    unchanged = (product_file, meta["item"]) not in self.changed_products
+                    if old_output and unchanged and meta.get("output") == kind and "offset" in meta:
+                        old_output.seek(meta["offset"])
+                        chunk = old_output.read(meta["length"])
+                        if len(chunk) != meta["length"]:
+                            chunk = None
+                        else:
+                            copied += 1
+                    if chunk is None:
+                        product = self.load_product(product_file, meta["item"])
+                        chunk = formatter.format_item(product).encode('utf-8')
+                    
+                    out.write(chunk)
+                    meta["output"] = kind
+                    meta["offset"] = position
+                    meta["length"] = len(chunk)
+                    position += len(chunk)
+                
+                out.write(b'\n    ]\n  }\n}')
+                out.commit()
+        finally:
+            if old_output:
+                old_output.close()
+        
+        stat = os.stat(output_path)
+        self.index["outputs"][kind] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return output_path, copied
+    
     def save_separated_data(self):
         """保存分离后的数据到两个JSON文件"""
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # 设置输出目录
-        output_dir = r"D:\Users\Mussy\Desktop\result"
-        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(self.target_dir, exist_ok=True)
         
         # 保存完整产品数据
         if self.complete_products:
-            complete_data = {
-                "Complete_Products_Data": {
-                    "generated_time": current_time,
-                    "total_products": len(self.complete_products),
-                    "description": "包含所有3种数据源的完整产品数据",
-                    "products": self.complete_products
-                }
-            }
-            
-            complete_path = os.path.join(output_dir, "Complete_Products_Data.json")
-            with open(complete_path, 'w', encoding='utf-8') as f:
-                json.dump(complete_data, f, indent=2, ensure_ascii=False)
-            
-            print(f"✅ 完整产品数据已保存: {complete_path} ({len(self.complete_products)} 个产品)")
+            complete_path, copied = self.write_output('complete', self.complete_products, current_time)
+            print(f"✅ 完整产品数据已保存: {complete_path} ({len(self.complete_products)} 个产品，复用 {copied} 个)")
+        else:
+            self.index["outputs"].pop('complete', None)
         
         # 保存不完整产品数据
         if self.incomplete_products:
-            incomplete_data = {
-                "Incomplete_Products_Data": {
-                    "generated_time": current_time,
-                    "total_products": len(self.incomplete_products),
-                    "description": "缺少部分数据源的不完整产品数据",
-                    "products": self.incomplete_products
-                }
-            }
-            
-            incomplete_path = os.path.join(output_dir, "Incomplete_Products_Data.json")
-            with open(incomplete_path, 'w', encoding='utf-8') as f:
-                json.dump(incomplete_data, f, indent=2, ensure_ascii=False)
-            
-            print(f"⚠️  不完整产品数据已保存: {incomplete_path} ({len(self.incomplete_products)} 个产品)")
+            incomplete_path, copied = self.write_output('incomplete', self.incomplete_products, current_time)
+            print(f"⚠️  不完整产品数据已保存: {incomplete_path} ({len(self.incomplete_products)} 个产品，复用 {copied} 个)")
+        else:
+            self.index["outputs"].pop('incomplete', None)
+        
+        # 合并文件写完后再更新索引；中途失败时索引与文件不一致会被检测到并回退为重新读取
+        self.save_index()
+        
+        # 同时更新内存映射数据集，查看结构和查询单个产品时不必解析合并文件
+        try:
+            count, reused = build_dataset(self.target_dir, full_rebuild=self.full_rebuild,
+                                          written_products=self.written_products)
+            print(f"🗂️ 内存映射数据集已更新: {DATASET_FILE} ({count} 个产品，复用 {reused} 个产品文件)")
+        except Exception as e:
+            print(f"⚠️ 更新内存映射数据集失败: {e}")
         
         return True
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="简单数据分离器 - 按数据完整性拆分产品数据")
+    parser.add_argument('--target-dir', default=DEFAULT_TARGET_DIR, help="产品文件所在目录")
+    parser.add_argument('--full-rebuild', action='store_true', help="忽略完整性索引，全量重建")
+    args = parser.parse_args()
+    
     print("🔥 简单数据分离器")
     print("=" * 60)
     
-    separator = SimpleDataSeparator()
+    separator = SimpleDataSeparator(args.target_dir, args.full_rebuild)
     
     # 分离产品数据
     if separator.separate_products():
         # 保存分离后的数据
         separator.save_separated_data()
     
-    output_dir = r"D:\Users\Mussy\Desktop\result"
+    output_dir = args.target_dir
     print(f"\n🎯 分离完成!")
     print(f"📁 完整产品数据: {os.path.join(output_dir, 'Complete_Products_Data.json')}")
     print(f"📁 不完整产品数据: {os.path.join(output_dir, 'Incomplete_Products_Data.json')}")
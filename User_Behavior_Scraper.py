@@ -1,8 +1,13 @@
-import pandas as pd
 from bs4 import BeautifulSoup
 import json
 import re
 import os
+import argparse
+from datetime import datetime
+
+from Extracted_Records import RecordTable, json_default
+from Extraction_Profiler import PhaseTimer
+from Product_Identity import page_store_ids, page_text_platform
 
 def extract_product_name_from_html(soup):
     """
@@ -64,11 +69,9 @@ def extract_platform_from_html(soup):
             return "App Store"
     
     # Method 2: Look for platform indicators in the HTML content
-    html_text = soup.get_text().lower()
-    if 'google play' in html_text or 'android' in html_text:
-        return "Google Play"
-    elif 'app store' in html_text or 'ios' in html_text:
-        return "App Store"
+    platform = page_text_platform(soup)
+    if platform:
+        return platform
     
     # Method 3: Try to extract from specific platform elements
     platform_elements = soup.find_all(['div', 'span'], class_=lambda x: x and ('platform' in x.lower() or 'store' in x.lower()))
@@ -209,7 +212,17 @@ def process_behavior_html_file(file_path, platform_name):
         print(f"❌ 读取文件时出错 {file_path}: {e}")
         return None
 
+    return parse_behavior_html(html_content, platform_name)
+
+def parse_behavior_html(html_content, platform_name):
+    """
+    Parse the HTML content of a single user behavior page
+    Kept separate from file reading so pages can be read concurrently and parsed in worker processes
+    """
+    # Phase timings for the extraction profiler (no-op unless profiling is enabled)
+    timer = PhaseTimer()
     soup = BeautifulSoup(html_content, 'html.parser')
+    timer.lap('soup')
     
     print(f"\n🔍 处理 {platform_name} 平台用户行为数据...")
 
@@ -220,6 +233,10 @@ def process_behavior_html_file(file_path, platform_name):
     # Extract platform from HTML
     platform = extract_platform_from_html(soup)
     print(f"提取到的平台: {platform}")
+
+    # Store IDs from the page's own links, used to identify the product across sources
+    store_ids = page_store_ids(soup)
+    timer.lap('identity')
     
     # Show platform-specific configuration
     platform_config = PLATFORM_DATA_CONFIG.get(platform_name, PLATFORM_DATA_CONFIG["iOS"])
@@ -228,7 +245,8 @@ def process_behavior_html_file(file_path, platform_name):
 
     # --- Data Extraction Logic Goes Here ---
     table_wrapper = soup.find('div', {'data-table-type': 'table_change(__table__$app_usage_country)'})
-    extracted_data = []
+    # Rows are kept as tuples under one shared header list and only become dicts when written out
+    extracted_data = RecordTable()
 
     if table_wrapper:
         headers = []
@@ -383,97 +401,126 @@ def process_behavior_html_file(file_path, platform_name):
     else:
         print("Could not find the target table wrapper.")
 
+    timer.lap('table')
+
+    # Release the parse tree now instead of leaving its reference cycles to the garbage collector
+    soup.decompose()
+    timer.lap('decompose')
     return {
         "Application": product_name,
         "Platform": platform,
-        "User Behavior Data": extracted_data
+        "Store IDs": store_ids,
+        "User Behavior Data": extracted_data.compact()
     }
 
-# Process all HTML files
-all_platform_data = {}
-for platform, file_path in html_files.items():
-    print(f"\n{'='*60}")
-    print(f"🚀 开始处理 {platform} 平台用户行为数据...")
-    print(f"{'='*60}")
-    
-    platform_data = process_behavior_html_file(file_path, platform)
-    if platform_data:
-        all_platform_data[platform] = platform_data
-        print(f"✅ {platform} 平台数据处理完成")
-    else:
-        print(f"❌ {platform} 平台数据处理失败")
+def process_all_platforms(files=None):
+    """
+    Process the user behavior pages of all platforms and return {platform: data}
+    Does not write any files
+    """
+    files = files if files is not None else html_files
+    all_platform_data = {}
+    for platform, file_path in files.items():
+        print(f"\n{'='*60}")
+        print(f"🚀 开始处理 {platform} 平台用户行为数据...")
+        print(f"{'='*60}")
+        
+        platform_data = process_behavior_html_file(file_path, platform)
+        if platform_data:
+            all_platform_data[platform] = platform_data
+            print(f"✅ {platform} 平台数据处理完成")
+        else:
+            print(f"❌ {platform} 平台数据处理失败")
+    return all_platform_data
 
-# Save data for each platform separately and create a combined file
-print(f"\n{'='*60}")
-print("💾 保存数据文件...")
-print(f"{'='*60}")
+def main():
+    parser = argparse.ArgumentParser(description="Extract user behavior by country from data.ai export pages")
+    parser.add_argument('--android', help="Android HTML export file")
+    parser.add_argument('--ios', help="iOS HTML export file")
+    parser.add_argument('--output-dir', default=".", help="Directory for the per-platform and combined JSON files")
+    parser.add_argument('--unified-dir', default=r"D:\Users\Mussy\Desktop\result", help="Directory for the unified JSON file")
+    args = parser.parse_args()
 
-for platform, data in all_platform_data.items():
-    if platform == "Android":
-        output_path = "User_Behavior_Aggregated_Analytics_Data.json"
-    else:
-        output_path = f"User_Behavior_{platform}_Aggregated_Analytics_Data.json"
-    
-    try:
-        with open(output_path, 'w', encoding='utf-8') as json_file:
-            json.dump(data, json_file, ensure_ascii=False, indent=4)
-        print(f"✅ {platform} 数据已保存到: {output_path}")
-    except Exception as e:
-        print(f"❌ 保存 {platform} 数据时出错: {e}")
+    # Files given on the command line replace the html_files defaults
+    files = {platform: path for platform, path in (("Android", args.android), ("iOS", args.ios)) if path}
 
-# Create a combined summary file that Data_Aggregator.py can find
-if all_platform_data:
-    combined_data = {
-        "Application": next(iter(all_platform_data.values()))["Application"],
-        "Platforms": all_platform_data
-    }
-    
-    combined_output_path = "User_Behavior_Combined_Analytics_Data.json"
-    try:
-        with open(combined_output_path, 'w', encoding='utf-8') as json_file:
-            json.dump(combined_data, json_file, ensure_ascii=False, indent=4)
-        print(f"✅ 合并数据已保存到: {combined_output_path}")
-    except Exception as e:
-        print(f"❌ 保存合并数据时出错: {e}")
-
-# Also save to unified file for user convenience
-output_dir = r"D:\Users\Mussy\Desktop\result"
-os.makedirs(output_dir, exist_ok=True)
-
-if all_platform_data:
-    # Create unified data structure
-    unified_data = {
-        "Application": next(iter(all_platform_data.values()))["Application"],
-        "Data_Type": "User Behavior Analytics",
-        "Generated_Time": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "Total_Platforms": len(all_platform_data),
-        "Platforms": {}
-    }
-    
-    # Add platform data with detailed information
-    for platform_name, platform_data in all_platform_data.items():
-        platform_config = PLATFORM_DATA_CONFIG.get(platform_name, PLATFORM_DATA_CONFIG["iOS"])
+    # Process all HTML files
+    all_platform_data = process_all_platforms(files or None)
+
+    # Save data for each platform separately and create a combined file
+    print(f"\n{'='*60}")
+    print("💾 保存数据文件...")
+    print(f"{'='*60}")
+
+    for platform, data in all_platform_data.items():
+        if platform == "Android":
+            output_path = os.path.join(args.output_dir, "User_Behavior_Aggregated_Analytics_Data.json")
+        else:
+            output_path = os.path.join(args.output_dir, f"User_Behavior_{platform}_Aggregated_Analytics_Data.json")
         
-        unified_data["Platforms"][platform_name] = {
-            "Platform": platform_data["Platform"],
-            "Data_Points_Count": platform_config["data_points"],
-            "Metrics_Extracted": platform_config["metrics"],
-            "Data": platform_data["User Behavior Data"]
+        try:
+            with open(output_path, 'w', encoding='utf-8') as json_file:
+                json.dump(data, json_file, ensure_ascii=False, indent=4, default=json_default)
+            print(f"✅ {platform} 数据已保存到: {output_path}")
+        except Exception as e:
+            print(f"❌ 保存 {platform} 数据时出错: {e}")
+
+    # Create a combined summary file that Data_Aggregator.py can find
+    if all_platform_data:
+        combined_data = {
+            "Application": next(iter(all_platform_data.values()))["Application"],
+            "Platforms": all_platform_data
         }
-    
-    # Save to unified file
-    unified_output_path = os.path.join(output_dir, "User_Behavior_Unified_Analytics_Data.json")
-    try:
-        with open(unified_output_path, 'w', encoding='utf-8') as json_file:
-            json.dump(unified_data, json_file, ensure_ascii=False, indent=2)
-        print(f"✅ 统一数据也已保存到: {unified_output_path}")
-        print(f"📊 包含 {len(all_platform_data)} 个平台的数据")
-        for platform, data in all_platform_data.items():
-            config = PLATFORM_DATA_CONFIG.get(platform, PLATFORM_DATA_CONFIG["iOS"])
-            print(f"   - {platform}: {config['data_points']} 个数据点")
-    except Exception as e:
-        print(f"❌ 保存统一数据时出错: {e}")
-else:
-    print("⚠️ 没有数据需要保存")
+        
+        combined_output_path = os.path.join(args.output_dir, "User_Behavior_Combined_Analytics_Data.json")
+        try:
+            with open(combined_output_path, 'w', encoding='utf-8') as json_file:
+                json.dump(combined_data, json_file, ensure_ascii=False, indent=4, default=json_default)
+            print(f"✅ 合并数据已保存到: {combined_output_path}")
+        except Exception as e:
+            print(f"❌ 保存合并数据时出错: {e}")
+
+    # Also save to unified file for user convenience
+    output_dir = args.unified_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    if all_platform_data:
+        # Create unified data structure
+        unified_data = {
+            "Application": next(iter(all_platform_data.values()))["Application"],
+            "Data_Type": "User Behavior Analytics",
+            "Generated_Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "Total_Platforms": len(all_platform_data),
+            "Platforms": {}
+        }
+        
+        # Add platform data with detailed information
+        for platform_name, platform_data in all_platform_data.items():
+            platform_config = PLATFORM_DATA_CONFIG.get(platform_name, PLATFORM_DATA_CONFIG["iOS"])
+            
+            unified_data["Platforms"][platform_name] = {
+                "Platform": platform_data["Platform"],
+                "Data_Points_Count": platform_config["data_points"],
+                "Metrics_Extracted": platform_config["metrics"],
+                "Data": platform_data["User Behavior Data"]
+            }
+        
+        # Save to unified file
+        unified_output_path = os.path.join(output_dir, "User_Behavior_Unified_Analytics_Data.json")
+        try:
+            with open(unified_output_path, 'w', encoding='utf-8') as json_file:
+                json.dump(unified_data, json_file, ensure_ascii=False, indent=2, default=json_default)
+            print(f"✅ 统一数据也已保存到: {unified_output_path}")
+            print(f"📊 包含 {len(all_platform_data)} 个平台的数据")
+            for platform, data in all_platform_data.items():
+                config = PLATFORM_DATA_CONFIG.get(platform, PLATFORM_DATA_CONFIG["iOS"])
+                print(f"   - {platform}: {config['data_points']} 个数据点")
+        except Exception as e:
+            print(f"❌ 保存统一数据时出错: {e}")
+    else:
+        print("⚠️ 没有数据需要保存")
+
+    print(f"\n🎉 所有处理完成！成功处理了 {len(all_platform_data)} 个平台的数据")
 
-print(f"\n🎉 所有处理完成！成功处理了 {len(all_platform_data)} 个平台的数据")
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
-import pandas as pd
 from bs4 import BeautifulSoup
 from lxml import etree
 import json
 import re # Import regular expression module
 
+from Extracted_Records import RecordTable, json_default
+from Extraction_Profiler import PhaseTimer
+from Product_Identity import page_store_ids, page_text_platform
+
 # Define the application name explicitly as it's part of the filename, not in table data directly
 # APPLICATION_NAME = "PolyBuzz: Chat with AI Friends"
 
@@ -84,13 +87,9 @@ def extract_app_info_from_html(soup):
             break
     
     # Method 3: Look for platform indicators in the HTML content
-    html_text = soup.get_text().lower()
-    if 'google play' in html_text or 'android' in html_text:
-        if app_info["channel"] == "Unknown Channel":
-            app_info["channel"] = "Google Play"
-    elif 'app store' in html_text or 'ios' in html_text:
-        if app_info["channel"] == "Unknown Channel":
-            app_info["channel"] = "App Store"
+    platform = page_text_platform(soup)
+    if platform and app_info["channel"] == "Unknown Channel":
+        app_info["channel"] = platform
     
     # Method 4: Try to extract from specific platform elements
     platform_elements = soup.find_all(['div', 'span'], class_=lambda x: x and ('platform' in x.lower() or 'store' in x.lower()))
@@ -263,9 +262,10 @@ def extract_retention_table_data(table_wrapper, table_name):
     print(f"Number of final headers (English) for {table_name}: {len(final_headers)}")
 
     if table_output_records and final_headers:
-        df = pd.DataFrame(table_output_records, columns=final_headers)
+        # Compact table instead of DataFrame -> list of dicts; numeric columns get the same types pandas produced
+        table = RecordTable.from_rows(final_headers, table_output_records)
         print(f"✅ 成功提取 {table_name} 的表格数据：")
-        return df.to_dict(orient='records')
+        return table
     else:
         print(f"No data to save for {table_name}.")
         return []
@@ -290,7 +290,17 @@ def process_html_file(file_path, platform_name):
         print(f"❌ 读取文件时出错 {file_path}: {e}")
         return None
 
+    return parse_retention_html(html_content, platform_name)
+
+def parse_retention_html(html_content, platform_name):
+    """
+    Parse the HTML content of a single retention page
+    Kept separate from file reading so pages can be read concurrently and parsed in worker processes
+    """
+    # Phase timings for the extraction profiler (no-op unless profiling is enabled)
+    timer = PhaseTimer()
     soup = BeautifulSoup(html_content, 'html.parser')
+    timer.lap('soup')
     
     print(f"\n🔍 处理 {platform_name} 平台数据...")
 
@@ -303,6 +313,10 @@ def process_html_file(file_path, platform_name):
     print(f"提取到的应用名: {app_info['app_name']}")
     print(f"提取到的渠道: {app_info['channel']}")
 
+    # Store IDs from the page's own links, used to identify the product across sources
+    store_ids = page_store_ids(soup)
+    timer.lap('identity')
+
     # --- Extract data from the first table (Monthly App Retention) ---
     table_wrapper_monthly = soup.find('div', {'data-table-type': 'app_user_retention_table'})
     monthly_retention_data = extract_retention_table_data(table_wrapper_monthly, f"{platform_name} Monthly App Retention")
@@ -311,58 +325,77 @@ def process_html_file(file_path, platform_name):
     table_wrapper_publisher = soup.find('div', {'data-table-type': 'publisher_apps_user_retention_table'})
     publisher_retention_data = extract_retention_table_data(table_wrapper_publisher, f"{platform_name} Publisher Apps User Retention (Overall)")
 
+    timer.lap('table')
+
+    # Release the parse tree now instead of leaving its reference cycles to the garbage collector
+    soup.decompose()
+    timer.lap('decompose')
     return {
         "Application": product_name,
         "Platform": app_info['channel'],
+        "Store IDs": store_ids,
         "Monthly App Retention": monthly_retention_data,
         "Publisher Apps User Retention (Overall)": publisher_retention_data
     }
 
-# Process all HTML files
-all_platform_data = {}
-for platform, file_path in html_files.items():
-    print(f"\n{'='*60}")
-    print(f"🚀 开始处理 {platform} 平台...")
-    print(f"{'='*60}")
-    
-    platform_data = process_html_file(file_path, platform)
-    if platform_data:
-        all_platform_data[platform] = platform_data
-        print(f"✅ {platform} 平台数据处理完成")
-    else:
-        print(f"❌ {platform} 平台数据处理失败")
-
-# Save data for each platform separately and create a combined file
-print(f"\n{'='*60}")
-print("💾 保存数据文件...")
-print(f"{'='*60}")
+def process_all_platforms(files=None):
+    """
+    Process the retention pages of all platforms and return {platform: data}
+    Does not write any files
+    """
+    files = files if files is not None else html_files
+    all_platform_data = {}
+    for platform, file_path in files.items():
+        print(f"\n{'='*60}")
+        print(f"🚀 开始处理 {platform} 平台...")
+        print(f"{'='*60}")
+        
+        platform_data = process_html_file(file_path, platform)
+        if platform_data:
+            all_platform_data[platform] = platform_data
+            print(f"✅ {platform} 平台数据处理完成")
+        else:
+            print(f"❌ {platform} 平台数据处理失败")
+    return all_platform_data
 
-for platform, data in all_platform_data.items():
-    if platform == "Android":
-        output_path = "PolyBuzz_User_Retention_Aggregated_Analytics_Data.json"
-    else:
-        output_path = f"PolyBuzz_User_Retention_{platform}_Aggregated_Analytics_Data.json"
-    
-    try:
-        with open(output_path, 'w', encoding='utf-8') as json_file:
-            json.dump(data, json_file, ensure_ascii=False, indent=4)
-        print(f"✅ {platform} 数据已保存到: {output_path}")
-    except Exception as e:
-        print(f"❌ 保存 {platform} 数据时出错: {e}")
+def main():
+    # Process all HTML files
+    all_platform_data = process_all_platforms()
 
-# Create a combined summary file
-if all_platform_data:
-    combined_data = {
-        "Application": next(iter(all_platform_data.values()))["Application"],
-        "Platforms": all_platform_data
-    }
-    
-    combined_output_path = "PolyBuzz_User_Retention_Combined_Analytics_Data.json"
-    try:
-        with open(combined_output_path, 'w', encoding='utf-8') as json_file:
-            json.dump(combined_data, json_file, ensure_ascii=False, indent=4)
-        print(f"✅ 合并数据已保存到: {combined_output_path}")
-    except Exception as e:
-        print(f"❌ 保存合并数据时出错: {e}")
+    # Save data for each platform separately and create a combined file
+    print(f"\n{'='*60}")
+    print("💾 保存数据文件...")
+    print(f"{'='*60}")
 
-print(f"\n🎉 所有处理完成！成功处理了 {len(all_platform_data)} 个平台的数据")
+    for platform, data in all_platform_data.items():
+        if platform == "Android":
+            output_path = "PolyBuzz_User_Retention_Aggregated_Analytics_Data.json"
+        else:
+            output_path = f"PolyBuzz_User_Retention_{platform}_Aggregated_Analytics_Data.json"
+        
+        try:
+            with open(output_path, 'w', encoding='utf-8') as json_file:
+                json.dump(data, json_file, ensure_ascii=False, indent=4, default=json_default)
+            print(f"✅ {platform} 数据已保存到: {output_path}")
+        except Exception as e:
+            print(f"❌ 保存 {platform} 数据时出错: {e}")
+
+    # Create a combined summary file
+    if all_platform_data:
+        combined_data = {
+            "Application": next(iter(all_platform_data.values()))["Application"],
+            "Platforms": all_platform_data
+        }
+        
+        combined_output_path = "PolyBuzz_User_Retention_Combined_Analytics_Data.json"
+        try:
+            with open(combined_output_path, 'w', encoding='utf-8') as json_file:
+                json.dump(combined_data, json_file, ensure_ascii=False, indent=4, default=json_default)
+            print(f"✅ 合并数据已保存到: {combined_output_path}")
+        except Exception as e:
+            print(f"❌ 保存合并数据时出错: {e}")
+
+    print(f"\n🎉 所有处理完成！成功处理了 {len(all_platform_data)} 个平台的数据")
+
+if __name__ == "__main__":
+    main()